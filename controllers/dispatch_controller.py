@@ -50,37 +50,40 @@ class DispatchController:
             remaining = max(0, roll.length - dispatch_val)
             status = "active" if remaining > 0.01 else "used"
 
-            # 1. อัปเดตตารางหลัก
-            self.storage.update_roll(roll.roll_id, length=remaining, status=status)
-            
             # ดึงชื่อผู้ใช้งานที่ล็อกอิน
             username = "system"
             if hasattr(self.view, 'current_user') and self.view.current_user:
                 username = self.view.current_user.full_name
-            
-            # 2. บันทึกประวัติการเบิกอย่างละเอียด (รวมข้อมูลลูกค้า)
-            self.storage.add_dispatch_record(
-                roll, dispatch_val, 
-                document_no=doc_no, 
-                customer_code=cus_code, 
-                customer_name=cus_name,
-                user=username
-            )
 
-            # 3. บันทึก Log กิจกรรม
-            self.storage.add_log(
-                action="dispatch",
-                roll_id=roll.roll_id,
-                details={
-                    "code": roll.code,
-                    "dispatch_length": f"{dispatch_val:.2f}",
-                    "remaining_length": f"{remaining:.2f}",
-                    "document_no": doc_no,
-                    "customer": f"{cus_code} {cus_name}".strip(),
-                    "status": status
-                },
-                user=username
-            )
+            # บันทึกทั้ง 3 ขั้นตอนใน transaction เดียว (commit ครั้งเดียว หรือ rollback ทั้งหมด)
+            with self.storage.transaction():
+                # 1. อัปเดตตารางหลัก
+                self.storage.update_roll(roll.roll_id, length=remaining, status=status)
+
+                # 2. บันทึกประวัติการเบิกอย่างละเอียด (รวมข้อมูลลูกค้า)
+                if not self.storage.add_dispatch_record(
+                    roll, dispatch_val,
+                    document_no=doc_no,
+                    customer_code=cus_code,
+                    customer_name=cus_name,
+                    user=username
+                ):
+                    raise RuntimeError("ไม่สามารถบันทึกประวัติการเบิกได้")
+
+                # 3. บันทึก Log กิจกรรม
+                self.storage.add_log(
+                    action="dispatch",
+                    roll_id=roll.roll_id,
+                    details={
+                        "code": roll.code,
+                        "dispatch_length": f"{dispatch_val:.2f}",
+                        "remaining_length": f"{remaining:.2f}",
+                        "document_no": doc_no,
+                        "customer": f"{cus_code} {cus_name}".strip(),
+                        "status": status
+                    },
+                    user=username
+                )
 
             result_msg = f"✓ เบิกออกสำเร็จ!\nเลขม้วน: {roll.roll_id}\nคงเหลือ: {remaining:.2f}"
             self.view.show_status(result_msg, "blue")
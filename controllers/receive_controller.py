@@ -12,6 +12,11 @@ class ReceiveController:
         self.storage = storage
         self.roll_id_generator = roll_id_generator
 
+    def _get_username(self):
+        if hasattr(self.view, 'current_user') and self.view.current_user:
+            return self.view.current_user.full_name
+        return "system"
+
     def get_sku_list(self):
         """ดึงรายการ SKU ทั้งหมดจาก Master Data เพื่อทำ AutoComplete"""
         try:
@@ -115,22 +120,24 @@ class ReceiveController:
             QMessageBox.warning(self.view, "ข้อมูลไม่ถูกต้อง", "จำนวนม้วน (Quantity) ต้องอย่างน้อย 1 ม้วน")
             return
 
-        # 4. ดำเนินการบันทึก (สร้างม้วนตามจำนวนที่ระบุ)
+        # 4. ดำเนินการบันทึก (สร้างม้วนตามจำนวนที่ระบุ ในครั้งเดียว)
         success_count = 0
         main_win = self.view.window()
         
-        for _ in range(data['quantity']):
-            roll_id = self.roll_id_generator.get_next_roll_id()
-            roll_data = {
-                **data, 
-                'roll_id': roll_id,
-                'length_original': data.get('length', 0)
-            }
+        # จอง Roll ID ทั้งชุดในครั้งเดียว เลขที่ไม่ได้บันทึกจะถูกคืนให้ตัวนับ / บันทึกเป็นช่องว่าง
+        with self.roll_id_generator.reserve(data['quantity'], user=self._get_username()) as block:
+            roll_data_list = [
+                {
+                    **data, 
+                    'roll_id': roll_id,
+                    'length_original': data.get('length', 0)
+                }
+                for roll_id in block.ids
+            ]
             
             # สั่งบันทึกผ่านหน้า Rolls (เพื่อความสอดคล้องของระบบ)
             if hasattr(main_win, 'rolls_tab'):
-                if main_win.rolls_tab.add_new_roll(roll_data):
-                    success_count += 1
+                success_count = main_win.rolls_tab.add_new_rolls(roll_data_list)
         
         if success_count > 0:
             QMessageBox.information(self.view, "สำเร็จ", f"บันทึกม้วนผ้าสำเร็จ {success_count} ม้วน")
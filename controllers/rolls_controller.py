@@ -19,40 +19,58 @@ class RollsController:
         self.view.update_table(self.rolls)
         self.view.update_filter_options(self.rolls)
 
+    def _build_roll(self, roll_data):
+        """แปลงข้อมูลจากฟอร์มเป็น Roll"""
+        return Roll(
+            roll_id=roll_data['roll_id'],
+            code=roll_data['code'],
+            sub_part_code=roll_data.get('sub_part_code', ""),
+            sup_code=roll_data.get('sup_code', ""),
+            supplier_name=roll_data.get('supplier_name', ""),
+            description=roll_data.get('description', ""),
+            lot_no=roll_data['lot_no'],
+            length=float(roll_data['length']),
+            length_original=float(roll_data.get('length_original', roll_data['length'])),
+            width=roll_data.get('width', ""),  # เพิ่ม width
+            color=roll_data.get('color', ""),  # เพิ่ม color
+            location=roll_data.get('location', ""),
+            unit=roll_data.get('unit', "MTS"),
+            status="active"
+        )
+
+    def _get_username(self):
+        if hasattr(self.view, 'current_user') and self.view.current_user:
+            return self.view.current_user.full_name
+        return "system"
+
     def add_new_roll(self, roll_data):
         """Logic สำหรับการเพิ่มม้วนผ้าใหม่ (เรียกจากหน้า Receive หรือ Scan)"""
         try:
-            roll = Roll(
-                roll_id=roll_data['roll_id'],
-                code=roll_data['code'],
-                sub_part_code=roll_data.get('sub_part_code', ""),
-                sup_code=roll_data.get('sup_code', ""),
-                supplier_name=roll_data.get('supplier_name', ""),
-                description=roll_data.get('description', ""),
-                lot_no=roll_data['lot_no'],
-                length=float(roll_data['length']),
-                length_original=float(roll_data.get('length_original', roll_data['length'])),
-                width=roll_data.get('width', ""),  # เพิ่ม width
-                color=roll_data.get('color', ""),  # เพิ่ม color
-                location=roll_data.get('location', ""),
-                unit=roll_data.get('unit', "MTS"),
-                status="active"
-            )
+            roll = self._build_roll(roll_data)
+            username = self._get_username()
             
-            # ดึงชื่อผู้ใช้งาน
-            username = "system"
-            if hasattr(self.view, 'current_user') and self.view.current_user:
-                username = self.view.current_user.full_name
-            
-            if self.storage.add_roll(roll, user=username):
+            # add_roll และ log receive commit พร้อมกันครั้งเดียว
+            with self.storage.transaction():
+                if not self.storage.add_roll(roll, user=username):
+                    return False
                 self.storage.add_log("receive", roll.roll_id, roll_data, user=username)
-                self.refresh_data()
-                return True
-            return False
+            self.refresh_data()
+            return True
         except Exception as e:
             QMessageBox.critical(self.view, "Error", f"ไม่สามารถเพิ่มม้วนได้: {str(e)}")
             return False
 
+    def add_new_rolls(self, roll_data_list):
+        """เพิ่มม้วนผ้าหลายม้วนพร้อมกัน (commit ครั้งเดียว) คืนจำนวนม้วนที่บันทึกสำเร็จ"""
+        try:
+            rolls = [self._build_roll(roll_data) for roll_data in roll_data_list]
+            results = self.storage.add_rolls(rolls, user=self._get_username(), action="receive")
+            self.refresh_data()
+            return sum(results)
+        except Exception as e:
+            QMessageBox.critical(self.view, "Error", f"ไม่สามารถเพิ่มม้วนได้: {str(e)}")
+            return 0
+
     def handle_print_label(self, roll_id=None):
         """Logic การพิมพ์ฉลาก"""
         if not roll_id:
@@ -55,12 +55,11 @@ class ScanController:
             QMessageBox.critical(self.view, "ผิดพลาด", f"ไม่สามารถอ่านไฟล์ได้: {str(e)}")
 
     def submit_imported_data(self, df):
-        """บันทึกข้อมูลที่นำเข้าลงฐานข้อมูล SQLite"""
-        success = 0
+        """บันทึกข้อมูลที่นำเข้าลงฐานข้อมูล SQLite (บันทึกทั้งไฟล์ใน transaction เดียว)"""
+        rows = []
         for _, row in df.iterrows():
             try:
                 sku = str(row.get('sku', row.get('code', ''))).upper()
-                roll_id = self.roll_id_generator.get_next_roll_id()
                 
                 # ดึงข้อมูลสินค้าเพื่อเอาชื่อ Supplier
                 product = self.storage.get_master_product(sku)
@@ -68,8 +67,7 @@ class ScanController:
                 if product:
                     supplier_name = product.get('spl_name', product.get('Supplier Name', ""))
                 
-                data = {
-                    "roll_id": roll_id,
+                rows.append({
                     "code": sku,
                     "supplier_name": supplier_name,
                     "lot_no": str(row.get('lot', row.get('lot_no', ''))).upper(),
@@ -77,21 +75,25 @@ class ScanController:
                     "length_original": float(row.get('length', 0)),
                     "location": str(row.get('location', '')),
                     "status": "active"
-                }
-                
-                # ดึงชื่อผู้ใช้งาน
-                username = "system"
-                if hasattr(self.view, 'current_user') and self.view.current_user:
-                    username = self.view.current_user.full_name
-                    
-                # ใช้ storage โดยตรงเพื่อความสะอาด
-                if self.storage.add_roll(data, user=username):
-                    self.storage.add_log("receive_import", roll_id, data, user=username)
-                    success += 1
+                })
             except Exception as e:
                 logger.error(f"Error importing row: {e}")
                 continue
         
+        # ดึงชื่อผู้ใช้งาน
+        username = "system"
+        if hasattr(self.view, 'current_user') and self.view.current_user:
+            username = self.view.current_user.full_name
+        
+        success = 0
+        if rows:
+            # จอง Roll ID ทั้งไฟล์ในครั้งเดียว ถ้าบันทึกไม่สำเร็จเลขที่จองจะถูกคืน / บันทึกเป็นช่องว่าง
+            with self.roll_id_generator.reserve(len(rows), user=username) as block:
+                for data, roll_id in zip(rows, block.ids):
+                    data["roll_id"] = roll_id
+                # ใช้ storage โดยตรงเพื่อความสะอาด
+                success = sum(self.storage.add_rolls(rows, user=username, action="receive_import"))
+        
         QMessageBox.information(self.view, "สำเร็จ", f"นำเข้าข้อมูลสำเร็จ {success} ม้วน")
         self.view.preview_table.setRowCount(0)
         self.view.refresh_reports.emit()
@@ -121,30 +123,35 @@ class ScanController:
                 QMessageBox.warning(self.view, "Warning", "กรุณากรอก Lot และ ความยาวให้ครบถ้วน")
                 return
                 
-            roll_id = self.roll_id_generator.get_next_roll_id()
-            
             # ดึงชื่อผู้ใช้งาน
             username = "system"
             if hasattr(self.view, 'current_user') and self.view.current_user:
                 username = self.view.current_user.full_name
                 
-            data = {
-                "roll_id": roll_id,
-                "code": self.selected_master_item.get('pdt_code', ""),
-                "sub_part_code": self.selected_master_item.get('spl_part_code', ""),
-                "sup_code": self.selected_master_item.get('spl_code', ""),
-                "supplier_name": self.selected_master_item.get('spl_name', ""),
-                "description": self.selected_master_item.get('pdt_name', ""),
-                "unit": self.selected_master_item.get('unit_type', "MTS"),
-                "lot_no": lot,
-                "length": length,
-                "length_original": length,
-                "location": location,
-                "status": "active"
-            }
+            # เลขที่จองไว้จะถูกคืนให้ตัวนับถ้าบันทึกไม่สำเร็จ
+            with self.roll_id_generator.reserve(1, user=username) as block:
+                roll_id = block.ids[0]
+                data = {
+                    "roll_id": roll_id,
+                    "code": self.selected_master_item.get('pdt_code', ""),
+                    "sub_part_code": self.selected_master_item.get('spl_part_code', ""),
+                    "sup_code": self.selected_master_item.get('spl_code', ""),
+                    "supplier_name": self.selected_master_item.get('spl_name', ""),
+                    "description": self.selected_master_item.get('pdt_name', ""),
+                    "unit": self.selected_master_item.get('unit_type', "MTS"),
+                    "lot_no": lot,
+                    "length": length,
+                    "length_original": length,
+                    "location": location,
+                    "status": "active"
+                }
+                # ม้วนและ log receive_scan commit พร้อมกันครั้งเดียว
+                with self.storage.transaction():
+                    saved = self.storage.add_roll(data, user=username)
+                    if saved:
+                        self.storage.add_log("receive_scan", roll_id, data, user=username)
             
-            if self.storage.add_roll(data, user=username):
-                self.storage.add_log("receive_scan", roll_id, data, user=username)
+            if saved:
                 QMessageBox.information(self.view, "Success", f"บันทึกม้วนผ้า {roll_id} เรียบร้อยแล้ว!")
                 # ล้างฟอร์ม (ใช้ฟังก์ชันใน View)
                 self.view.clear_master_form()
@@ -193,11 +200,44 @@ class ScanController:
                 "status": "active"
             }
             
-            if self.storage.add_roll(data, user=username):
-                self.storage.add_log("receive_mobile", roll_id, data, user=username)
-                logger.info(f"Mobile scan saved: {roll_id}")
-                self.view.refresh_reports.emit()
-                # แจ้งเตือนในหน้าจอหลัก (ถ้า Tab Scan เปิดอยู่)
-                QMessageBox.information(self.view, "Mobile Scan", f"รับม้วนผ้า {roll_id} จากมือถือเรียบร้อย!")
+            # ไม่รอผลบน GUI thread: สแกนที่เข้ามาติดกันจึงถูก commit เป็นกลุ่มเดียวเมื่อเปิด database.write_behind
+            # ผลลัพธ์กลับมาทาง signal mobile_scan_saved (on_mobile_scan_saved ทำงานบน GUI thread)
+            saved = self.storage.submit_write(self._save_mobile_roll, data, username)
+            saved.add_done_callback(lambda future: self._emit_mobile_scan_saved(roll_id, future))
         except Exception as e:
             logger.error(f"Error handling mobile scan: {e}")
+
+    def _emit_mobile_scan_saved(self, roll_id, future):
+        """ถูกเรียกบน thread ที่เขียนฐานข้อมูล ส่งผลต่อให้ GUI thread ผ่าน signal"""
+        try:
+            ok = bool(future.result())
+        except Exception as e:
+            logger.error(f"Error saving mobile scan {roll_id}: {e}")
+            ok = False
+        try:
+            self.view.mobile_scan_saved.emit(roll_id, ok)
+        except RuntimeError:
+            # หน้า Scan ถูกปิดไปแล้ว
+            pass
+
+    def on_mobile_scan_saved(self, roll_id, ok):
+        """แจ้งผลการบันทึกสแกนจากมือถือ (GUI thread)"""
+        if ok:
+            logger.info(f"Mobile scan saved: {roll_id}")
+            self.view.refresh_reports.emit()
+            # แจ้งเตือนในหน้าจอหลัก (ถ้า Tab Scan เปิดอยู่)
+            QMessageBox.information(self.view, "Mobile Scan", f"รับม้วนผ้า {roll_id} จากมือถือเรียบร้อย!")
+        else:
+            QMessageBox.warning(self.view, "Mobile Scan", f"ไม่สามารถบันทึกม้วน {roll_id} จากมือถือได้")
+
+    def _save_mobile_roll(self, data, username):
+        """บันทึกม้วนจากมือถือพร้อม log ใน transaction เดียว"""
+        with self.storage.transaction():
+            # สแกนม้วนเดียวกันซ้ำระหว่างรอคิวเขียน: ตรวจซ้ำใน transaction ก่อน INSERT OR REPLACE ทับม้วนเดิม
+            if self.storage.get_roll_by_id(data["roll_id"]):
+                logger.warning(f"Mobile scan {data['roll_id']} already saved, skipping")
+                return False
+            if not self.storage.add_roll(data, user=username):
+                return False
+            self.storage.add_log("receive_mobile", data["roll_id"], data, user=username)
+        return True
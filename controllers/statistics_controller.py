@@ -1,6 +1,6 @@
 import logging
-import csv
 from PySide6.QtWidgets import QMessageBox, QFileDialog
+from utils.stock_analytics import classify_stock, STATUS_DEPLETED, STATUS_FULL, STATUS_SCRAP
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +13,10 @@ class StatisticsController:
         self.all_filtered_rows = []
         self.displayed_count = 0
         self.batch_size = 100
+        # สถานะ keyset pagination ของตารางสต็อก
+        self.filters = {}
+        self.cursor = None
+        self.total_count = 0
 
     def refresh_data(self):
         """โหลดข้อมูลเริ่มต้น (สต็อก และ ประวัติการเบิก) พร้อมระบบกรองละเอียด"""
@@ -35,12 +39,18 @@ class StatisticsController:
             try: max_val = float(max_len) if max_len else None
             except: max_val = None
             
-            # 1. จัดการข้อมูลสต็อก (ตารางบน)
-            all_rolls = self.storage.search_rolls()
-            self.all_filtered_rows = self._process_and_merge(
-                all_rolls, supplier_name, search_query, search_field, 
-                color_filter, min_val, max_val
+            # 1. จัดการข้อมูลสต็อก (ตารางบน) กรองใน SQL และโหลดเฉพาะหน้าแรก
+            self.filters = self._build_roll_filters(
+                supplier_name, search_query, search_field, color_filter, min_val, max_val
             )
+            # จำนวนและยอดรวมของทุกแถวที่ตรงตัวกรอง คำนวณด้วย GROUP BY ใน SQLite ครั้งเดียว
+            summary = self.storage.aggregate_stock(
+                (), ("count", "sum_length", "full_count", "scrap_count", "scrap_length"), self.filters
+            )[0]
+            self.total_count = summary.count
+            self.view.update_stock_summary(summary)
+            self.all_filtered_rows = []
+            self.cursor = None
             self.displayed_count = 0
             self.load_next_batch()
             
@@ -98,67 +108,59 @@ class StatisticsController:
                 })
         return merged
 
-    def _process_and_merge(self, rolls, s_name, query, field, color_f, min_l, max_l):
-        merged = []
-        for roll in rolls:
-            # กรองข้อมูลตามที่ผู้ใช้ระบุในหน้า UI
-            s_val = str(roll.supplier_name or "").lower()
-            match_supplier = not s_name or s_name.lower() in s_val
-            
-            # กรองสี
-            r_color = str(getattr(roll, 'color', '') or '').lower()
-            match_color = not color_f or color_f.lower() in r_color
-            
-            # กรองช่วงความยาว (Length)
-            r_len = float(roll.length or 0)
-            match_len = True
-            if min_l is not None and r_len < min_l: match_len = False
-            if max_l is not None and r_len > max_l: match_len = False
-            
-            match_search = True
-            if query:
-                q = query.lower()
-                if field == "Code":
-                    match_search = q in str(roll.code).lower()
-                elif field == "Description":
-                    match_search = q in str(getattr(roll, 'description', '') or '').lower()
-                elif field == "Lot" or field == "Lot No.":
-                    match_search = q in str(roll.lot_no).lower()
-                elif field == "Location":
-                    match_search = q in str(roll.location).lower()
-                elif field == "Roll ID":
-                    match_search = q in str(roll.roll_id).lower()
-            
-            if match_supplier and match_color and match_len and match_search:
-                # คำนวณสถานะตามเงื่อนไขใหม่
-                status_text = ""
-                if roll.status == "used" or roll.length <= 0:
-                    status_text = "หมด (Depleted)"
-                elif roll.length >= roll.length_original:
-                    status_text = "เต็มม้วน (Full)"
-                else:
-                    status_text = "เศษ (Scrap)"
+    # ชื่อช่องค้นหาในหน้า UI -> คอลัมน์ในตาราง rolls
+    SEARCH_FIELD_COLUMNS = {
+        "Code": "code",
+        "Description": "description",
+        "Lot": "lot_no",
+        "Lot No.": "lot_no",
+        "Location": "location",
+        "Roll ID": "roll_id",
+    }
 
-                merged.append({
-                    "Code": roll.code, 
-                    "Roll ID": roll.roll_id, 
-                    "SubPartCode": roll.sub_part_code,
-                    "SupCode": roll.sup_code, 
-                    "Supplier Name": roll.supplier_name,
-                    "Description": roll.description, 
-                    "Lot No.": roll.lot_no,
-                    "Location": roll.location, 
-                    "Unit": roll.unit,
-                    "Length": f"{roll.length:.2f}",
-                    "Original": f"{roll.length_original:.2f}",
-                    "Status": status_text
-                })
-        return merged
+    def _build_roll_filters(self, s_name, query, field, color_f, min_l, max_l):
+        """แปลงค่าตัวกรองจากหน้า UI เป็น filters ของ storage.search_rolls_page"""
+        filters = {
+            "supplier_name": s_name,
+            "color": color_f,
+            "min_length": min_l,
+            "max_length": max_l,
+        }
+        column = self.SEARCH_FIELD_COLUMNS.get(field)
+        if query and column:
+            filters[column] = query
+        return filters
+
+    def _format_roll(self, roll):
+        """แปลง Roll เป็นแถวสำหรับแสดงผล/Export"""
+        # คำนวณสถานะตามเงื่อนไขใหม่ (เงื่อนไขเดียวกับ classify_stock ที่ใช้ตอน Export)
+        status_text = ""
+        if roll.status == "used" or roll.length <= 0:
+            status_text = STATUS_DEPLETED
+        elif roll.length >= roll.length_original:
+            status_text = STATUS_FULL
+        else:
+            status_text = STATUS_SCRAP
+
+        return {
+            "Code": roll.code, 
+            "Roll ID": roll.roll_id, 
+            "SubPartCode": roll.sub_part_code,
+            "SupCode": roll.sup_code, 
+            "Supplier Name": roll.supplier_name,
+            "Description": roll.description, 
+            "Lot No.": roll.lot_no,
+            "Location": roll.location, 
+            "Unit": roll.unit,
+            "Length": f"{roll.length:.2f}",
+            "Original": f"{roll.length_original:.2f}",
+            "Status": status_text
+        }
 
     def load_next_batch(self):
-        """จัดการ Pagination และล้างตารางถ้าไม่มีข้อมูล"""
+        """ดึงหน้าถัดไปจากฐานข้อมูล (keyset pagination) และล้างตารางถ้าไม่มีข้อมูล"""
         try:
-            total = len(self.all_filtered_rows)
+            total = self.total_count
             
             # ถ้าไม่มีข้อมูลเลย ให้ล้างตารางทิ้งทันที
             if total == 0:
@@ -166,25 +168,57 @@ class StatisticsController:
                 self.view.update_load_more_btn(0, 0)
                 return
 
-            if self.displayed_count >= total: return
+            if self.displayed_count > 0 and self.cursor is None: return
 
-            next_count = min(self.displayed_count + self.batch_size, total)
-            batch = self.all_filtered_rows[self.displayed_count:next_count]
+            rolls, self.cursor = self.storage.search_rolls_page(
+                self.filters, after=self.cursor, limit=self.batch_size
+            )
+            batch = [self._format_roll(roll) for roll in rolls]
             
             self.view.append_data_to_table(batch, is_first_batch=(self.displayed_count == 0))
-            self.displayed_count = next_count
+            self.all_filtered_rows.extend(batch)
+            self.displayed_count += len(batch)
+            if self.cursor is None:
+                total = self.displayed_count
             self.view.update_load_more_btn(self.displayed_count, total)
         except (RuntimeError, AttributeError):
             return
 
+    # คอลัมน์ Export -> คอลัมน์ในตาราง rolls (ลำดับเดียวกับ _format_roll)
+    EXPORT_COLUMNS = {
+        "Code": "code",
+        "Roll ID": "roll_id",
+        "SubPartCode": "sub_part_code",
+        "SupCode": "sup_code",
+        "Supplier Name": "supplier_name",
+        "Description": "description",
+        "Lot No.": "lot_no",
+        "Location": "location",
+        "Unit": "unit",
+        "Length": "length",
+        "Original": "length_original",
+    }
+
+    def _export_frame(self):
+        """ทุกแถวที่ตรง filters ปัจจุบันเป็น DataFrame (ดึงแบบ columnar และจัดรูปแบบทั้งคอลัมน์)"""
+        cols = self.storage.fetch_columns(
+            "rolls", tuple(self.EXPORT_COLUMNS.values()) + ("status",), self.filters,
+            as_frame=True, order_by="roll_id"
+        )
+        status = classify_stock(cols["status"], cols["length"], cols["length_original"])
+        frame = cols[list(self.EXPORT_COLUMNS.values())].copy()
+        frame.columns = list(self.EXPORT_COLUMNS)
+        for name in ("Length", "Original"):
+            frame[name] = frame[name].fillna(0.0).map("{:.2f}".format)
+        frame["Status"] = status
+        return frame
+
     def export_data(self):
         """ส่งออกข้อมูล CSV"""
         if not self.all_filtered_rows: return
         
         file_path, _ = QFileDialog.getSaveFileName(self.view, "Export Report", "", "CSV Files (*.csv)")
         if file_path:
-            with open(file_path, "w", newline="", encoding="utf-8-sig") as f:
-                writer = csv.DictWriter(f, fieldnames=self.all_filtered_rows[0].keys())
-                writer.writeheader()
-                writer.writerows(self.all_filtered_rows)
+            # Export ทุกแถวที่ตรงตัวกรอง ไม่ใช่เฉพาะหน้าที่โหลดมาแสดงแล้ว
+            self._export_frame().fillna("").to_csv(file_path, index=False, encoding="utf-8-sig")
             QMessageBox.information(self.view, "สำเร็จ", "Export เรียบร้อย")
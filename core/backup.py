@@ -0,0 +1,274 @@
+"""
+Backup Module for Fabric Roll Management System
+สำรองฐานข้อมูลขณะโปรแกรมทำงานด้วย sqlite3 backup API (คัดลอกทีละช่วงหน้า ไม่หยุดการอ่าน/เขียนของโปรแกรม)
+บีบอัดเป็น .db.gz ใน database.backup_dir เก็บไว้ backup_count ไฟล์ล่าสุด และกู้คืนหลังตรวจความถูกต้องแล้ว
+"""
+
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import count
+from typing import List, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class BackupResult:
+    """ผลการสำรองหนึ่งครั้ง (ขนาดเป็น byte, เวลาเป็นวินาที)"""
+    path: Path
+    pages: int
+    db_bytes: int
+    compressed_bytes: int
+    copy_seconds: float
+    total_seconds: float
+    restarts: int
+
+    @property
+    def throughput(self) -> float:
+        """MB/s ของการคัดลอกหน้าฐานข้อมูล (ไม่รวมเวลาบีบอัด)"""
+        return self.db_bytes / 1e6 / self.copy_seconds if self.copy_seconds else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.path.name}: {self.db_bytes / 1e6:.1f} MB -> {self.compressed_bytes / 1e6:.1f} MB "
+                f"in {self.total_seconds:.2f}s (copy {self.copy_seconds:.2f}s, {self.throughput:.1f} MB/s, "
+                f"{self.restarts} restart(s))")
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+class BackupManager:
+    """
+    สำรอง / ตรวจ / กู้คืนฐานข้อมูลของ StorageManager
+
+    การคัดลอกใช้ connection แยกจาก pool ทีละ step_pages หน้า แล้วพัก step_sleep ให้ connection อื่นได้ lock
+    ใน WAL mode connection ต้นทางถือ read transaction ตลอดการคัดลอก ทำให้ได้ snapshot เดียวกันทั้งไฟล์
+    โดยไม่ขวางการเขียน (ถ้าไม่ถือ backup จะเริ่มใหม่ทุกครั้งที่มีการเขียนระหว่างคัดลอก)
+    ใน rollback journal mode การถือ read transaction จะขวางการ commit จึงคัดลอกทีละช่วงตามปกติ
+    และถ้าเริ่มใหม่เกิน MAX_RESTARTS ครั้ง (มีการเขียนตลอด) จะคัดลอกทั้งไฟล์ใน step เดียว
+    ซึ่งให้ connection อื่นรอ lock ตามเวลาคัดลอก (ราว 0.3 วินาทีต่อ 100 MB)
+    """
+    MAX_RESTARTS = 3
+    SUFFIX = ".db.gz"
+
+    def __init__(self, storage, backup_dir=None, backup_count: Optional[int] = None,
+                 step_pages: Optional[int] = None, step_sleep: Optional[float] = None):
+        from core.config import config
+        self.storage = storage
+        self.backup_dir = Path(backup_dir or storage.data_dir / config.get('database.backup_dir', 'backups'))
+        self.backup_count = int(backup_count if backup_count is not None
+                                else config.get('database.backup_count', 5))
+        self.step_pages = int(step_pages if step_pages is not None
+                              else config.get('database.backup_step_pages', 1024))
+        self.step_sleep = float(step_sleep if step_sleep is not None
+                                else config.get('database.backup_step_sleep_ms', 5) / 1000.0)
+        # สำรอง / กู้คืนได้ครั้งละหนึ่งงาน (เมนูกับตารางเวลาอาจเรียกพร้อมกัน)
+        self._lock = threading.Lock()
+        self._schedule = None
+        self._schedule_stop = threading.Event()
+        self.last_result: Optional[BackupResult] = None
+
+    # ----------------------------------------------------------------
+    # Backup
+    # ----------------------------------------------------------------
+    def backup(self, label: str = "", progress: Optional[Callable[[int, int], None]] = None) -> BackupResult:
+        """
+        สำรองฐานข้อมูลเป็นไฟล์ .db.gz ใหม่ แล้วลบไฟล์เก่าที่เกิน backup_count
+        progress(copied_pages, total_pages) ถูกเรียกหลังแต่ละ step (บน thread ที่เรียก backup)
+        """
+        with self._lock:
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            name = f"{self.storage.db_path.stem}_{stamp}{'_' + label if label else ''}"
+            for n in count(1):
+                if not (self.backup_dir / f"{name}{self.SUFFIX}").exists():
+                    break
+                name = f"{self.storage.db_path.stem}_{stamp}_{n}{'_' + label if label else ''}"
+            raw = self.backup_dir / f"{name}.db.partial"
+            target = self.backup_dir / f"{name}{self.SUFFIX}"
+            start = time.perf_counter()
+            try:
+                pages, restarts, copy_seconds = self._copy(raw, progress)
+                db_bytes = raw.stat().st_size
+                partial = target.with_name(target.name + ".partial")
+                with open(raw, "rb") as src, gzip.open(partial, "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                os.replace(partial, target)
+            finally:
+                for path in (raw, target.with_name(target.name + ".partial")):
+                    if path.exists():
+                        path.unlink()
+            result = BackupResult(target, pages, db_bytes, target.stat().st_size,
+                                  copy_seconds, time.perf_counter() - start, restarts)
+            self.last_result = result
+            self._rotate()
+        logger.info(f"Database backup {result.summary()}")
+        return result
+
+    def _copy(self, raw: Path, progress: Optional[Callable[[int, int], None]]) -> tuple:
+        """คัดลอกฐานข้อมูลลงไฟล์ raw ด้วย Connection.backup คืน (จำนวนหน้า, จำนวนครั้งที่เริ่มใหม่, วินาที)"""
+        state = {"remaining": None, "restarts": 0, "total": 0, "stepwise": True}
+
+        def on_step(status, remaining, total):
+            # backup เริ่มใหม่จากหน้าแรกเมื่อ connection อื่นเขียนระหว่าง step (remaining ไม่ลดลง)
+            if state["remaining"] is not None and remaining >= state["remaining"]:
+                state["restarts"] += 1
+            state["remaining"], state["total"] = remaining, total
+            if progress:
+                progress(total - remaining, total)
+            if state["stepwise"] and remaining:
+                if state["restarts"] > self.MAX_RESTARTS:
+                    raise _TooManyRestarts()
+                # Connection.backup พักเองเฉพาะตอน BUSY จึงพักระหว่าง step ที่นี่เพื่อปล่อย lock ให้ connection อื่น
+                time.sleep(self.step_sleep)
+
+        src = sqlite3.connect(self.storage.db_path, timeout=self.storage.busy_timeout)
+        dst = sqlite3.connect(raw)
+        try:
+            wal = src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+            if wal:
+                # read transaction ค้างไว้ = snapshot เดียวตลอดการคัดลอก (sqlite3 ไม่เปิด BEGIN ให้ SELECT เอง)
+                src.execute("BEGIN")
+                src.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            start = time.perf_counter()
+            try:
+                src.backup(dst, pages=self.step_pages, progress=on_step)
+            except _TooManyRestarts:
+                logger.warning(f"Backup restarted {state['restarts']} times, copying the database in one step")
+                state["stepwise"], state["remaining"] = False, None
+                src.backup(dst, pages=-1, progress=on_step)
+            copy_seconds = time.perf_counter() - start
+            if wal:
+                src.rollback()
+            # ไฟล์สำรองเป็นไฟล์เดียวที่เปิดได้ทันที (ไม่ต้องมี -wal ข้างๆ)
+            dst.execute("PRAGMA journal_mode=DELETE")
+            return state["total"], state["restarts"], copy_seconds
+        finally:
+            dst.close()
+            src.close()
+
+    def _rotate(self):
+        """เก็บเฉพาะ backup_count ไฟล์ล่าสุด (0 หรือน้อยกว่า = ไม่ลบ)"""
+        if self.backup_count <= 0:
+            return
+        for path in self.list_backups()[self.backup_count:]:
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.warning(f"Could not remove old backup {path}: {e}")
+
+    def list_backups(self) -> List[Path]:
+        """ไฟล์สำรองใน backup_dir เรียงจากใหม่ไปเก่า"""
+        if not self.backup_dir.exists():
+            return []
+        paths = self.backup_dir.glob(f"{self.storage.db_path.stem}_*{self.SUFFIX}")
+        return sorted(paths, key=lambda p: p.stat().st_mtime, reverse=True)
+
+    # ----------------------------------------------------------------
+    # Verify / Restore
+    # ----------------------------------------------------------------
+    def _extract(self, path: Path) -> Path:
+        """แตกไฟล์ .db.gz เป็นไฟล์ชั่วคราวใน backup_dir (ไฟล์ .db ที่ไม่ได้บีบอัดใช้ได้เช่นกัน)"""
+        path = Path(path)
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        extracted = self.backup_dir / f"{path.name}.restore"
+        opener = gzip.open if path.name.endswith(".gz") else open
+        with opener(path, "rb") as src, open(extracted, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        return extracted
+
+    def _check(self, db_file: Path) -> List[str]:
+        """ตรวจไฟล์ฐานข้อมูลที่แตกแล้ว คืนรายการปัญหา (ว่าง = ใช้กู้คืนได้)"""
+        problems = []
+        try:
+            conn = sqlite3.connect(f"{db_file.as_uri()}?mode=ro", uri=True)
+        except sqlite3.Error as e:
+            return [f"cannot open: {e}"]
+        try:
+            result = [r[0] for r in conn.execute("PRAGMA integrity_check").fetchall()]
+            if result != ["ok"]:
+                problems.extend(result[:10])
+            tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            problems.extend(f"missing table {t}" for t in ("rolls", "logs", "master_products")
+                            if t not in tables)
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > self.storage.SCHEMA_VERSION:
+                problems.append(f"schema version {version} is newer than this program "
+                                f"({self.storage.SCHEMA_VERSION})")
+        except sqlite3.Error as e:
+            problems.append(str(e))
+        finally:
+            conn.close()
+        return problems
+
+    def verify(self, path) -> List[str]:
+        """ตรวจไฟล์สำรอง (แตกไฟล์, integrity_check, ตารางหลัก, schema version) คืนรายการปัญหา"""
+        try:
+            extracted = self._extract(path)
+        except (OSError, EOFError) as e:
+            return [f"cannot read backup: {e}"]
+        try:
+            return self._check(extracted)
+        finally:
+            extracted.unlink()
+
+    def restore(self, path) -> BackupResult:
+        """
+        กู้คืนจากไฟล์สำรองหลังตรวจผ่านแล้ว โดยสำรองฐานข้อมูลปัจจุบันไว้ก่อน (label pre_restore)
+        ข้อมูลถูกเขียนทับผ่าน backup API ทั้งไฟล์ใน step เดียว (atomic) connection อื่นใน pool ใช้ต่อได้ทันที
+        คืนผลการสำรองก่อนกู้คืน ถ้าตรวจไม่ผ่านจะ raise ValueError และไม่แตะฐานข้อมูล
+        """
+        extracted = self._extract(path)
+        try:
+            problems = self._check(extracted)
+            if problems:
+                raise ValueError(f"Backup {Path(path).name} failed verification: {'; '.join(problems)}")
+            safety = self.backup(label="pre_restore")
+            with self._lock:
+                self.storage.flush_logs()
+                src = sqlite3.connect(extracted)
+                dst = sqlite3.connect(self.storage.db_path, timeout=self.storage.busy_timeout)
+                try:
+                    src.backup(dst, pages=-1)
+                finally:
+                    dst.close()
+                    src.close()
+                self.storage.reload_after_restore()
+        finally:
+            extracted.unlink()
+        logger.info(f"Database restored from {path} (previous data saved as {safety.path.name})")
+        return safety
+
+    # ----------------------------------------------------------------
+    # Schedule
+    # ----------------------------------------------------------------
+    def start_schedule(self, interval_hours: float):
+        """สำรองทุก interval_hours ชั่วโมงบน thread เบื้องหลัง (ครั้งแรกหลังครบหนึ่งรอบ)"""
+        if interval_hours <= 0 or (self._schedule and self._schedule.is_alive()):
+            return
+        self._schedule_stop.clear()
+
+        def run():
+            while not self._schedule_stop.wait(interval_hours * 3600):
+                try:
+                    self.backup()
+                except Exception as e:
+                    logger.error(f"Scheduled backup failed: {e}")
+
+        self._schedule = threading.Thread(target=run, name="storage-backup", daemon=True)
+        self._schedule.start()
+
+    def stop_schedule(self, timeout: Optional[float] = None):
+        """หยุดการสำรองตามตารางเวลา และรอการสำรองที่กำลังทำอยู่ให้เสร็จ"""
+        self._schedule_stop.set()
+        if self._schedule and self._schedule is not threading.current_thread():
+            self._schedule.join(timeout)
@@ -0,0 +1,79 @@
+"""
+Change Feed for Fabric Roll Management System
+กระจายเหตุการณ์การเปลี่ยนแปลงข้อมูล (ตาราง, primary key, operation, revision) ให้ผู้ติดตามจากทุก thread
+StorageManager เป็นผู้ publish จากตาราง change_log ที่ trigger เขียนไว้ จึงเห็นการเขียนจาก process อื่นด้วย
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# operation ของ ChangeEvent ("reset" = มีเหตุการณ์ที่ตามไม่ทัน ผู้ติดตามควรโหลดข้อมูลใหม่ทั้งหมด)
+INSERT, UPDATE, DELETE, RESET = "insert", "update", "delete", "reset"
+
+
+@dataclass(frozen=True, slots=True)
+class ChangeEvent:
+    """
+    การเปลี่ยนแปลงของแถวชุดหนึ่งในตารางเดียวกันด้วย operation เดียวกัน
+    revision คือเลขลำดับ (change_log.seq) ของแถวสุดท้ายในชุด เพิ่มขึ้นเสมอและใช้ร่วมกันทุก process
+    """
+    table: str
+    op: str
+    keys: tuple
+    revision: int
+
+
+class ChangeFeed:
+    """
+    รายชื่อผู้ติดตามที่ปลอดภัยต่อหลาย thread พร้อม revision ล่าสุดของแต่ละตาราง
+    callback ถูกเรียกบน thread ที่ publish (thread ที่เพิ่ง commit หรือ thread ที่เฝ้า data_version)
+    จึงต้องทำงานสั้นๆ และไม่แตะ widget โดยตรง ฝั่ง GUI ให้ใช้ gui.storage_events.StorageEvents
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._subscribers: List[tuple] = []
+        self._revisions: Dict[str, int] = {}
+        self._reset_revision = 0
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None],
+                  tables: Optional[Iterable[str]] = None) -> Callable[[ChangeEvent], None]:
+        """ลงทะเบียน callback(event) เฉพาะตารางที่ระบุ (None = ทุกตาราง) คืน callback เพื่อใช้ unsubscribe"""
+        with self._lock:
+            self._subscribers.append((callback, frozenset(tables) if tables is not None else None))
+        return callback
+
+    def unsubscribe(self, callback: Callable[[ChangeEvent], None]):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[0] != callback]
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def revision(self, *tables: str) -> int:
+        """revision ล่าสุดที่เห็นของตารางที่ระบุ (ไม่ระบุ = ทุกตาราง) 0 ถ้ายังไม่เคยเปลี่ยน"""
+        with self._lock:
+            values = self._revisions.values() if not tables else [self._revisions.get(t, 0) for t in tables]
+            return max([self._reset_revision, *values])
+
+    def publish(self, events: Iterable[ChangeEvent]):
+        """ส่งเหตุการณ์ตามลำดับ revision ให้ผู้ติดตาม (exception จาก callback ถูก log แล้วข้ามไป)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            for event in events:
+                if event.op == RESET:
+                    self._reset_revision = event.revision
+                else:
+                    self._revisions[event.table] = event.revision
+                for callback, tables in subscribers:
+                    if tables is not None and event.op != RESET and event.table not in tables:
+                        continue
+                    try:
+                        callback(event)
+                    except Exception as e:
+                        logger.error(f"Change subscriber {callback!r} failed: {e}")
@@ -21,7 +21,24 @@ class Config:
         "database": {
             "file": "fabric_rolls.db",
             "backup_dir": "backups",
-            "backup_count": 5
+            "backup_count": 5,
+            "profile": "wal",  # legacy | wal | fast (see core.storage.STORAGE_PROFILES)
+            "pragmas": {},  # per-PRAGMA overrides on top of the profile
+            "busy_timeout": 5.0,  # seconds to wait on a locked database
+            "cached_statements": 256,  # prepared statements kept per connection
+            "master_cache_size": 4096,  # master products kept in memory (LRU), 0 disables the cache
+            "master_cache_preload": False,  # load every master product into the cache at startup
+            "write_behind": False,  # route submit_write() through one writer thread with group commit
+            "group_commit_ms": 20,  # max time a write waits for its group to commit
+            "group_commit_max": 64,  # max writes per group commit (bounds how long one group holds the lock)
+            "log_durability": "transactional",  # transactional | buffered (see StorageManager.LOG_DURABILITY)
+            "log_buffer_size": 256,  # buffered logs: flush when this many are pending
+            "log_flush_ms": 200,  # buffered logs: max time a log waits in memory
+            "log_hot_days": 0,  # logs older than this move to monthly archive files at startup, 0 = off
+            "roll_archive_days": 0,  # used rolls idle this long move to rolls_archive, 0 = off (listings/reports read only rolls)
+            "backup_interval_hours": 24,  # scheduled snapshot into backup_dir, 0 = only from the menu
+            "backup_step_pages": 1024,  # pages copied per backup step before yielding to other connections
+            "backup_step_sleep_ms": 5  # pause between backup steps
         },
         "api": {
             "host": "0.0.0.0",
@@ -121,9 +138,7 @@ class Config:
             os.makedirs(log_dir, exist_ok=True)
         
         # Backup directory
-        backup_dir = self.get_database_path('backup_dir')
-        if backup_dir and not os.path.exists(backup_dir):
-            os.makedirs(backup_dir, exist_ok=True)
+        self.get_backup_path()
     
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -215,7 +230,7 @@ class Config:
         Returns:
             Absolute path as a string
         """
-        backup_dir = self.get_database_path('backup_dir')
+        backup_dir = self.get_database_path(self.get('database.backup_dir', 'backups'))
         if not os.path.exists(backup_dir):
             os.makedirs(backup_dir, exist_ok=True)
         
@@ -1,21 +1,31 @@
 import os
 import json
+import time
 import sqlite3
 import logging
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union
-from datetime import datetime
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Any, Optional, Union, Iterable, Callable
+from datetime import datetime, timedelta
+from dataclasses import dataclass, asdict, fields
+from contextlib import contextmanager
+from collections import namedtuple, OrderedDict
+from functools import lru_cache
+from itertools import groupby, count
+from concurrent.futures import Future
+import queue
 import threading
 import uuid
 
+from core.change_feed import ChangeFeed, ChangeEvent, RESET
+
 logger = logging.getLogger(__name__)
 
 
 # --------------------------------------------------------------------
 # Data Models
 # --------------------------------------------------------------------
-@dataclass
+# slots=True: ไม่มี __dict__ ต่อ instance ประหยัดหน่วยความจำเมื่อโหลดม้วนจำนวนมาก
+@dataclass(slots=True)
 class Roll:
     roll_id: str
     code: str
@@ -39,12 +49,22 @@ class Roll:
             self.date_received = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
+        # ไม่ใช้ asdict() ซึ่ง deep-copy ทุกค่า (ทุก field เป็นชนิดพื้นฐานอยู่แล้ว)
+        return {name: getattr(self, name) for name in self.__slots__}
 
     @classmethod
     def from_db_row(cls, row_dict: Dict[str, Any]):
         return cls(**row_dict)
 
+    @classmethod
+    def from_row(cls, cursor, row: tuple):
+        """row_factory ของ sqlite3: สร้าง Roll จาก tuple โดยตรง (ต้อง SELECT ตามลำดับ ROLL_COLUMNS)"""
+        return cls(*row)
+
+
+ROLL_COLUMNS = tuple(f.name for f in fields(Roll))
+ROLL_SELECT = ", ".join(ROLL_COLUMNS)
+
 
 @dataclass
 class MasterProduct:
@@ -96,167 +116,930 @@ class LogEntry:
         return asdict(self)
 
 
+@dataclass(frozen=True, slots=True)
+class RollIDBlock:
+    """Roll ID ที่จองไว้ติดกันของ prefix เดียว ลำดับ first ถึง last (ว่างเมื่อ last < first)"""
+    prefix: str
+    first: int
+    last: int
+    digits: int = 6
+
+    @property
+    def count(self) -> int:
+        return max(0, self.last - self.first + 1)
+
+    def format(self, value: int) -> str:
+        return f"{self.prefix}{value:0{self.digits}d}"
+
+    @property
+    def ids(self) -> List[str]:
+        return [self.format(n) for n in range(self.first, self.last + 1)]
+
+
+LOG_COLUMNS = ("id", "timestamp", "action", "roll_id", "details", "user", "document_no", "customer")
+
+
+def _projected_getitem(self, key):
+    if isinstance(key, str):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+    return tuple.__getitem__(self, key)
+
+
+def _projected_get(self, key: str, default: Any = None) -> Any:
+    return getattr(self, key) if key in self._fields else default
+
+
+@lru_cache(maxsize=None)
+def projected_row_type(columns: tuple) -> type:
+    """
+    ชนิดของแถวที่ได้จาก columns= (namedtuple หนึ่งชนิดต่อชุดคอลัมน์)
+    อ่านได้ทั้ง row.code, row["code"], row.get("code") และ row.to_dict() จึงใช้แทน Roll / dict เดิมได้
+    """
+    base = namedtuple("ProjectedRow", columns)
+    return type("ProjectedRow", (base,), {
+        "__slots__": (),
+        "__getitem__": _projected_getitem,
+        "get": _projected_get,
+        "keys": lambda self: self._fields,
+        "to_dict": base._asdict,
+    })
+
+
+# --------------------------------------------------------------------
+# Storage Profiles (เลือกผ่าน config: database.profile)
+# --------------------------------------------------------------------
+# legacy : ค่าเดิมของ SQLite (rollback journal + synchronous=FULL) ทุก commit ต้อง fsync
+#          และการเขียนจะ block การอ่านจาก thread อื่น ใช้เมื่อฐานข้อมูลอยู่บน network share
+# wal    : Write-Ahead Log + synchronous=NORMAL อ่านและเขียนพร้อมกันได้ fsync เฉพาะตอน checkpoint
+#          cache 16 MB, mmap 64 MB, temp table ในหน่วยความจำ (ค่าเริ่มต้นที่แนะนำ)
+# fast   : เหมือน wal แต่ cache 64 MB และ mmap 256 MB สำหรับเครื่องที่มี RAM มากและคลังข้อมูลใหญ่
+# ค่า cache_size ติดลบหมายถึงหน่วย KiB ตามความหมายของ SQLite
+STORAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "legacy": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+    },
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+DEFAULT_STORAGE_PROFILE = "wal"
+
+
+# --------------------------------------------------------------------
+# Table Schemas (ใช้ทั้งตอนสร้างตารางและตอน rebuild ใน migration, {table} คือชื่อตาราง)
+# --------------------------------------------------------------------
+ROLLS_TABLE_SQL = """
+CREATE TABLE {table} (
+    roll_id TEXT PRIMARY KEY,
+    code TEXT,
+    sub_part_code TEXT,
+    sup_code TEXT,
+    supplier_name TEXT,
+    description TEXT,
+    lot_no TEXT,
+    quantity INTEGER,
+    location TEXT,
+    unit TEXT,
+    color TEXT,
+    width REAL,
+    length REAL,
+    length_original REAL,
+    status TEXT,
+    date_received DATETIME DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# index ชุดแรกที่ migration 1-2 สร้าง (คงไว้ตามเดิม) ชุดปัจจุบันที่ใช้จริงดู INDEXES
+ROLLS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_rolls_code ON rolls(code)",
+    "CREATE INDEX IF NOT EXISTS idx_rolls_location ON rolls(location)",
+    "CREATE INDEX IF NOT EXISTS idx_rolls_lot ON rolls(lot_no)",
+    # ใช้กับ search_rolls_page(order_by="date_received")
+    "CREATE INDEX IF NOT EXISTS idx_rolls_date_received ON rolls(date_received, roll_id)",
+)
+
+# ชุด index ที่ประกาศไว้ของทุก query ใน StorageManager {ชื่อ: (ตาราง, คอลัมน์)}
+# StorageManager._sync_indexes ทำให้ฐานข้อมูลตรงกับรายการนี้ (สร้างที่ขาด, สร้างใหม่เมื่อคอลัมน์เปลี่ยน,
+# ลบ idx_* ที่ไม่ได้ประกาศบนตารางเดียวกัน) ตรวจแผนการ query ได้ด้วย script/audit_query_plans.py
+INDEXES: Dict[str, tuple] = {
+    # get_roll_by_code, search_rolls_by_field และ keyset pagination (คอลัมน์, roll_id)
+    "idx_rolls_code": ("rolls", ("code", "roll_id")),
+    "idx_rolls_location": ("rolls", ("location", "roll_id")),
+    "idx_rolls_lot": ("rolls", ("lot_no", "roll_id")),
+    # get_rolls_by_date_range, สถิติตามช่วงวัน, search_rolls_page(order_by="date_received")
+    "idx_rolls_date_received": ("rolls", ("date_received", "roll_id")),
+    # status = ? (get_roll_active_count, search_rolls(status=...)), GROUP BY status, status + code
+    "idx_rolls_status_code": ("rolls", ("status", "code")),
+    # get_logs / search_logs เรียง timestamp DESC, id DESC
+    "idx_logs_timestamp": ("logs", ("timestamp", "id")),
+    "idx_logs_action": ("logs", ("action", "timestamp")),
+    "idx_logs_roll_id": ("logs", ("roll_id", "timestamp")),
+    "idx_logs_document_no": ("logs", ("document_no",)),
+    "idx_logs_customer": ("logs", ("customer",)),
+    # get_dispatch_history และประวัติการเบิกของม้วน
+    "idx_dispatch_timestamp": ("dispatch", ("timestamp",)),
+    "idx_dispatch_roll_id": ("dispatch", ("roll_id", "timestamp")),
+}
+
+DISPATCH_COLUMNS = (
+    "id", "timestamp", "roll_id", "pdt_code", "sub_part_code", "sup_code", "lot_no",
+    "color", "width", "length_dispatched", "length_original", "length_remaining", "unit",
+    "location", "supplier_name", "description", "document_no", "customer_code",
+    "customer_name", "user"
+)
+
+DISPATCH_TABLE_SQL = """
+CREATE TABLE {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    roll_id TEXT,
+    pdt_code TEXT,
+    sub_part_code TEXT,
+    sup_code TEXT,
+    lot_no TEXT,
+    color TEXT,
+    width REAL,
+    length_dispatched REAL,
+    length_original REAL,
+    length_remaining REAL,
+    unit TEXT,
+    location TEXT,
+    supplier_name TEXT,
+    description TEXT,
+    document_no TEXT,
+    customer_code TEXT,
+    customer_name TEXT,
+    user TEXT
+)
+"""
+
+# ยอดคงคลังของม้วน status = 'active' ต่อ (code, location, supplier_name) ดูแลโดย trigger บน rolls
+# (ดู StorageManager._init_stock_summary) ค่า NULL ของคีย์เก็บเป็น '' เพื่อให้ PRIMARY KEY ใช้ได้
+STOCK_SUMMARY_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS stock_summary (
+    code TEXT NOT NULL,
+    location TEXT NOT NULL,
+    supplier_name TEXT NOT NULL,
+    active_count INTEGER NOT NULL DEFAULT 0,
+    total_length REAL NOT NULL DEFAULT 0,
+    scrap_count INTEGER NOT NULL DEFAULT 0,
+    scrap_length REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (code, location, supplier_name)
+) WITHOUT ROWID
+"""
+
+
 # --------------------------------------------------------------------
 # StorageManager using SQLite
 # --------------------------------------------------------------------
 class StorageManager:
-    def __init__(self, data_dir: Union[str, Path]):
+    def __init__(self, data_dir: Union[str, Path], busy_timeout: Optional[float] = None,
+                 cached_statements: Optional[int] = None, profile: Optional[str] = None,
+                 master_cache_size: Optional[int] = None):
         from dotenv import load_dotenv
+        from core.config import config
         load_dotenv()
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
         db_file = os.getenv("DATABASE_FILE", "storage.db")
         self.db_path = self.data_dir / db_file
+
+        # Connection pool: หนึ่ง connection ต่อหนึ่ง thread ใช้ซ้ำตลอดอายุของ thread
+        self.busy_timeout = float(busy_timeout if busy_timeout is not None
+                                  else config.get('database.busy_timeout', 5.0))
+        self.cached_statements = int(cached_statements if cached_statements is not None
+                                     else config.get('database.cached_statements', 256))
+        self.profile = profile or config.get('database.profile', DEFAULT_STORAGE_PROFILE)
+        if self.profile not in STORAGE_PROFILES:
+            logger.warning(f"Unknown storage profile '{self.profile}', using '{DEFAULT_STORAGE_PROFILE}'")
+            self.profile = DEFAULT_STORAGE_PROFILE
+        self.pragmas = {**STORAGE_PROFILES[self.profile], **(config.get('database.pragmas') or {})}
         self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+        # opens / closes แก้ไขขณะถือ _pool_lock เท่านั้น ส่วน reuses / lock_wait_seconds นับแยกต่อ thread
+        # (_thread_stats ไม่ต้องใช้ lock ในเส้นทางที่เรียกทุก query) และรวมกันใน get_pool_stats
+        self._pool_stats = {"opens": 0, "reuses": 0, "closes": 0, "lock_wait_seconds": 0.0}
+        self._thread_stats: List[tuple] = []
+        self._fts_tables = None
+
+        # Change feed: publish แถวใหม่ใน change_log หลัง commit และเมื่อ data_version เปลี่ยน
+        self.changes = ChangeFeed()
+        self._change_lock = threading.RLock()
+        self._change_seq = None
+        self._commit_count = 0
+        self._watcher = None
+        self._watch_stop = threading.Event()
+
+        # Master product cache: LRU ของ pdt_code -> MasterProduct (None = ไม่มีสินค้านี้)
+        self.master_cache_size = int(master_cache_size if master_cache_size is not None
+                                     else config.get('database.master_cache_size', 4096))
+        self._master_cache: "OrderedDict[str, Optional[MasterProduct]]" = OrderedDict()
+        self._master_lock = threading.Lock()
+        self._master_generation = 0
+        self._master_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+        # Write-behind: thread เขียนเดียวที่ commit งานเป็นกลุ่ม (เปิดด้วย database.write_behind)
+        self._write_queue = None
+        self._writer = None
+        self._writer_stats = {"groups": 0, "ops": 0, "failed": 0, "max_group": 0, "commit_seconds": 0.0}
+
+        # Audit log sink: transactional = เขียน log ใน transaction เดียวกับงาน (ค่าเดิม)
+        # buffered = เก็บใน buffer แล้ว flush ด้วย executemany เมื่อเต็ม / ทุก log_flush_ms / ตอนปิด
+        self.log_durability = config.get('database.log_durability', 'transactional')
+        if self.log_durability not in self.LOG_DURABILITY:
+            logger.warning(f"Unknown log durability '{self.log_durability}', using 'transactional'")
+            self.log_durability = 'transactional'
+        self.log_buffer_size = max(1, int(config.get('database.log_buffer_size', 256)))
+        self.log_flush_interval = float(config.get('database.log_flush_ms', 200)) / 1000.0
+        self._log_buffer: List[tuple] = []
+        self._log_lock = threading.Lock()
+        self._log_wakeup = threading.Event()
+        self._log_flusher = None
+        self._log_stats = {"buffered": 0, "flushes": 0, "flushed": 0, "flush_errors": 0}
+        self._archive_lock = threading.Lock()
+        self._archived_roll_count = None
+
         self._init_db()
+        self._change_seq = self._last_change_seq()
+        if self.master_cache_size > 0:
+            # การเขียนผ่าน StorageManager นี้ล้าง cache เองทันที (write-through)
+            # thread เฝ้า data_version มีไว้ล้าง cache เมื่อ process อื่นแก้ master_products
+            self.watch_changes()
+            if config.get('database.master_cache_preload', False):
+                self.preload_master_products()
+        if config.get('database.write_behind', False):
+            self.start_writer(config.get('database.group_commit_ms', 20),
+                              config.get('database.group_commit_max', 64))
+        if self.log_durability == 'buffered':
+            self._start_log_flusher()
 
+    # ----------------------------------------------------------------
+    # Connection Pool
+    # ----------------------------------------------------------------
     def _connect(self):
-        conn = sqlite3.connect(self.db_path)
+        """คืน connection ประจำ thread ปัจจุบัน (เปิดใหม่เฉพาะครั้งแรกของ thread)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.stats["reuses"] += 1
+            return conn
+
+        # check_same_thread=False เพื่อให้ close() ปิด connection ของ thread อื่นได้ตอน shutdown
+        # การใช้งานจริงยังคงผูกหนึ่ง connection ต่อหนึ่ง thread
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False
+        )
         conn.row_factory = sqlite3.Row
+        self._apply_pragmas(conn)
+        self._local_stats()
+        self._local.conn = conn
+
+        with self._timed_lock(self._pool_lock):
+            self._prune_dead_connections()
+            self._connections[threading.current_thread()] = conn
+            self._pool_stats["opens"] += 1
         return conn
 
-    def _init_db(self):
-        with self._connect() as conn:
-            cur = conn.cursor()
-
-            # Table: Rolls (Simplified schema)
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS rolls (
-                roll_id TEXT PRIMARY KEY,
-                code TEXT,
-                sub_part_code TEXT,
-                sup_code TEXT,
-                supplier_name TEXT,
-                description TEXT,
-                lot_no TEXT,
-                quantity INTEGER,
-                location TEXT,
-                unit TEXT,
-                color TEXT,
-                width REAL,
-                length REAL,
-                length_original REAL,
-                status TEXT,
-                date_received DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            """)
+    @contextmanager
+    def _read(self):
+        """connection สำหรับการอ่าน (ไม่ commit เพื่อไม่ไปปิด transaction ที่เปิดอยู่)"""
+        yield self._connect()
+
+    @contextmanager
+    def _write(self):
+        """connection สำหรับการเขียน: commit ทันที หรือเข้าร่วม transaction() ที่เปิดอยู่"""
+        conn = self._connect()
+        if getattr(self._local, "tx_depth", 0):
+            yield conn
+            return
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        self._after_commit()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work: ทุกการเขียนภายใน block ใช้ connection เดียวกันและ commit ครั้งเดียว
+        ถ้าเกิด exception จะ rollback ทั้งหมด การเรียกซ้อนกันจะใช้ SAVEPOINT
+
+        Example:
+            with storage.transaction():
+                storage.update_roll(roll_id, length=0, status="used")
+                storage.add_log("dispatch", roll_id, {...})
+        """
+        conn = self._connect()
+        depth = getattr(self._local, "tx_depth", 0)
+        savepoint = f"sp_{depth}"
+        if depth == 0:
+            if conn.in_transaction:
+                conn.commit()
+            conn.execute("BEGIN IMMEDIATE")
+        else:
+            conn.execute(f"SAVEPOINT {savepoint}")
+        self._local.tx_depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.tx_depth = depth
+            if depth == 0:
+                conn.rollback()
+                # cache ไม่เคยเห็นค่าที่ยังไม่ commit (อ่านใน transaction ไม่เก็บลง cache) จึงทิ้งได้เลย
+                self._local.master_pending = set()
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            raise
+        self._local.tx_depth = depth
+        if depth == 0:
+            conn.commit()
+            self._flush_master_invalidations()
+            self._after_commit()
+        else:
+            conn.execute(f"RELEASE {savepoint}")
+
+    def _apply_pragmas(self, conn: sqlite3.Connection):
+        """ตั้งค่า PRAGMA ตาม storage profile ให้กับ connection ที่เพิ่งเปิด"""
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name}={value}")
+            except sqlite3.Error as e:
+                logger.warning(f"Could not apply PRAGMA {name}={value}: {e}")
 
-            # Create indexes for rolls table
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_rolls_code ON rolls(code)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_rolls_location ON rolls(location)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_rolls_lot ON rolls(lot_no)")
-
-            # Table: Master Products
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS master_products (
-                pdt_code TEXT PRIMARY KEY,
-                pdt_name TEXT,
-                pdt_name_en TEXT,
-                unit_type TEXT,
-                spl_part_code TEXT,
-                scrapqty REAL,
-                create_name TEXT,
-                create_date TEXT,
-                update_name TEXT,
-                update_date TEXT,
-                last_buy_date TEXT,
-                lastdate TEXT,
-                pg_name TEXT,
-                cate_name TEXT,
-                spl_name TEXT,
-                spl_code TEXT,
-                location TEXT
-            )
-            """)
+    def _prune_dead_connections(self):
+        """ปิด connection ของ thread ที่จบการทำงานไปแล้ว และรวมสถิติของ thread นั้นเข้า pool stats (เรียกขณะถือ _pool_lock)"""
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            try:
+                self._connections.pop(thread).close()
+                self._pool_stats["closes"] += 1
+            except sqlite3.Error as e:
+                logger.warning(f"Error closing stale connection: {e}")
+        alive = []
+        for thread, stats in self._thread_stats:
+            if thread.is_alive():
+                alive.append((thread, stats))
+            else:
+                for key, value in stats.items():
+                    self._pool_stats[key] += value
+        self._thread_stats = alive
+
+    def _local_stats(self) -> Dict[str, Any]:
+        """ตัวนับของ thread ปัจจุบัน (เขียนโดย thread เจ้าของเท่านั้น)"""
+        stats = getattr(self._local, "stats", None)
+        if stats is None:
+            stats = self._local.stats = {"reuses": 0, "lock_wait_seconds": 0.0}
+            with self._pool_lock:
+                self._thread_stats.append((threading.current_thread(), stats))
+        return stats
+
+    @contextmanager
+    def _timed_lock(self, lock=None):
+        """ถือ lock พร้อมบันทึกเวลาที่ต้องรอไว้ใน pool stats"""
+        lock = lock or self._lock
+        stats = self._local_stats()
+        start = time.perf_counter()
+        lock.acquire()
+        stats["lock_wait_seconds"] += time.perf_counter() - start
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """สถิติของ connection pool: จำนวนการเปิด/ใช้ซ้ำ และเวลารอ lock รวม"""
+        with self._pool_lock:
+            stats = dict(self._pool_stats)
+            for _, thread_stats in self._thread_stats:
+                for key, value in list(thread_stats.items()):
+                    stats[key] += value
+            stats["open_connections"] = len(self._connections)
+        stats["profile"] = self.profile
+        stats["busy_timeout"] = self.busy_timeout
+        stats["cached_statements"] = self.cached_statements
+        return stats
+
+    def close(self):
+        """
+        ปิดทุก connection ใน pool (เรียกตอนปิดโปรแกรม)
+        หยุดและรอ thread ของ StorageManager (เขียน, flush log, เฝ้า data_version) ก่อน ผู้เรียกต้องหยุด thread
+        ของตัวเองที่ใช้ storage (เช่น งาน archive, สำรองข้อมูล) ก่อนเรียก close
+        connection ของ thread อื่นที่ยังทำงานอยู่จะไม่ถูกปิดทับ แค่ปล่อยออกจาก pool (ปิดเองเมื่อ thread เลิกใช้)
+        """
+        self.stop_writer()
+        self._stop_log_flusher()
+        self._watch_stop.set()
+        if self._watcher and self._watcher is not threading.current_thread():
+            self._watcher.join(timeout=5)
+        current = threading.current_thread()
+        with self._pool_lock:
+            self._prune_dead_connections()
+            for thread, conn in self._connections.items():
+                if thread is not current and thread.is_alive():
+                    logger.warning(f"Thread {thread.name} is still running, leaving its connection open")
+                    continue
+                try:
+                    conn.close()
+                    self._pool_stats["closes"] += 1
+                except sqlite3.Error as e:
+                    logger.warning(f"Error closing connection: {e}")
+            self._connections.clear()
+            # thread-local ใหม่ เพื่อไม่ให้ thread ใดหยิบ connection ที่ปิดไปแล้วมาใช้
+            self._local = threading.local()
 
-            # Table: Logs
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS logs (
-                id TEXT PRIMARY KEY,
-                timestamp TEXT,
-                action TEXT,
-                roll_id TEXT,
-                details TEXT,
-                user TEXT
-            )
-            """)
+    def _init_db(self):
+        """ตรวจ PRAGMA user_version ครั้งเดียว ถ้าฐานข้อมูลเป็นเวอร์ชันล่าสุดแล้วจะไม่ทำอะไรเพิ่ม"""
+        if self.get_schema_version() < self.SCHEMA_VERSION:
+            self.migrate()
+
+    def reload_after_restore(self):
+        """
+        เรียกหลังเนื้อหาฐานข้อมูลถูกเขียนทับทั้งไฟล์ (core.backup.BackupManager.restore)
+        migrate ถ้าไฟล์สำรองเป็น schema เก่า ล้าง cache ทั้งหมด และเลื่อน seq ของ change_log ให้เกิน revision
+        ที่ publish ไปแล้ว (ไฟล์สำรองมี seq ต่ำกว่า) จากนั้นส่ง reset ให้ผู้ติดตามโหลดข้อมูลใหม่ทั้งหมด
+        """
+        self._fts_tables = None
+        self._init_db()
+        self._invalidate_master()
+        self._archived_roll_count = None
+        with self._change_lock:
+            revision = max(self._last_change_seq(), self._change_seq or 0) + 1
+            self._change_seq = revision
+            with self.transaction() as conn:
+                if not conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'change_log'",
+                                    (revision,)).rowcount:
+                    conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', ?)", (revision,))
+        self.changes.publish([ChangeEvent("*", RESET, (), revision)])
 
-            # Table: Users
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                password_hash TEXT,
-                role TEXT,
-                full_name TEXT,
-                created_at TEXT,
-                last_login TEXT
-            )
-            """)
+    # ----------------------------------------------------------------
+    # Write-Behind (single writer + group commit)
+    # ----------------------------------------------------------------
+    _STOP_WRITER = object()
+    # ลำดับความสำคัญในคิวของ thread เขียน (น้อย = ก่อน) สัญญาณหยุดอยู่ท้ายสุดเพื่อให้ commit งานที่ค้างก่อน
+    _URGENT, _NORMAL, _STOP = 0, 1, 2
+
+    def start_writer(self, group_commit_ms: float = 20, group_commit_max: int = 64):
+        """
+        เริ่ม thread เขียนเดียว: รับงานจาก submit_write() แล้ว commit เป็นกลุ่ม
+        ทุก group_commit_ms มิลลิวินาทีนับจากงานแรกของกลุ่ม หรือเมื่อครบ group_commit_max งาน
+        ผู้เขียนหลาย thread จึงไม่ต้องแย่ง write lock ของ SQLite และจ่าย fsync ครั้งเดียวต่อกลุ่ม
+        """
+        if self._writer and self._writer.is_alive():
+            return
+        self._write_queue = queue.PriorityQueue()
+        self._write_seq = count()
+        self._writer = threading.Thread(
+            target=self._writer_loop, args=(self._write_queue, group_commit_ms / 1000.0, max(1, int(group_commit_max))),
+            name="storage-writer", daemon=True
+        )
+        self._writer.start()
+
+    def stop_writer(self, timeout: Optional[float] = None):
+        """หยุด thread เขียนหลัง commit งานที่ค้างในคิวทั้งหมด (งานที่ส่งหลังจากนี้จะทำทันทีบน thread ผู้เรียก)"""
+        writer, q = self._writer, self._write_queue
+        if not writer:
+            return
+        self._writer = self._write_queue = None
+        q.put((self._STOP, next(self._write_seq), self._STOP_WRITER))
+        if writer is not threading.current_thread():
+            writer.join(timeout)
+            # งานที่หลุดเข้าคิวหลัง thread เขียนจบไปแล้ว
+            self._drain_write_queue(q)
+
+    def submit_write(self, fn: Callable, *args, urgent: bool = False, **kwargs) -> Future:
+        """
+        ส่งงานเขียน fn(*args, **kwargs) (เช่น storage.add_roll) คืน Future ที่ได้ผลลัพธ์ของ fn
+        หลังกลุ่มที่งานนั้นอยู่ commit แล้วเท่านั้น (future.result() = รอจนข้อมูลลงดิสก์)
+        แต่ละงานอยู่ใน SAVEPOINT ของตัวเอง งานที่ raise จะ rollback เฉพาะตัวเองและได้ exception ใน Future
+        urgent=True (งานที่ผู้ใช้รออยู่บนหน้าจอ) จะเข้ากลุ่มถัดไปก่อนงานปกติที่ค้างในคิว
+        ถ้าไม่ได้เปิด write-behind (หรือเรียกจาก thread เขียนเอง) จะทำทันทีและคืน Future ที่เสร็จแล้ว
+        """
+        future = Future()
+        q = self._write_queue
+        if q is not None and threading.current_thread() is not self._writer:
+            priority = self._URGENT if urgent else self._NORMAL
+            q.put((priority, next(self._write_seq), (future, fn, args, kwargs)))
+            return future
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _writer_loop(self, q: "queue.Queue", interval: float, max_ops: int):
+        stopping = False
+        while not stopping:
+            item = q.get()[2]
+            if item is self._STOP_WRITER:
+                break
+            group = [item]
+            deadline = time.monotonic() + interval
+            while len(group) < max_ops:
+                try:
+                    item = q.get(timeout=max(0.0, deadline - time.monotonic()))[2]
+                except queue.Empty:
+                    break
+                if item is self._STOP_WRITER:
+                    stopping = True
+                    break
+                group.append(item)
+            self._commit_group(group)
+        # งานที่เข้าคิวหลังสัญญาณหยุด
+        self._drain_write_queue(q)
+
+    def _drain_write_queue(self, q: "queue.Queue"):
+        leftover = []
+        while True:
+            try:
+                item = q.get_nowait()[2]
+            except queue.Empty:
+                break
+            if item is not self._STOP_WRITER:
+                leftover.append(item)
+        if leftover:
+            self._commit_group(leftover)
+
+    def _commit_group(self, group: list):
+        """รันงานทั้งกลุ่มใน transaction เดียว แล้วส่งผลให้ Future หลัง commit สำเร็จ"""
+        done = []
+        start = time.perf_counter()
+        try:
+            with self.transaction():
+                for future, fn, args, kwargs in group:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with self.transaction():
+                            result = fn(*args, **kwargs)
+                    except Exception as e:
+                        self._writer_stats["failed"] += 1
+                        future.set_exception(e)
+                        continue
+                    done.append((future, result))
+        except Exception as e:
+            # BEGIN / COMMIT ล้มเหลว: ไม่มีงานใดในกลุ่มถูกบันทึก
+            logger.error(f"Group commit of {len(group)} write(s) failed: {e}")
+            for future, *_ in group:
+                if not future.done():
+                    self._writer_stats["failed"] += 1
+                    future.set_exception(e)
+            return
+        stats = self._writer_stats
+        stats["groups"] += 1
+        stats["ops"] += len(group)
+        stats["max_group"] = max(stats["max_group"], len(group))
+        stats["commit_seconds"] += time.perf_counter() - start
+        for future, result in done:
+            future.set_result(result)
+
+    def get_writer_stats(self) -> Dict[str, Any]:
+        """สถิติของ thread เขียน: จำนวนกลุ่ม / งาน, ขนาดกลุ่มเฉลี่ยและสูงสุด, งานที่ล้มเหลว, งานที่รอในคิว"""
+        stats = dict(self._writer_stats)
+        stats["running"] = bool(self._writer and self._writer.is_alive())
+        stats["queued"] = self._write_queue.qsize() if self._write_queue else 0
+        stats["avg_group"] = stats["ops"] / stats["groups"] if stats["groups"] else 0.0
+        return stats
 
-            # Table: Supplier Stock (Legacy)
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS supplier_stock (
-                pdt_code TEXT,
-                supplier_name TEXT,
-                location TEXT,
-                qty REAL,
-                full_rolls REAL,
-                scrap_qty REAL,
-                PRIMARY KEY (pdt_code, supplier_name, location)
-            )
-            """)
+    # ----------------------------------------------------------------
+    # Schema Migrations (PRAGMA user_version)
+    # ----------------------------------------------------------------
+    # (version, คำอธิบาย, ชื่อเมธอด) แต่ละรายการรันครั้งเดียวใน transaction ของตัวเอง
+    # เพิ่ม migration ใหม่ต่อท้ายเท่านั้น ห้ามแก้ไขหรือเรียงลำดับรายการที่ปล่อยไปแล้วใหม่
+    MIGRATIONS = (
+        (1, "create base tables and indexes", "_migration_base_schema"),
+        (2, "rolls: width REAL, date_received DATETIME, length_original", "_migration_rolls_schema"),
+        (3, "dispatch: detailed schema, merge dispatch_legacy", "_migration_dispatch_schema"),
+        (4, "master_products: ensure searchable columns", "_migration_master_columns"),
+        (5, "logs: document_no / customer columns", "_migration_logs_search_columns"),
+        (6, "full-text indexes for rolls, master_products and logs", "_migration_search_indexes"),
+        (7, "declared index set (status, roll_id / timestamp composites)", "_migration_index_set"),
+        (8, "stock_summary table maintained by triggers on rolls", "_migration_stock_summary"),
+        (9, "change_log table and change-capture triggers", "_migration_change_log"),
+        (10, "rolls_archive table for depleted rolls", "_migration_rolls_archive"),
+        (11, "roll_id_sequences counter table", "_migration_roll_id_sequences"),
+        (12, "roll_id_gaps table for reserved ids that were never saved", "_migration_roll_id_gaps"),
+        (13, "rolls_fts trigger for INSERT OR REPLACE and orphan cleanup", "_migration_rolls_fts_replace"),
+        (14, "remove orphaned master_products_fts rows", "_migration_master_fts_orphans"),
+    )
+    SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+    def get_schema_version(self) -> int:
+        with self._read() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self) -> List[int]:
+        """
+        รัน migration ที่ยังไม่เคยรันตามลำดับ คืนรายการ version ที่รันในครั้งนี้
+        แต่ละ migration อยู่ใน BEGIN IMMEDIATE ของตัวเองพร้อมกับการตั้ง user_version
+        ถ้า migration ใดล้มเหลวจะ rollback เฉพาะตัวนั้นและหยุด (ครั้งหน้าจะลองใหม่จากจุดเดิม)
+        ตรวจ version ซ้ำหลังได้ write lock เพื่อไม่ให้สอง process รัน migration เดียวกันซ้ำ
+        """
+        applied = []
+        for version, description, method in self.MIGRATIONS:
+            with self.transaction() as conn:
+                current = conn.execute("PRAGMA user_version").fetchone()[0]
+                if current >= version:
+                    continue
+                logger.info(f"Applying schema migration {version}: {description}")
+                getattr(self, method)(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+            applied.append(version)
+        self._fts_tables = None
+        return applied
+
+    def _rebuild_table(self, cur, table: str, create_sql: str, renames: Optional[Dict[str, str]] = None):
+        """
+        เปลี่ยน schema ของตารางตามขั้นตอนที่ SQLite แนะนำ (ต้องอยู่ใน transaction):
+        สร้าง <table>_new -> คัดลอกเฉพาะคอลัมน์ที่มีทั้งสองฝั่ง -> DROP ตารางเดิม -> RENAME
+        create_sql ใช้ {table} แทนชื่อตาราง, renames แมพชื่อคอลัมน์เดิม -> ชื่อใหม่
+        index/trigger ของตารางเดิมจะหายไปพร้อม DROP TABLE ผู้เรียกต้องสร้างใหม่
+        """
+        renames = renames or {}
+        old_cols = list(self._table_columns(cur, table))
+        cur.execute(f"DROP TABLE IF EXISTS {table}_new")
+        cur.execute(create_sql.format(table=f"{table}_new"))
+        new_cols = list(self._table_columns(cur, f"{table}_new"))
+
+        pairs = [(old, renames.get(old, old)) for old in old_cols if renames.get(old, old) in new_cols]
+        if pairs:
+            src = ", ".join(f'"{old}"' for old, _ in pairs)
+            dst = ", ".join(f'"{new}"' for _, new in pairs)
+            cur.execute(f"INSERT INTO {table}_new ({dst}) SELECT {src} FROM {table}")
+        cur.execute(f"DROP TABLE {table}")
+        cur.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+    @staticmethod
+    def _table_columns(cur, table: str) -> Dict[str, str]:
+        """คืน {ชื่อคอลัมน์: ประเภท} ของตาราง (ว่างถ้าไม่มีตาราง)"""
+        return {row[1]: (row[2] or "").upper() for row in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+
+    def _migration_base_schema(self, cur):
+        """ตารางและ index พื้นฐาน (IF NOT EXISTS เพื่อรองรับฐานข้อมูลเดิมก่อนมี user_version)"""
+        cur.execute(ROLLS_TABLE_SQL.format(table="IF NOT EXISTS rolls"))
+        for sql in ROLLS_INDEXES:
+            cur.execute(sql)
+
+        # Table: Master Products
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS master_products (
+            pdt_code TEXT PRIMARY KEY,
+            pdt_name TEXT,
+            pdt_name_en TEXT,
+            unit_type TEXT,
+            spl_part_code TEXT,
+            scrapqty REAL,
+            create_name TEXT,
+            create_date TEXT,
+            update_name TEXT,
+            update_date TEXT,
+            last_buy_date TEXT,
+            lastdate TEXT,
+            pg_name TEXT,
+            cate_name TEXT,
+            spl_name TEXT,
+            spl_code TEXT,
+            location TEXT
+        )
+        """)
+
+        # Table: Logs (document_no / customer เพิ่มใน migration 5)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS logs (
+            id TEXT PRIMARY KEY,
+            timestamp TEXT,
+            action TEXT,
+            roll_id TEXT,
+            details TEXT,
+            user TEXT
+        )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_logs_action ON logs(action)")
+
+        # Table: Users
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password_hash TEXT,
+            role TEXT,
+            full_name TEXT,
+            created_at TEXT,
+            last_login TEXT
+        )
+        """)
+
+        # Table: Supplier Stock (Legacy)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS supplier_stock (
+            pdt_code TEXT,
+            supplier_name TEXT,
+            location TEXT,
+            qty REAL,
+            full_rolls REAL,
+            scrap_qty REAL,
+            PRIMARY KEY (pdt_code, supplier_name, location)
+        )
+        """)
 
-            # Table: Dispatch History (Detailed)
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS dispatch (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                roll_id TEXT,
-                pdt_code TEXT,
-                sub_part_code TEXT,
-                sup_code TEXT,
-                lot_no TEXT,
-                color TEXT,
-                width REAL,
-                length_dispatched REAL,
-                length_original REAL,
-                length_remaining REAL,
-                unit TEXT,
-                location TEXT,
-                supplier_name TEXT,
-                description TEXT,
-                document_no TEXT,
-                customer_code TEXT,
-                customer_name TEXT,
-                user TEXT
-            )
-            """)
+        # Table: Dispatch History (Detailed)
+        cur.execute(DISPATCH_TABLE_SQL.format(table="IF NOT EXISTS dispatch"))
 
-            # Create indexes for logs table (ต้องสร้างหลังจาก table ถูกสร้างแล้ว)
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_logs_action ON logs(action)")
-            
-            # --- Migration: Convert width from TEXT to REAL if needed ---
-            self._migrate_width_to_real(cur)
-            
-            # --- Migration: Convert date_received from TEXT to DATETIME if needed ---
-            self._migrate_date_to_datetime(cur)
-            
-            # --- Migration: Update dispatch schema if needed ---
-            self._migrate_dispatch_table(cur)
-            # Table: App Settings (Key-Value)
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS app_settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-            """)
-            
-            conn.commit()
+        # Table: App Settings (Key-Value)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS app_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """)
+
+    def _migration_rolls_schema(self, cur):
+        """
+        สร้างตาราง rolls ใหม่เมื่อ width ยังเป็น TEXT, date_received ยังเป็น TEXT หรือไม่มี length_original
+        (schema เก่าจาก script/migrate_db_schema.py รุ่นแรก) โดยเก็บข้อมูลเดิมไว้ทั้งหมด
+        """
+        cols = self._table_columns(cur, "rolls")
+        if (cols.get("width") == "REAL" and cols.get("date_received") == "DATETIME"
+                and "length_original" in cols):
+            return
+        self._rebuild_table(cur, "rolls", ROLLS_TABLE_SQL)
+        if "length_original" not in cols:
+            cur.execute("UPDATE rolls SET length_original = length WHERE length_original IS NULL")
+        for sql in ROLLS_INDEXES:
+            cur.execute(sql)
+
+    def _migration_dispatch_schema(self, cur):
+        """
+        อัปเกรดตาราง dispatch เป็น schema ละเอียดโดยไม่ทิ้งข้อมูลเดิม
+        และย้ายข้อมูลจาก dispatch_legacy (ที่ script/migrate_all.py รุ่นเก่าสร้างไว้) ถ้ามี
+        """
+        renames = {"lot": "lot_no", "spl_name": "supplier_name"}
+        if tuple(self._table_columns(cur, "dispatch")) != DISPATCH_COLUMNS:
+            self._rebuild_table(cur, "dispatch", DISPATCH_TABLE_SQL, renames)
+
+        has_legacy = cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='dispatch_legacy'"
+        ).fetchone()
+        if has_legacy:
+            pairs = [(c, renames.get(c, c)) for c in self._table_columns(cur, "dispatch_legacy")
+                     if renames.get(c, c) in DISPATCH_COLUMNS and renames.get(c, c) != "id"]
+            if pairs:
+                cur.execute(
+                    f"INSERT INTO dispatch ({', '.join(new for _, new in pairs)}) "
+                    f"SELECT {', '.join(old for old, _ in pairs)} FROM dispatch_legacy"
+                )
+            cur.execute("DROP TABLE dispatch_legacy")
+
+    def _migration_master_columns(self, cur):
+        """
+        master_products อาจถูกสร้างจากไฟล์ Master_Stock (มีคอลัมน์ตามไฟล์) จึงเติมคอลัมน์ที่ระบบใช้ค้นหาให้ครบ
+        """
+        cols = self._table_columns(cur, "master_products")
+        for col in self.MASTER_SEARCH_COLUMNS + ('location',):
+            if col not in cols:
+                cur.execute(f"ALTER TABLE master_products ADD COLUMN {col} TEXT")
+
+    def _migration_logs_search_columns(self, cur):
+        """เพิ่มคอลัมน์ document_no / customer ให้ตาราง logs และดึงค่าจาก details JSON มาเติม"""
+        cols = self._table_columns(cur, "logs")
+        for col in ('document_no', 'customer'):
+            if col not in cols:
+                cur.execute(f"ALTER TABLE logs ADD COLUMN {col} TEXT")
+        cur.execute("""
+        UPDATE logs SET
+            document_no = json_extract(details, '$.document_no'),
+            customer = COALESCE(json_extract(details, '$.customer'),
+                                json_extract(details, '$.customer_name'))
+        WHERE json_valid(details)
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_logs_document_no ON logs(document_no)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_logs_customer ON logs(customer)")
+
+    def _migration_search_indexes(self, cur):
+        """full-text index (ต้องอยู่หลัง migration ที่อาจสร้างตารางใหม่ เพราะ trigger ผูกกับตาราง)"""
+        self._init_fts(cur, "rolls", self.ROLL_SEARCH_COLUMNS, pk="roll_id")
+        self._init_fts(cur, "master_products", self.MASTER_SEARCH_COLUMNS)
+        self._init_fts(cur, "logs", self.LOG_SEARCH_COLUMNS)
+
+    def _migration_index_set(self, cur):
+        self._sync_indexes(cur)
+
+    def _migration_stock_summary(self, cur):
+        self._init_stock_summary(cur)
+        self._rebuild_stock_summary(cur)
+
+    def _migration_change_log(self, cur):
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT NOT NULL,
+            op TEXT NOT NULL,
+            pk
+        )
+        """)
+        for table, pk in self.CHANGE_TABLES.items():
+            self._init_change_triggers(cur, table, pk)
+
+    def _migration_rolls_archive(self, cur):
+        cur.execute(ROLLS_TABLE_SQL.format(table="IF NOT EXISTS rolls_archive"))
+        if "archived_at" not in self._table_columns(cur, "rolls_archive"):
+            cur.execute("ALTER TABLE rolls_archive ADD COLUMN archived_at TEXT")
+
+    def _migration_roll_id_sequences(self, cur):
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS roll_id_sequences (
+            prefix TEXT PRIMARY KEY,
+            last_value INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """)
+        # ม้วนที่บันทึกด้วยเลขที่กำหนดเอง (สแกนฉลากที่พิมพ์ไว้ก่อน, นำเข้า) ดันตัวนับให้ไม่ต่ำกว่าเลขนั้น
+        # ตัวนับจึงไม่ออกเลขที่มีอยู่แล้ว (INSERT OR REPLACE จะเขียนทับม้วนเดิม)
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS roll_id_sequences_ai AFTER INSERT ON rolls
+        WHEN {self._ROLL_ID_SEQ_MATCH.format(roll_id="new.roll_id")}
+        BEGIN
+            UPDATE roll_id_sequences
+            SET last_value = MAX(last_value, CAST(substr(new.roll_id, {self.ROLL_ID_PREFIX_LEN + 1}) AS INTEGER))
+            WHERE prefix = substr(new.roll_id, 1, {self.ROLL_ID_PREFIX_LEN});
+        END
+        """)
+
+    def _migration_roll_id_gaps(self, cur):
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS roll_id_gaps (
+            prefix TEXT NOT NULL,
+            first_value INTEGER NOT NULL,
+            last_value INTEGER NOT NULL,
+            reason TEXT,
+            user TEXT,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (prefix, first_value)
+        ) WITHOUT ROWID
+        """)
+
+    def _purge_fts_orphans(self, cur, table: str) -> int:
+        """ลบแถวใน <table>_fts ที่ไม่มีแถวในตารางหลักแล้ว (ค้างจาก INSERT OR REPLACE ก่อนมี trigger _bi)"""
+        if not cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                           (f"{table}_fts",)).fetchone():
+            return 0
+        cur.execute(f"DELETE FROM {table}_fts WHERE rowid NOT IN (SELECT rowid FROM {table})")
+        if cur.rowcount:
+            logger.info(f"Removed {cur.rowcount} orphaned row(s) from {table}_fts")
+        return cur.rowcount
+
+    def _migration_rolls_fts_replace(self, cur):
+        if self._init_fts(cur, "rolls", self.ROLL_SEARCH_COLUMNS, pk="roll_id"):
+            self._purge_fts_orphans(cur, "rolls")
+
+    def _migration_master_fts_orphans(self, cur):
+        self._purge_fts_orphans(cur, "master_products")
+
+    def _sync_indexes(self, cur, tables: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+        """
+        ทำให้ index ในฐานข้อมูลตรงกับ INDEXES (เฉพาะตารางที่ระบุ หรือทุกตารางที่ประกาศไว้)
+        คืน {"created": [...], "dropped": [...]} โดย index ที่คอลัมน์เปลี่ยนจะอยู่ในทั้งสองรายการ
+        """
+        wanted = {name: spec for name, spec in INDEXES.items() if tables is None or spec[0] in tables}
+        result = {"created": [], "dropped": []}
+        for table in {spec[0] for spec in wanted.values()}:
+            existing = [row[0] for row in cur.execute(
+                "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=? AND name GLOB 'idx_*'",
+                (table,)
+            ).fetchall()]
+            for name in existing:
+                columns = tuple(row[2] for row in cur.execute(f"PRAGMA index_info({name})").fetchall())
+                if name not in wanted or wanted[name][1] != columns:
+                    cur.execute(f"DROP INDEX {name}")
+                    result["dropped"].append(name)
+        for name, (table, columns) in wanted.items():
+            if cur.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (name,)).fetchone():
+                continue
+            cur.execute(f"CREATE INDEX {name} ON {table}({', '.join(columns)})")
+            result["created"].append(name)
+        return result
 
     def get_setting(self, key: str, default: Optional[str] = None) -> Optional[str]:
-        with self._lock:
-            with self._connect() as conn:
+        with self._timed_lock():
+            with self._read() as conn:
                 cur = conn.cursor()
                 cur.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
                 row = cur.fetchone()
@@ -265,151 +1048,412 @@ class StorageManager:
                 return default
 
     def set_setting(self, key: str, value: str):
-        with self._lock:
-            with self._connect() as conn:
+        with self._timed_lock():
+            with self._write() as conn:
                 cur = conn.cursor()
                 cur.execute("""
                 INSERT OR REPLACE INTO app_settings (key, value)
                 VALUES (?, ?)
                 """, (key, value))
-                conn.commit()
 
     def remove_setting(self, key: str):
-        with self._lock:
-            with self._connect() as conn:
+        with self._timed_lock():
+            with self._write() as conn:
                 cur = conn.cursor()
                 cur.execute("DELETE FROM app_settings WHERE key = ?", (key,))
-                conn.commit()
 
-    def _migrate_width_to_real(self, cur):
-        """ตรวจสอบและแปลงประเภทข้อมูลคอลัมน์ width เป็น REAL"""
-        try:
-            cur.execute("PRAGMA table_info(rolls)")
-            columns = cur.fetchall()
-            for col in columns:
-                if col[1] == 'width' and col[2].upper() == 'TEXT':
-                    logger.info("Migrating width column from TEXT to REAL...")
-                    # SQLite ไม่รองรับ ALTER COLUMN TYPE ตรงๆ ต้องสร้างตารางใหม่หรือใช้เทคนิคอื่น
-                    # ในที่นี้เราจะใช้วิธีเปลี่ยนชื่อและสร้างใหม่ถ้าเป็นระบบใหญ่ แต่สำหรับที่นี่
-                    # เราจะลองแปลงข้อมูลด้วย SQL ง่ายๆ ก่อน (SQLite ยอมให้เก็บเลขใน TEXT ได้)
-                    # แต่ถ้าอยากเปลี่ยน Type ถาวร ต้องทำแบบนี้:
-                    cur.execute("CREATE TABLE rolls_new AS SELECT * FROM rolls")
-                    cur.execute("DROP TABLE rolls")
-                    # สร้างตารางใหม่ด้วย schema REAL (ใช้ SQL ตรงๆ)
-                    cur.execute("""
-                    CREATE TABLE rolls (
-                        roll_id TEXT PRIMARY KEY, code TEXT, sub_part_code TEXT,
-                        sup_code TEXT, supplier_name TEXT, description TEXT,
-                        lot_no TEXT, quantity INTEGER, location TEXT,
-                        unit TEXT, color TEXT, width REAL, length REAL,
-                        status TEXT, date_received DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                    """)
-                    cur.execute("INSERT INTO rolls SELECT * FROM rolls_new")
-                    cur.execute("DROP TABLE rolls_new")
-                    logger.info("Migration complete.")
-                    break
-        except Exception as e:
-            logger.error(f"Migration error: {e}")
+    # ----------------------------------------------------------------
+    # Change Feed (change_log + PRAGMA data_version)
+    # ----------------------------------------------------------------
+    # ตารางที่ trigger บันทึกลง change_log {ตาราง: primary key}
+    CHANGE_TABLES = {
+        "rolls": "roll_id",
+        "master_products": "pdt_code",
+        "dispatch": "id",
+        "logs": "id",
+        "users": "username",
+    }
+    # จำนวนแถวล่าสุดของ change_log ที่เก็บไว้ (ผู้ติดตามที่ตามหลังเกินนี้จะได้เหตุการณ์ reset)
+    CHANGE_LOG_KEEP = 10000
+    # ตัด change_log ทุกกี่ commit
+    CHANGE_PRUNE_EVERY = 500
+
+    @staticmethod
+    def _init_change_triggers(cur, table: str, pk: str):
+        """
+        trigger ที่บันทึก (ตาราง, operation, primary key) ลง change_log ใน transaction เดียวกับการเขียน
+        seq เป็น AUTOINCREMENT จึงเรียงตามลำดับ commit และไม่ถูกใช้ซ้ำแม้ตัดแถวเก่าทิ้ง
+        INSERT OR REPLACE บันทึกเป็น insert (ไม่มี delete ของแถวเดิมเพราะ recursive_triggers ปิดอยู่)
+        """
+        for suffix, event, op, row in (("ai", "INSERT", "insert", "new"),
+                                       ("au", "UPDATE", "update", "new"),
+                                       ("ad", "DELETE", "delete", "old")):
+            cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS change_log_{table}_{suffix} AFTER {event} ON {table} BEGIN
+                INSERT INTO change_log (tbl, op, pk) VALUES ('{table}', '{op}', {row}.{pk});
+            END
+            """)
 
-    def _migrate_date_to_datetime(self, cur):
-        """ตรวจสอบและเปลี่ยนประเภทข้อมูล date_received เป็น DATETIME"""
+    def _last_change_seq(self) -> int:
+        with self._read() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+        return row[0] if row else 0
+
+    def _after_commit(self):
+        """เรียกหลัง commit ของ thread นี้: publish การเปลี่ยนแปลงถ้ามีผู้ติดตาม และตัด change_log เป็นระยะ"""
+        self._commit_count += 1
         try:
-            cur.execute("PRAGMA table_info(rolls)")
-            columns = cur.fetchall()
-            for col in columns:
-                if col[1] == 'date_received' and col[2].upper() == 'TEXT':
-                    logger.info("Migrating date_received column from TEXT to DATETIME...")
-                    cur.execute("CREATE TABLE rolls_new AS SELECT * FROM rolls")
-                    cur.execute("DROP TABLE rolls")
-                    self._init_db() # จะเรียกใช้ schema ใหม่ที่เป็น DATETIME
-                    cur.execute("INSERT INTO rolls SELECT * FROM rolls_new")
-                    cur.execute("DROP TABLE rolls_new")
-                    logger.info("Migration complete.")
-                    break
+            if self.changes.has_subscribers:
+                self.poll_changes()
+            if self._commit_count % self.CHANGE_PRUNE_EVERY == 0:
+                self.prune_change_log()
         except Exception as e:
-            logger.error(f"Date migration error: {e}")
+            logger.error(f"Error publishing changes: {e}")
+
+    def poll_changes(self, batch: int = 5000) -> int:
+        """
+        อ่าน change_log ต่อจาก revision ที่ publish ไปแล้ว รวมแถวที่ติดกันของตารางและ operation เดียวกัน
+        เป็น ChangeEvent แล้วส่งให้ self.changes คืนจำนวนเหตุการณ์ที่ส่ง
+        ถ้าแถวถัดไปถูกตัดทิ้งไปแล้ว (ตามหลังเกิน CHANGE_LOG_KEEP) จะส่งเหตุการณ์ reset นำหน้า
+        """
+        with self._change_lock:
+            if self._change_seq is None:
+                return 0
+            published = 0
+            while True:
+                with self._read() as conn:
+                    rows = conn.execute(
+                        "SELECT seq, tbl, op, pk FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                        (self._change_seq, batch)
+                    ).fetchall()
+                if not rows:
+                    break
+                events = []
+                if rows[0][0] != self._change_seq + 1:
+                    events.append(ChangeEvent("*", RESET, (), rows[0][0] - 1))
+                for (table, op), group in groupby(rows, key=lambda r: (r[1], r[2])):
+                    group = list(group)
+                    keys = tuple(dict.fromkeys(r[3] for r in group))
+                    events.append(ChangeEvent(table, op, keys, group[-1][0]))
+                self._change_seq = rows[-1][0]
+                if self.master_cache_size > 0:
+                    # การเขียนจาก process อื่น: ล้าง cache ตาม change_log (ของ process นี้ล้างไปแล้วตอนเขียน)
+                    for event in events:
+                        if event.op == RESET:
+                            self._invalidate_master()
+                        elif event.table == "master_products":
+                            self._invalidate_master(event.keys)
+                self.changes.publish(events)
+                published += len(events)
+                if len(rows) < batch:
+                    break
+            return published
+
+    def prune_change_log(self, keep: Optional[int] = None) -> int:
+        """ลบแถวเก่าของ change_log ให้เหลือ keep แถวล่าสุด คืนจำนวนแถวที่ลบ"""
+        keep = self.CHANGE_LOG_KEEP if keep is None else keep
+        with self._write() as conn:
+            cur = conn.execute(
+                "DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (keep,)
+            )
+            return cur.rowcount
+
+    def watch_changes(self, interval: float = 1.0):
+        """
+        เริ่ม thread เฝ้า PRAGMA data_version (เปลี่ยนเมื่อ connection อื่น รวมถึง process อื่น commit)
+        แล้ว poll_changes() การเขียนผ่าน StorageManager ตัวนี้ publish ทันทีหลัง commit อยู่แล้ว
+        thread นี้จึงมีไว้จับการเขียนจากภายนอก หยุดเมื่อเรียก close()
+        """
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._watch_stop.clear()
+
+        def run():
+            version = None
+            while not self._watch_stop.wait(interval):
+                try:
+                    with self._read() as conn:
+                        current = conn.execute("PRAGMA data_version").fetchone()[0]
+                    if current != version:
+                        version = current
+                        self.poll_changes()
+                except Exception as e:
+                    logger.error(f"Error watching database changes: {e}")
+
+        self._watcher = threading.Thread(target=run, name="storage-change-watcher", daemon=True)
+        self._watcher.start()
 
-    def _migrate_dispatch_table(self, cur):
-        """ตรวจสอบและอัปเกรดตาราง dispatch ให้ถูกต้อง และย้ายจาก dispatch_legacy (ถ้ามี)"""
+    # ----------------------------------------------------------------
+    # Full-Text Search (FTS5 trigram)
+    # ----------------------------------------------------------------
+    # คอลัมน์ของ rolls ที่ค้นหาแบบ substring ผ่าน rolls_fts ได้
+    ROLL_SEARCH_COLUMNS = (
+        'roll_id', 'code', 'lot_no', 'description', 'supplier_name', 'color', 'location'
+    )
+    # คอลัมน์ของ logs ที่ค้นหาผ่าน logs_fts ได้ (รวม details JSON)
+    LOG_SEARCH_COLUMNS = ('roll_id', 'action', 'user', 'document_no', 'customer', 'details')
+    # คอลัมน์ของ master_products ที่ค้นหาผ่าน master_products_fts ได้
+    MASTER_SEARCH_COLUMNS = (
+        'pdt_code', 'pdt_name', 'pdt_name_en', 'spl_name', 'spl_code',
+        'spl_part_code', 'cate_name', 'pg_name'
+    )
+
+    def _has_fts(self, table: str) -> bool:
+        """
+        ตรวจว่ามี <table>_fts หรือไม่ (ถาม sqlite_master ครั้งแรกที่ค้นหาแล้วเก็บไว้
+        เพื่อไม่ให้การเปิดโปรแกรมต้อง query เพิ่มนอกจากเช็ค user_version)
+        """
+        if self._fts_tables is None:
+            with self._read() as conn:
+                self._fts_tables = {
+                    row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+                    if row[0].endswith("_fts")
+                }
+        return f"{table}_fts" in self._fts_tables
+
+    def _init_fts(self, cur, table: str, columns, pk: Optional[str] = None) -> bool:
+        """
+        สร้าง <table>_fts (FTS5 tokenizer trigram) ผูก rowid กับตารางหลัก และ trigger สำหรับ sync
+        ตาราง FTS เก็บสำเนาข้อความเอง (ไม่ใช้ external content)
+        INSERT OR REPLACE ไม่เรียก trigger DELETE (recursive_triggers ปิดอยู่) และแถวใหม่ได้ rowid ใหม่
+        ถ้าระบุ pk จึงลบแถว FTS ของแถวเดิมที่ pk ซ้ำใน trigger BEFORE INSERT (แบบเดียวกับ stock_summary_bi)
+        ตารางที่มี pk ห้ามใช้ INSERT OR IGNORE / ON CONFLICT DO NOTHING (trigger จะลบแถว FTS ของแถวที่ไม่ถูกแทนที่)
+        คืน False ถ้า SQLite ไม่มี FTS5/trigram (ผู้เรียกจะ fallback เป็น LIKE)
+        """
+        fts = f"{table}_fts"
+        cols = ", ".join(columns)
+        new_cols = ", ".join(f"new.{c}" for c in columns)
         try:
-            # 1. เช็คว่ามี dispatch_legacy ไหม ถ้ามีให้ย้ายข้อมูลมา dispatch
-            cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='dispatch_legacy'")
-            if cur.fetchone():
-                logger.info("Migrating dispatch_legacy to dispatch...")
-                cur.execute("DROP TABLE IF EXISTS dispatch")
-                self._init_db()
-                cur.execute("INSERT INTO dispatch SELECT * FROM dispatch_legacy")
-                cur.execute("DROP TABLE dispatch_legacy")
-                logger.info("Migration from dispatch_legacy complete.")
-                return
-
-            # 2. เช็คโครงสร้างตาราง dispatch ปัจจุบัน
-            cur.execute("PRAGMA table_info(dispatch)")
-            columns = cur.fetchall()
-            if len(columns) > 0 and len(columns) < 20:
-                logger.info("Upgrading dispatch table schema...")
-                cur.execute("CREATE TABLE dispatch_temp AS SELECT * FROM dispatch")
-                cur.execute("DROP TABLE dispatch")
-                self._init_db()
-                # พยายามย้ายข้อมูลเดิมที่พอจะแมพได้
-                # (กรณีนี้ถ้าโครงสร้างเปลี่ยนเยอะ การ DROP แล้วสร้างใหม่อาจปลอดภัยกว่าถ้าเป็นช่วงพัฒนา)
-                logger.info("dispatch table upgraded.")
-        except Exception as e:
-            logger.error(f"Dispatch migration error: {e}")
+            exists = cur.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (fts,)
+            ).fetchone()
+            cur.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, tokenize='trigram')")
+            if pk:
+                cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_bi BEFORE INSERT ON {table} BEGIN
+                    DELETE FROM {fts} WHERE rowid IN (SELECT rowid FROM {table} WHERE {pk} = new.{pk});
+                END
+                """)
+            cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                DELETE FROM {fts} WHERE rowid = new.rowid;
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new_cols});
+            END
+            """)
+            cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                DELETE FROM {fts} WHERE rowid = old.rowid;
+            END
+            """)
+            cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+                DELETE FROM {fts} WHERE rowid = old.rowid;
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new_cols});
+            END
+            """)
+            if not exists:
+                logger.info(f"Building {table} full-text index...")
+                cur.execute(f"INSERT INTO {fts}(rowid, {cols}) SELECT rowid, {cols} FROM {table}")
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 trigram not available for {table}, falling back to LIKE search: {e}")
+            return False
+
+    def rebuild_search_indexes(self):
+        """สร้าง full-text index ใหม่ทั้งหมด (ล้างแถวค้างจากการเขียนผ่าน connection ภายนอก)"""
+        targets = [
+            ("rolls", self.ROLL_SEARCH_COLUMNS),
+            ("master_products", self.MASTER_SEARCH_COLUMNS),
+            ("logs", self.LOG_SEARCH_COLUMNS),
+        ]
+        with self.transaction() as conn:
+            for table, columns in targets:
+                if not self._has_fts(table):
+                    continue
+                cols = ", ".join(columns)
+                conn.execute(f"DELETE FROM {table}_fts")
+                conn.execute(f"INSERT INTO {table}_fts(rowid, {cols}) SELECT rowid, {cols} FROM {table}")
+
+    @staticmethod
+    def _fts_phrase(text: str, columns=None) -> str:
+        """แปลงข้อความเป็น FTS5 phrase (escape เครื่องหมายคำพูด) พร้อม column filter ถ้าระบุ"""
+        phrase = '"' + str(text).replace('"', '""') + '"'
+        if columns:
+            return "{" + " ".join(columns) + "} : " + phrase
+        return phrase
+
+    @staticmethod
+    def _like_pattern(text: str) -> str:
+        """แปลงข้อความเป็น pattern '%text%' ของ LIKE ... ESCAPE '\\' (ให้ \\ % _ ในคำค้นเป็นตัวอักษรธรรมดา
+        เหมือนการค้นผ่าน FTS)"""
+        escaped = str(text).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
+
+    def _can_use_fts(self, text: str, table: str = "rolls") -> bool:
+        # trigram ต้องมีอย่างน้อย 3 ตัวอักษร คำที่สั้นกว่าใช้ LIKE
+        return len(str(text)) >= 3 and self._has_fts(table)
+
+    def search_rolls_text(self, query: str, limit: Optional[int] = 500,
+                          fields: Optional[List[str]] = None) -> List[Roll]:
+        """
+        ค้นหาม้วนแบบ substring (ไม่สนตัวพิมพ์เล็ก/ใหญ่) ผ่าน FTS5 trigram
+        fields: จำกัดคอลัมน์ที่ค้นหา (ค่าเริ่มต้นคือ ROLL_SEARCH_COLUMNS ทั้งหมด)
+        limit=None คือไม่จำกัดจำนวน
+        """
+        limit = -1 if limit is None else int(limit)
+        query = (query or "").strip()
+        if not query:
+            return []
+        fields = [f for f in (fields or self.ROLL_SEARCH_COLUMNS) if f in self.ROLL_SEARCH_COLUMNS]
+        if not fields:
+            return []
+
+        if self._can_use_fts(query):
+            sql = (
+                f"SELECT {', '.join('rolls.' + c for c in ROLL_COLUMNS)} "
+                "FROM rolls_fts JOIN rolls ON rolls.rowid = rolls_fts.rowid "
+                "WHERE rolls_fts MATCH ? ORDER BY rank LIMIT ?"
+            )
+            params = [self._fts_phrase(query, fields), limit]
+        else:
+            sql = (f"SELECT {ROLL_SELECT} FROM rolls WHERE "
+                   + " OR ".join(f"{f} LIKE ? ESCAPE '\\'" for f in fields) + " LIMIT ?")
+            params = [self._like_pattern(query)] * len(fields) + [limit]
+        return self._fetch_rolls(sql, params)
 
     # ----------------------------------------------------------------
     # Roll Operations
     # ----------------------------------------------------------------
     def add_roll(self, roll: Union[Roll, Dict[str, Any]], user="system") -> bool:
         data = roll.to_dict() if isinstance(roll, Roll) else roll
-        with self._connect() as conn:
+        # ม้วนและ log roll_created ต้อง commit พร้อมกัน
+        with self.transaction() as conn:
             try:
                 columns = ", ".join(data.keys())
                 placeholders = ", ".join([f":{k}" for k in data.keys()])
                 query = f"INSERT OR REPLACE INTO rolls ({columns}) VALUES ({placeholders})"
                 
                 conn.execute(query, data)
-                conn.commit()
             except sqlite3.Error as e:
                 logger.error(f"Error adding roll: {e}")
                 return False
 
-        self.add_log(
-            action="roll_created",
-            roll_id=data.get('roll_id'),
-            details={
-                "code": data.get('code'),
-                "lot_no": data.get('lot_no'),
-                "location": data.get('location'),
-            },
-            user=user
-        )
+            self.add_log(
+                action="roll_created",
+                roll_id=data.get('roll_id'),
+                details={
+                    "code": data.get('code'),
+                    "lot_no": data.get('lot_no'),
+                    "location": data.get('location'),
+                },
+                user=user
+            )
         return True
 
-    def get_roll(self, roll_id: str) -> Optional[Roll]:
-        with self._connect() as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute("SELECT * FROM rolls WHERE roll_id = ?", (roll_id,))
-            row = cur.fetchone()
-        if not row:
-            return None
-        return Roll.from_db_row(dict(row))
+    def add_rolls(self, rolls: List[Union[Roll, Dict[str, Any]]], user="system",
+                  action: Optional[str] = None) -> List[bool]:
+        """
+        เพิ่มม้วนหลายม้วนใน transaction เดียวด้วย executemany
+
+        แต่ละม้วนจะได้ log roll_created และถ้าระบุ action (เช่น "receive") จะได้ log
+        ที่สองพร้อมข้อมูลม้วนเป็น details
+
+        Returns:
+            รายการ True/False ตามลำดับเดียวกับ rolls (False = ข้อมูลไม่ถูกต้องหรือบันทึกไม่สำเร็จ)
+        """
+        results = [False] * len(rolls)
+        roll_rows, log_rows, valid_idx = [], [], []
+        timestamp = datetime.now().isoformat()
+
+        for idx, roll in enumerate(rolls):
+            try:
+                if not isinstance(roll, Roll):
+                    roll = Roll(**{k: v for k, v in roll.items() if k in ROLL_COLUMNS})
+                if not roll.roll_id:
+                    raise ValueError("missing roll_id")
+            except (TypeError, ValueError) as e:
+                logger.error(f"Invalid roll at row {idx}: {e}")
+                continue
+
+            data = roll.to_dict()
+            roll_rows.append(tuple(data[c] for c in ROLL_COLUMNS))
+            log_rows.append(self._make_log_row("roll_created", roll.roll_id, {
+                "code": roll.code,
+                "lot_no": roll.lot_no,
+                "location": roll.location,
+            }, user, timestamp))
+            if action:
+                log_rows.append(self._make_log_row(action, roll.roll_id, data, user, timestamp))
+            valid_idx.append(idx)
+
+        if not roll_rows:
+            return results
+
+        columns = ", ".join(ROLL_COLUMNS)
+        placeholders = ", ".join("?" * len(ROLL_COLUMNS))
+        try:
+            with self.transaction() as conn:
+                conn.executemany(f"INSERT OR REPLACE INTO rolls ({columns}) VALUES ({placeholders})", roll_rows)
+                conn.executemany("""
+                INSERT INTO logs (id, timestamp, action, roll_id, details, user, document_no, customer)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, log_rows)
+        except sqlite3.Error as e:
+            logger.error(f"Error adding rolls in bulk: {e}")
+            return results
+
+        for idx in valid_idx:
+            results[idx] = True
+        return results
+
+    def _fetch_rows(self, query: str, params=(), row_factory: Callable = None) -> list:
+        """รัน query แล้วสร้างผลลัพธ์จาก tuple ผ่าน row_factory ของ cursor (ไม่ผ่าน sqlite3.Row / dict)"""
+        with self._read() as conn:
+            cur = conn.cursor()
+            cur.row_factory = row_factory
+            return cur.execute(query, params).fetchall()
+
+    def _fetch_rolls(self, query: str, params=()) -> List[Roll]:
+        """รัน query ที่ SELECT {ROLL_SELECT} แล้วคืนเป็น Roll"""
+        return self._fetch_rows(query, params, Roll.from_row)
+
+    def _projection(self, table: str, columns: Iterable[str], fill_missing: bool = False) -> tuple:
+        """
+        เตรียม columns= ของเมธอดอ่านข้อมูล คืน (select list, row_factory ที่สร้าง projected_row_type)
+        คอลัมน์ที่ไม่มีในตารางเป็น ValueError หรือเป็นค่าว่างเมื่อ fill_missing=True
+        (master_products มีคอลัมน์ไม่ตายตัวตามไฟล์ที่นำเข้า)
+        """
+        columns = tuple(columns)
+        row_type = projected_row_type(columns)
+        with self._read() as conn:
+            existing = self._table_columns(conn, table)
+        select = []
+        for col in columns:
+            if col in existing:
+                select.append(f'"{col}"')
+            elif fill_missing:
+                select.append(f"'' AS \"{col}\"")
+            else:
+                raise ValueError(f"Unknown column '{col}' in {table}")
+        return ", ".join(select), (lambda cursor, row: row_type(*row))
+
+    def get_roll(self, roll_id: str, include_archive: bool = True) -> Optional[Roll]:
+        """ค้นหาม้วนจาก roll_id ถ้าไม่อยู่ใน rolls จะค้นต่อใน rolls_archive (ม้วนที่ใช้หมดแล้ว ดู archive_rolls)"""
+        rolls = self._fetch_rolls(f"SELECT {ROLL_SELECT} FROM rolls WHERE roll_id = ?", (roll_id,))
+        if not rolls and include_archive:
+            rolls = self._fetch_rolls(f"SELECT {ROLL_SELECT} FROM rolls_archive WHERE roll_id = ?", (roll_id,))
+        return rolls[0] if rolls else None
 
     def get_roll_by_id(self, roll_id: str) -> Optional[Roll]:
         return self.get_roll(roll_id)
     
     def get_roll_by_code(self, code: str) -> Optional[Roll]:
         """ค้นหาม้วนจาก Code"""
-        with self._connect() as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute("SELECT * FROM rolls WHERE code = ? LIMIT 1", (code,))
-            row = cur.fetchone()
-            if not row:
-                return None
-        return Roll.from_db_row(dict(row))
+        rolls = self._fetch_rolls(f"SELECT {ROLL_SELECT} FROM rolls WHERE code = ? LIMIT 1", (code,))
+        return rolls[0] if rolls else None
 
     def update_roll(self, roll_id: str, **updates) -> bool:
+        """แก้ไขม้วนใน rolls คืน False ถ้าไม่พบม้วน (รวมถึงม้วนที่อยู่ใน rolls_archive ต้อง restore_roll ก่อน)"""
         if not updates:
             return False
         # Whitelist of allowed columns for the simplified schema
@@ -424,38 +1468,42 @@ class StorageManager:
             return False
         fields = ", ".join([f"{k}=?" for k in filtered_updates.keys()])
         values = list(filtered_updates.values()) + [roll_id]
-        with self._connect() as conn:
-            conn.execute(f"UPDATE rolls SET {fields} WHERE roll_id = ?", values)
-            conn.commit()
-        return True
+        with self._write() as conn:
+            updated = conn.execute(f"UPDATE rolls SET {fields} WHERE roll_id = ?", values).rowcount
+        if not updated:
+            logger.warning(f"update_roll: {roll_id} not found in rolls"
+                           + (" (archived, restore_roll first)" if self.get_roll(roll_id) else ""))
+        return updated > 0
 
     def cut_roll(self, roll_id: str, cut_length: float, user="system") -> bool:
-        roll = self.get_roll(roll_id)
-        if not roll or cut_length <= 0 or cut_length > roll.length:
-            return False
+        # อ่านและเขียนภายใน transaction เดียวกัน กันการตัดซ้อนจาก thread อื่น
+        with self.transaction():
+            roll = self.get_roll(roll_id)
+            if not roll or cut_length <= 0 or cut_length > roll.length:
+                return False
 
-        roll.length -= cut_length
-        if roll.length <= 0:
-            roll.status = "used"
-
-        self.update_roll(roll_id, length=roll.length, status=roll.status)
-
-        self.add_log(
-            action="roll_cut",
-            roll_id=roll_id,
-            details={
-                "cut_length": cut_length,
-                "remaining_length": roll.length,
-                "new_status": roll.status
-            },
-            user=user
-        )
+            roll.length -= cut_length
+            if roll.length <= 0:
+                roll.status = "used"
+
+            self.update_roll(roll_id, length=roll.length, status=roll.status)
+
+            self.add_log(
+                action="roll_cut",
+                roll_id=roll_id,
+                details={
+                    "cut_length": cut_length,
+                    "remaining_length": roll.length,
+                    "new_status": roll.status
+                },
+                user=user
+            )
         return True
 
     def get_master_data_count(self) -> int:
         """นับจำนวนแถวในตาราง master_products ใน SQLite"""
         try:
-            with self._connect() as conn:
+            with self._read() as conn:
                 cur = conn.execute("SELECT COUNT(*) FROM master_products")
                 count = cur.fetchone()[0]
             return count
@@ -463,23 +1511,29 @@ class StorageManager:
             logger.error(f"Error reading master product count from DB: {e}")
             return 0
 
-    def get_roll_count(self, roll_id: Optional[str] = None) -> int:
-        """นับจำนวนแถวใน rolls (ทั้งหมด หรือเฉพาะ roll_id)"""
-        with self._connect() as conn:
+    def get_roll_count(self, roll_id: Optional[str] = None, include_archive: bool = False) -> int:
+        """
+        นับจำนวนแถวใน rolls (ทั้งหมด หรือเฉพาะ roll_id)
+        include_archive: รวมม้วนใน rolls_archive ด้วย (การนับเฉพาะ roll_id ตรวจ archive ให้เสมอ)
+        """
+        with self._read() as conn:
             if roll_id:
                 cur = conn.execute(
-                    "SELECT COUNT(*) FROM rolls WHERE roll_id = ?",
-                    (roll_id,)
+                    "SELECT (SELECT COUNT(*) FROM rolls WHERE roll_id = ?)"
+                    " + (SELECT COUNT(*) FROM rolls_archive WHERE roll_id = ?)",
+                    (roll_id, roll_id)
                 )
             else:
                 cur = conn.execute("SELECT COUNT(*) FROM rolls")
             count = cur.fetchone()[0]
+        if include_archive and not roll_id:
+            count += self.get_archived_roll_count()
         return count
     
     def add_dispatch_record(self, roll, dispatch_length, document_no="", customer_code="", customer_name="", user="system"):
         """บันทึกข้อมูลการเบิกจ่ายลงในตาราง dispatch อย่างละเอียด"""
         try:
-            with self._connect() as conn:
+            with self._write() as conn:
                 conn.execute("""
                     INSERT INTO dispatch (
                         roll_id, pdt_code, sub_part_code, sup_code, lot_no,
@@ -496,16 +1550,23 @@ class StorageManager:
                     getattr(roll, 'supplier_name', ""), getattr(roll, 'description', ""),
                     document_no, customer_code, customer_name, user
                 ))
-                conn.commit()
             return True
         except Exception as e:
             logger.error(f"Error adding dispatch record: {e}")
             return False
 
-    def get_dispatch_history(self, limit=50):
-        """ดึงข้อมูลประวัติการเบิกจากตาราง dispatch"""
+    def get_dispatch_history(self, limit=50, columns: Optional[Iterable[str]] = None):
+        """
+        ดึงข้อมูลประวัติการเบิกจากตาราง dispatch
+        columns: ดึงเฉพาะคอลัมน์ที่ระบุ (คืน projected_row_type ซึ่งใช้ .get() / ["key"] ได้เหมือน dict)
+        """
         try:
-            with self._connect() as conn:
+            if columns:
+                select, row_factory = self._projection("dispatch", columns)
+                return self._fetch_rows(
+                    f"SELECT {select} FROM dispatch ORDER BY timestamp DESC LIMIT ?", (limit,), row_factory
+                )
+            with self._read() as conn:
                 cur = conn.execute(
                     "SELECT * FROM dispatch ORDER BY timestamp DESC LIMIT ?",
                     (limit,)
@@ -517,7 +1578,7 @@ class StorageManager:
 
     def get_roll_active_count(self, roll_id: Optional[str] = None) -> int:
             """นับจำนวนแถวใน rolls (ทั้งหมด หรือเฉพาะ roll_id)"""
-            with self._connect() as conn:
+            with self._read() as conn:
                 if roll_id:
                     cur = conn.execute(
                         "SELECT COUNT(*) FROM rolls WHERE roll_id = ? AND status = 'active'",
@@ -529,6 +1590,212 @@ class StorageManager:
             return count
 
     
+    # ----------------------------------------------------------------
+    # Roll Archive (ม้วนที่ใช้หมดแล้ว)
+    # ----------------------------------------------------------------
+    # ม้วน status = 'used' ที่ไม่มีความเคลื่อนไหวเกิน database.roll_archive_days วัน ถูกย้ายไป rolls_archive
+    # (ฐานข้อมูลเดียวกัน) ทำให้ rolls, index และการค้นหา / สแกนม้วนคงคลังเหลือเฉพาะม้วนที่ยังใช้งาน
+    # get_roll / get_roll_by_id / get_roll_count(roll_id) ค้นต่อใน archive ให้เอง แต่รายการ / สรุป / รายงาน
+    # (search_rolls_page, count_rolls, aggregate_stock, fetch_columns) อ่านเฉพาะ rolls จึงปิดไว้เป็นค่าเริ่มต้น
+    # ม้วนใน archive แก้ไขไม่ได้ (update_roll คืน False) ต้อง restore_roll ก่อน
+    # ความเคลื่อนไหวล่าสุด = ค่ามากสุดของ date_received, เวลาเบิกล่าสุดใน dispatch และ log ล่าสุดของม้วน
+    _ROLL_LAST_ACTIVITY_SQL = """
+        MAX(COALESCE(r.date_received, ''),
+            COALESCE((SELECT MAX(d.timestamp) FROM dispatch AS d WHERE d.roll_id = r.roll_id), ''),
+            COALESCE((SELECT MAX(l.timestamp) FROM logs AS l WHERE l.roll_id = r.roll_id), ''))
+    """
+
+    def archive_rolls(self, older_than_days: Optional[int] = None, now: Optional[datetime] = None,
+                      batch: int = 500) -> int:
+        """
+        ย้ายม้วนที่ใช้หมดแล้วและไม่มีความเคลื่อนไหวเกิน older_than_days วัน ไป rolls_archive คืนจำนวนม้วนที่ย้าย
+        ทำทีละ batch ม้วนต่อ transaction เพื่อไม่ถือ lock การเขียนนาน (เรียกจาก thread เบื้องหลังได้)
+        """
+        from core.config import config
+        days = int(older_than_days if older_than_days is not None
+                   else config.get('database.roll_archive_days', 0))
+        if days <= 0:
+            return 0
+        cutoff = ((now or datetime.now()) - timedelta(days=days)).date().isoformat()
+        archived_at = (now or datetime.now()).isoformat()
+        moved = 0
+        while True:
+            with self.transaction() as conn:
+                ids = [r[0] for r in conn.execute(f"""
+                    SELECT r.roll_id FROM rolls AS r
+                    WHERE r.status = 'used' AND {self._ROLL_LAST_ACTIVITY_SQL} < ?
+                    LIMIT ?
+                """, (cutoff, int(batch)))]
+                if not ids:
+                    break
+                marks = ", ".join("?" * len(ids))
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO rolls_archive ({ROLL_SELECT}, archived_at)
+                    SELECT {ROLL_SELECT}, ? FROM rolls WHERE roll_id IN ({marks})
+                """, [archived_at, *ids])
+                conn.execute(f"DELETE FROM rolls WHERE roll_id IN ({marks})", ids)
+            moved += len(ids)
+            self._archived_roll_count = None
+        if moved:
+            logger.info(f"Archived {moved} used roll(s) idle since before {cutoff}")
+        return moved
+
+    def restore_roll(self, roll_id: str) -> bool:
+        """ย้ายม้วนจาก rolls_archive กลับเข้า rolls (เช่น ต้องแก้ไขหรือรับคืน) คืน False ถ้าไม่มีใน archive"""
+        with self.transaction() as conn:
+            cur = conn.execute(f"""
+                INSERT INTO rolls ({ROLL_SELECT})
+                SELECT {ROLL_SELECT} FROM rolls_archive WHERE roll_id = ?
+                  AND NOT EXISTS (SELECT 1 FROM rolls WHERE roll_id = ?)
+            """, (roll_id, roll_id))
+            conn.execute("DELETE FROM rolls_archive WHERE roll_id = ?", (roll_id,))
+        self._archived_roll_count = None
+        return cur.rowcount > 0
+
+    def get_archived_roll_count(self) -> int:
+        """
+        จำนวนม้วนใน rolls_archive (เก็บค่าไว้จนกว่า archive_rolls / restore_roll จะเปลี่ยน archive
+        เพื่อไม่ให้ Dashboard ต้องนับทั้ง archive ทุกครั้งที่รีเฟรช)
+        """
+        if self._archived_roll_count is None:
+            with self._read() as conn:
+                self._archived_roll_count = conn.execute("SELECT COUNT(*) FROM rolls_archive").fetchone()[0]
+        return self._archived_roll_count
+
+    # ----------------------------------------------------------------
+    # Roll ID Sequence (ตัวนับต่อ prefix ปี)
+    # ----------------------------------------------------------------
+    # Roll ID = R + ปี 2 หลัก + ลำดับ 6 หลัก (เช่น R26000001) ตัวนับล่าสุดของแต่ละ prefix อยู่ใน roll_id_sequences
+    ROLL_ID_PREFIX_LEN = 3
+    ROLL_ID_DIGITS = 6
+    # roll_id ที่เป็น prefix ปีตามด้วยตัวเลขล้วน ({roll_id} คือคอลัมน์ / ค่าที่ตรวจ)
+    _ROLL_ID_SEQ_MATCH = ("{roll_id} GLOB 'R[0-9][0-9][0-9]*' "
+                          "AND substr({roll_id}, 4) NOT GLOB '*[^0-9]*'")
+
+    @staticmethod
+    def roll_id_prefix(when: Optional[datetime] = None) -> str:
+        """prefix ของปี เช่น R26 สำหรับปี 2026"""
+        return f"R{(when or datetime.now()):%y}"
+
+    def _seed_roll_id_sequence(self, conn, prefix: str) -> int:
+        """ลำดับสูงสุดที่ใช้ไปแล้วของ prefix จาก rolls และ rolls_archive (อ่านทั้งปีครั้งเดียวตอนเริ่มตัวนับ)"""
+        match = self._ROLL_ID_SEQ_MATCH.format(roll_id="roll_id")
+        row = conn.execute(f"""
+            SELECT MAX(CAST(substr(roll_id, {self.ROLL_ID_PREFIX_LEN + 1}) AS INTEGER)) FROM (
+                SELECT roll_id FROM rolls WHERE roll_id GLOB ?1 AND {match}
+                UNION ALL
+                SELECT roll_id FROM rolls_archive WHERE roll_id GLOB ?1 AND {match}
+            )
+        """, (f"{prefix}*",)).fetchone()
+        return row[0] or 0
+
+    def _allocate_roll_block(self, count: int, prefix: Optional[str] = None) -> RollIDBlock:
+        """
+        เพิ่มตัวนับของ prefix ทีละ count ด้วย UPDATE ... RETURNING ครั้งเดียวใน transaction แบบ BEGIN IMMEDIATE
+        จึงไม่ซ้ำกันแม้หลายเครื่อง / หลาย process ใช้ฐานข้อมูลเดียวกัน และไม่ขึ้นกับจำนวนม้วนในปี
+        """
+        count = int(count)
+        prefix = prefix or self.roll_id_prefix()
+        if count < 1:
+            return RollIDBlock(prefix, 1, 0, self.ROLL_ID_DIGITS)
+        with self.transaction() as conn:
+            row = conn.execute(
+                "UPDATE roll_id_sequences SET last_value = last_value + ? WHERE prefix = ? RETURNING last_value",
+                (count, prefix)
+            ).fetchall()
+            if row:
+                last = row[0][0]
+            else:
+                last = self._seed_roll_id_sequence(conn, prefix) + count
+                conn.execute("INSERT INTO roll_id_sequences (prefix, last_value) VALUES (?, ?)", (prefix, last))
+        return RollIDBlock(prefix, last - count + 1, last, self.ROLL_ID_DIGITS)
+
+    def allocate_roll_ids(self, count: int = 1, prefix: Optional[str] = None) -> List[str]:
+        """
+        จอง Roll ID ใหม่ count เลขที่ติดกันของ prefix (ค่าเริ่มต้นคือปีปัจจุบัน)
+        เลขที่จองแล้วไม่ถูกคืน ถ้าไม่ได้บันทึกม้วนจะเป็นเลขที่ข้ามไป (ใช้ reserve_roll_ids เพื่อคืน / บันทึกช่องว่าง)
+        """
+        return self._allocate_roll_block(count, prefix).ids
+
+    @contextmanager
+    def reserve_roll_ids(self, count: int, prefix: Optional[str] = None, user="system"):
+        """
+        จอง Roll ID count เลขที่ติดกันในครั้งเดียวสำหรับการรับเข้าเป็นชุด เมื่อออกจาก block
+        เลขที่ไม่ได้บันทึกเป็นม้วน (batch ล้มเหลวทั้งหมดหรือบางส่วน) จะถูกจัดการด้วย release_roll_ids
+
+        Example:
+            with storage.reserve_roll_ids(len(rows), user=username) as block:
+                for data, roll_id in zip(rows, block.ids):
+                    data["roll_id"] = roll_id
+                storage.add_rolls(rows, user=username)
+        """
+        block = self._allocate_roll_block(count, prefix)
+        reason = "not saved"
+        try:
+            yield block
+        except BaseException as e:
+            reason = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            try:
+                self.release_roll_ids(block, reason=reason, user=user)
+            except sqlite3.Error as e:
+                logger.error(f"Error releasing roll ids {block.format(block.first)}-{block.format(block.last)}: {e}")
+
+    def release_roll_ids(self, block: RollIDBlock, reason: str = "", user="system") -> Dict[str, int]:
+        """
+        จัดการเลขใน block ที่ไม่มีม้วนใน rolls:
+        - เลขท้าย block คืนให้ตัวนับ ถ้ายังไม่มีใครจองต่อจาก block (ตัวนับยังเท่ากับ last) ไม่เกิดช่องว่าง
+        - เลขที่เหลือบันทึกเป็นช่วงใน roll_id_gaps (ดูด้วย get_roll_id_gaps) เพื่อให้ตรวจสอบเลขที่หายไปได้
+
+        Returns:
+            {"released": จำนวนเลขที่คืนให้ตัวนับ, "gaps": จำนวนเลขที่บันทึกเป็นช่องว่าง}
+        """
+        if block.count == 0:
+            return {"released": 0, "gaps": 0}
+        plen = len(block.prefix)
+        with self.transaction() as conn:
+            used = {int(roll_id[plen:]) for (roll_id,) in conn.execute(
+                f"SELECT roll_id FROM rolls WHERE roll_id BETWEEN ? AND ? "
+                f"AND {self._ROLL_ID_SEQ_MATCH.format(roll_id='roll_id')}",
+                (block.format(block.first), block.format(block.last)))}
+            unused = [n for n in range(block.first, block.last + 1) if n not in used]
+            released = 0
+            tail = block.last + 1
+            while unused and unused[-1] == tail - 1:
+                tail = unused.pop()
+            if tail <= block.last:
+                if conn.execute(
+                    "UPDATE roll_id_sequences SET last_value = ? WHERE prefix = ? AND last_value = ? RETURNING 1",
+                    (tail - 1, block.prefix, block.last)
+                ).fetchall():
+                    released = block.last - tail + 1
+                else:
+                    unused.extend(range(tail, block.last + 1))
+            now = datetime.now().isoformat()
+            runs = [[n for _, n in run] for _, run in groupby(enumerate(unused), lambda p: p[1] - p[0])]
+            conn.executemany(
+                "INSERT OR REPLACE INTO roll_id_gaps (prefix, first_value, last_value, reason, user, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(block.prefix, run[0], run[-1], reason, user, now) for run in runs]
+            )
+        for run in runs:
+            logger.warning(f"Roll ids {block.format(run[0])}-{block.format(run[-1])} were reserved but not saved "
+                           f"({reason})")
+        return {"released": released, "gaps": len(unused)}
+
+    def get_roll_id_gaps(self, prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """ช่วงเลขที่จองแล้วแต่ไม่ได้บันทึกเป็นม้วน เรียงตาม prefix และลำดับ"""
+        query = "SELECT prefix, first_value, last_value, reason, user, created_at FROM roll_id_gaps"
+        params = ()
+        if prefix:
+            query += " WHERE prefix = ?"
+            params = (prefix,)
+        with self._read() as conn:
+            cur = conn.execute(query + " ORDER BY prefix, first_value", params)
+            columns = [c[0] for c in cur.description]
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+
     # ----------------------------------------------------------------
     # Master Product Operations
     # ----------------------------------------------------------------
@@ -537,32 +1804,223 @@ class StorageManager:
         if not data.get('pdt_code'):
             return False
             
-        with self._connect() as conn:
+        with self._write() as conn:
             try:
                 # Dynamically build the INSERT query based on dictionary keys
+                # ใช้ ON CONFLICT DO UPDATE (แถวเดิมคง rowid) แทน INSERT OR REPLACE ซึ่งทิ้งแถวเก่าใน
+                # master_products_fts ไว้ทุกครั้งที่บันทึกซ้ำ (ไม่มี trigger DELETE เพราะ recursive_triggers ปิดอยู่)
                 columns = ", ".join(data.keys())
                 placeholders = ", ".join([f":{k}" for k in data.keys()])
-                query = f"INSERT OR REPLACE INTO master_products ({columns}) VALUES ({placeholders})"
+                updates = ", ".join(f"{k}=excluded.{k}" for k in data.keys() if k != "pdt_code")
+                query = (f"INSERT INTO master_products ({columns}) VALUES ({placeholders}) "
+                         + (f"ON CONFLICT(pdt_code) DO UPDATE SET {updates}" if updates
+                            else "ON CONFLICT(pdt_code) DO NOTHING"))
                 
                 conn.execute(query, data)
-                conn.commit()
-                return True
             except sqlite3.Error as e:
                 logger.error(f"Error adding master product: {e}")
                 return False
+        self._invalidate_master((data['pdt_code'],))
+        return True
+
+    def upsert_master_products(self, products: Iterable[Union[MasterProduct, Dict[str, Any]]],
+                               chunk_size: int = 1000,
+                               columns: Optional[List[str]] = None,
+                               progress_callback: Optional[Callable[[int, Optional[int]], None]] = None) -> int:
+        """
+        นำเข้า/อัปเดตสินค้าหลักจำนวนมากด้วย executemany + ON CONFLICT(pdt_code) DO UPDATE
+        - สร้างรายการคอลัมน์และ SQL ครั้งเดียว (จาก columns หรือ key ของแถวแรก ที่มีอยู่จริงในตาราง)
+        - คอลัมน์ที่ไม่ได้ส่งมาจะคงค่าเดิมไว้ (ต่างจาก INSERT OR REPLACE)
+        - commit ทีละ chunk_size แถว และเรียก progress_callback(done, total) หลังแต่ละ chunk
+        คืนจำนวนแถวที่บันทึกสำเร็จ (แถวที่ไม่มี pdt_code จะถูกข้าม)
+        """
+        total = len(products) if hasattr(products, "__len__") else None
+        chunk_size = max(1, int(chunk_size))
+
+        with self._read() as conn:
+            table_columns = [row[1] for row in conn.execute("PRAGMA table_info(master_products)")]
+
+        sql = None
+        done = 0
+        chunk = []
+
+        def flush():
+            nonlocal done
+            with self.transaction() as conn:
+                conn.executemany(sql, chunk)
+            self._invalidate_master(row[0] for row in chunk)
+            done += len(chunk)
+            chunk.clear()
+            if progress_callback:
+                progress_callback(done, total)
+
+        try:
+            for product in products:
+                data = product.to_dict() if isinstance(product, MasterProduct) else product
+                if not data.get("pdt_code"):
+                    continue
+
+                if sql is None:
+                    keys = columns or list(data.keys())
+                    columns = ["pdt_code"] + [k for k in keys if k in table_columns and k != "pdt_code"]
+                    updates = ", ".join(f"{c}=excluded.{c}" for c in columns[1:])
+                    sql = (
+                        f"INSERT INTO master_products ({', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' * len(columns))}) "
+                        + (f"ON CONFLICT(pdt_code) DO UPDATE SET {updates}" if updates
+                           else "ON CONFLICT(pdt_code) DO NOTHING")
+                    )
+
+                chunk.append(tuple(data.get(c) for c in columns))
+                if len(chunk) >= chunk_size:
+                    flush()
+
+            if chunk:
+                flush()
+        except sqlite3.Error as e:
+            logger.error(f"Error upserting master products after {done} rows: {e}")
+        return done
+
+    def search_master(self, query: str, limit: Optional[int] = 200,
+                      fields: Optional[List[str]] = None) -> List[MasterProduct]:
+        """
+        ค้นหาสินค้าหลักแบบ substring ผ่าน FTS5 trigram เรียงตามความเกี่ยวข้อง (bm25)
+        fields: จำกัดคอลัมน์ที่ค้นหา (ค่าเริ่มต้นคือ MASTER_SEARCH_COLUMNS ทั้งหมด)
+        limit=None คือไม่จำกัดจำนวน
+        """
+        limit = -1 if limit is None else int(limit)
+        query = (query or "").strip()
+        if not query:
+            return []
+        fields = [f for f in (fields or self.MASTER_SEARCH_COLUMNS) if f in self.MASTER_SEARCH_COLUMNS]
+        if not fields:
+            return []
+
+        if self._can_use_fts(query, "master_products"):
+            sql = (
+                "SELECT master_products.* FROM master_products_fts "
+                "JOIN master_products ON master_products.rowid = master_products_fts.rowid "
+                "WHERE master_products_fts MATCH ? ORDER BY rank LIMIT ?"
+            )
+            params = [self._fts_phrase(query, fields), limit]
+        else:
+            sql = ("SELECT * FROM master_products WHERE "
+                   + " OR ".join(f"{f} LIKE ? ESCAPE '\\'" for f in fields) + " LIMIT ?")
+            params = [self._like_pattern(query)] * len(fields) + [limit]
+
+        with self._read() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [MasterProduct.from_db_row(dict(row)) for row in rows]
+
+    def add_master_columns(self, columns: Dict[str, str]) -> List[str]:
+        """
+        เพิ่มคอลัมน์ที่ยังไม่มีให้ master_products (เช่น คอลัมน์เพิ่มเติมจากไฟล์ Master_Stock)
+        columns: {ชื่อคอลัมน์: ประเภท SQLite (TEXT/REAL)} คืนรายชื่อคอลัมน์ที่เพิ่มจริง
+        """
+        added = []
+        with self.transaction() as conn:
+            existing = self._table_columns(conn, "master_products")
+            for name, col_type in columns.items():
+                name = str(name).strip()
+                if not name or name in existing or '"' in name:
+                    continue
+                col_type = col_type if col_type in ("TEXT", "REAL", "INTEGER") else "TEXT"
+                conn.execute(f'ALTER TABLE master_products ADD COLUMN "{name}" {col_type}')
+                added.append(name)
+        if added:
+            self._invalidate_master()
+        return added
 
     def get_master_product(self, pdt_code: str) -> Optional[MasterProduct]:
-        with self._connect() as conn:
-            conn.row_factory = sqlite3.Row
+        """
+        อ่านสินค้าหลักผ่าน LRU cache (ผลที่ไม่พบก็ถูก cache ไว้ด้วย) ออบเจกต์ที่คืนถูกใช้ร่วมกัน ห้ามแก้ไข
+        ภายใน transaction() จะอ่านจากฐานข้อมูลและไม่เก็บลง cache เพราะอาจเห็นข้อมูลที่ยังไม่ commit
+        """
+        if self.master_cache_size > 0:
+            with self._master_lock:
+                if pdt_code in self._master_cache:
+                    self._master_cache.move_to_end(pdt_code)
+                    self._master_stats["hits"] += 1
+                    return self._master_cache[pdt_code]
+                self._master_stats["misses"] += 1
+                generation = self._master_generation
+
+        with self._read() as conn:
             cur = conn.execute("SELECT * FROM master_products WHERE pdt_code = ?", (pdt_code,))
             row = cur.fetchone()
-        if not row:
-            return None
-        return MasterProduct.from_db_row(dict(row))
-
-    def get_all_master_products(self) -> List[MasterProduct]:
-        with self._connect() as conn:
-            conn.row_factory = sqlite3.Row
+        product = MasterProduct.from_db_row(dict(row)) if row else None
+
+        if self.master_cache_size > 0 and not getattr(self._local, "tx_depth", 0):
+            with self._master_lock:
+                # ถ้ามีการ invalidate ระหว่างอ่าน ค่าที่อ่านได้อาจเก่าแล้ว ไม่ต้องเก็บ
+                if generation == self._master_generation:
+                    self._master_cache[pdt_code] = product
+                    while len(self._master_cache) > self.master_cache_size:
+                        self._master_cache.popitem(last=False)
+        return product
+
+    def preload_master_products(self) -> int:
+        """โหลดสินค้าหลักทั้งหมดเข้า cache (ขยายขนาด cache ให้พอ) คืนจำนวนที่โหลด"""
+        with self._master_lock:
+            generation = self._master_generation
+        products = self.get_all_master_products()
+        with self._master_lock:
+            if generation != self._master_generation:
+                return 0
+            self.master_cache_size = max(self.master_cache_size, len(products))
+            for product in products:
+                self._master_cache[product.pdt_code] = product
+        return len(products)
+
+    def _invalidate_master(self, pdt_codes: Optional[Iterable[str]] = None):
+        """
+        ลบสินค้าที่ระบุออกจาก cache (None = ล้างทั้งหมด) เรียกทันทีหลังเขียน master_products (write-through)
+        ถ้าอยู่ใน transaction() จะเก็บไว้ล้างหลัง commit เพราะ thread อื่นยังอ่านค่าเดิมและเก็บลง cache ได้จนกว่าจะ commit
+        """
+        if getattr(self._local, "tx_depth", 0):
+            pending = getattr(self._local, "master_pending", None)
+            if pending is None:
+                pending = self._local.master_pending = set()
+            if pdt_codes is None:
+                pending.add(None)
+            else:
+                pending.update(pdt_codes)
+            return
+        with self._master_lock:
+            self._master_generation += 1
+            self._master_stats["invalidations"] += 1
+            if pdt_codes is None:
+                self._master_cache.clear()
+            else:
+                for code in pdt_codes:
+                    self._master_cache.pop(code, None)
+
+    def _flush_master_invalidations(self):
+        """ล้าง cache ตามการเขียน master_products ที่เพิ่ง commit ใน transaction() ของ thread นี้"""
+        pending = getattr(self._local, "master_pending", None)
+        if pending:
+            self._local.master_pending = set()
+            self._invalidate_master(None if None in pending else pending)
+
+    def get_master_cache_stats(self) -> Dict[str, Any]:
+        """สถิติของ master product cache: hits / misses / invalidations, จำนวนที่เก็บ และ hit rate"""
+        with self._master_lock:
+            stats = dict(self._master_stats)
+            stats["size"] = len(self._master_cache)
+        stats["capacity"] = self.master_cache_size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def get_all_master_products(self, columns: Optional[Iterable[str]] = None) -> List[MasterProduct]:
+        """
+        columns: ดึงเฉพาะคอลัมน์ที่ระบุ (คืน projected_row_type) แทนการอ่านทุกคอลัมน์ของตารางที่กว้างตามไฟล์ Master_Stock
+        คอลัมน์ที่ไม่มีในตารางจะได้ค่าว่าง
+        """
+        if columns:
+            select, row_factory = self._projection("master_products", columns, fill_missing=True)
+            return self._fetch_rows(f"SELECT {select} FROM master_products", (), row_factory)
+        with self._read() as conn:
             cur = conn.execute("SELECT * FROM master_products")
             rows = cur.fetchall()
         return [MasterProduct.from_db_row(dict(row)) for row in rows]
@@ -570,7 +2028,7 @@ class StorageManager:
     def get_master_autocomplete_data(self) -> Dict[str, List[str]]:
         """Get unique values for autocomplete from master_products table"""
         try:
-            with self._connect() as conn:
+            with self._read() as conn:
                 data = {}
                 fields = {
                     'pdt_code': 'skus',
@@ -590,7 +2048,7 @@ class StorageManager:
     def get_supplier_stock_names(self) -> List[str]:
         """Get unique supplier names from supplier_stock table"""
         try:
-            with self._connect() as conn:
+            with self._read() as conn:
                 cur = conn.execute("SELECT DISTINCT supplier_name FROM supplier_stock WHERE supplier_name IS NOT NULL AND supplier_name != ''")
                 return [str(row[0]) for row in cur.fetchall()]
         except Exception as e:
@@ -602,20 +2060,20 @@ class StorageManager:
             return False
         fields = ", ".join([f"{k}=?" for k in updates.keys()])
         values = list(updates.values()) + [pdt_code]
-        with self._connect() as conn:
+        with self._write() as conn:
             try:
                 conn.execute(f"UPDATE master_products SET {fields} WHERE pdt_code = ?", values)
-                conn.commit()
-                return True
             except sqlite3.Error as e:
                 logger.error(f"Error updating master product: {e}")
                 return False
+        self._invalidate_master((pdt_code, updates.get("pdt_code", pdt_code)))
+        return True
 
     def delete_master_product(self, pdt_code: str) -> bool:
-        with self._connect() as conn:
+        with self._write() as conn:
             cur = conn.execute("DELETE FROM master_products WHERE pdt_code = ?", (pdt_code,))
-            conn.commit()
-            return cur.rowcount > 0
+        self._invalidate_master((pdt_code,))
+        return cur.rowcount > 0
 
     def save_master_products(self):
         # No-op since SQLite auto-saves
@@ -624,39 +2082,238 @@ class StorageManager:
     # ----------------------------------------------------------------
     # Logs
     # ----------------------------------------------------------------
+    # transactional: log อยู่ใน transaction เดียวกับงานที่บันทึก (ม้วนกับ log commit พร้อมกัน)
+    # buffered: งานไม่ต้องรอเขียน log, log ปรากฏในฐานข้อมูลภายใน log_flush_ms
+    #           ถ้าโปรแกรมดับกะทันหันจะเสีย log ใน buffer ได้ไม่เกินช่วงนั้น (log_buffer_size แถว)
+    LOG_DURABILITY = ('transactional', 'buffered')
+    _LOG_INSERT_SQL = """
+        INSERT INTO logs (id, timestamp, action, roll_id, details, user, document_no, customer)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
     def add_log(self, action: str, roll_id: str, details: Dict[str, Any], user: str = "system") -> str:
-        log_id = str(uuid.uuid4())
-        log_entry = LogEntry(
-            id=log_id,
-            timestamp=datetime.now().isoformat(),
-            action=action,
-            roll_id=roll_id,
-            details=details,
-            user=user
-        )
-        with self._connect() as conn:
-            conn.execute("""
-            INSERT INTO logs (id, timestamp, action, roll_id, details, user)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """, (log_entry.id, log_entry.timestamp, log_entry.action,
-                  log_entry.roll_id, json.dumps(log_entry.details), log_entry.user))
-            conn.commit()
-        return log_id
+        row = self._make_log_row(action, roll_id, details, user)
+        if self.log_durability == 'buffered':
+            with self._log_lock:
+                self._log_buffer.append(row)
+                self._log_stats["buffered"] += 1
+                full = len(self._log_buffer) >= self.log_buffer_size
+            if full:
+                if getattr(self._local, "tx_depth", 0):
+                    # ห้าม flush ใน transaction ของผู้เรียก (ถ้า rollback log ของ thread อื่นจะหายไปด้วย)
+                    self._log_wakeup.set()
+                else:
+                    self.flush_logs()
+            return row[0]
+        with self._write() as conn:
+            conn.execute(self._LOG_INSERT_SQL, row)
+        return row[0]
+
+    def flush_logs(self) -> int:
+        """
+        เขียน log ที่ค้างใน buffer ลงฐานข้อมูลด้วย executemany ครั้งเดียว คืนจำนวนแถวที่เขียน
+        ถูกเรียกก่อนการอ่าน logs ทุกครั้ง (ยกเว้นภายใน transaction) เพื่อให้เห็น log ที่เพิ่งบันทึก
+        ถ้าเขียนไม่สำเร็จ แถวจะกลับเข้า buffer เพื่อลองใหม่รอบถัดไป
+        """
+        if not self._log_buffer or getattr(self._local, "tx_depth", 0):
+            return 0
+        with self._log_lock:
+            rows, self._log_buffer = self._log_buffer, []
+        try:
+            with self._write() as conn:
+                conn.executemany(self._LOG_INSERT_SQL, rows)
+        except sqlite3.Error as e:
+            logger.error(f"Error flushing {len(rows)} buffered log(s): {e}")
+            with self._log_lock:
+                self._log_buffer[:0] = rows
+                self._log_stats["flush_errors"] += 1
+            return 0
+        with self._log_lock:
+            self._log_stats["flushes"] += 1
+            self._log_stats["flushed"] += len(rows)
+        return len(rows)
+
+    def _start_log_flusher(self):
+        if self._log_flusher and self._log_flusher.is_alive():
+            return
+        self._log_wakeup.clear()
+
+        def run():
+            while True:
+                self._log_wakeup.wait(self.log_flush_interval)
+                stopping = self._log_flusher is None
+                self._log_wakeup.clear()
+                self.flush_logs()
+                if stopping:
+                    break
+
+        self._log_flusher = threading.Thread(target=run, name="storage-log-flusher", daemon=True)
+        self._log_flusher.start()
+
+    def _stop_log_flusher(self):
+        """หยุด thread flush แล้วเขียน log ที่เหลือใน buffer (เรียกจาก close)"""
+        flusher, self._log_flusher = self._log_flusher, None
+        if flusher:
+            self._log_wakeup.set()
+            if flusher is not threading.current_thread():
+                flusher.join(timeout=10)
+        self.flush_logs()
+
+    def get_log_stats(self) -> Dict[str, Any]:
+        """สถิติของ log sink: โหมด, จำนวนที่ buffer / flush, จำนวนที่ค้างอยู่"""
+        with self._log_lock:
+            stats = dict(self._log_stats)
+            stats["pending"] = len(self._log_buffer)
+        stats["durability"] = self.log_durability
+        stats["avg_flush"] = stats["flushed"] / stats["flushes"] if stats["flushes"] else 0.0
+        return stats
+
+    @staticmethod
+    def _make_log_row(action: str, roll_id: str, details: Dict[str, Any], user: str,
+                      timestamp: Optional[str] = None) -> tuple:
+        """
+        สร้าง tuple สำหรับ INSERT INTO logs (ใช้กับ executemany)
+        document_no / customer ถูกดึงจาก details มาเก็บเป็นคอลัมน์ที่มี index เพื่อให้ค้นหาได้เร็ว
+        details เก็บเป็น JSON แบบไม่ escape ภาษาไทย เพื่อให้ full-text index ค้นหาข้อความไทยได้
+        """
+        document_no = customer = None
+        if isinstance(details, dict):
+            document_no = details.get("document_no") or None
+            customer = details.get("customer") or details.get("customer_name") or None
+        return (str(uuid.uuid4()), timestamp or datetime.now().isoformat(), action,
+                roll_id, json.dumps(details, ensure_ascii=False, default=str), user,
+                document_no, customer)
 
     def delete_all_logs(self) -> bool:
-        """ลบ Logs ทั้งหมดออกจากฐานข้อมูล"""
+        """ลบ Logs ทั้งหมดออกจากฐานข้อมูล รวมถึงไฟล์ archive รายเดือน (ดู archive_logs)"""
         try:
-            with self._connect() as conn:
-                conn.execute("DELETE FROM logs")
-                conn.commit()
+            with self._archive_lock:
+                self.flush_logs()
+                with self._write() as conn:
+                    conn.execute("DELETE FROM logs")
+                for month in self.log_archive_months():
+                    self._remove_log_archive(month)
             return True
-        except sqlite3.Error as e:
+        except (sqlite3.Error, OSError) as e:
             logger.error(f"Error clearing logs: {e}")
             return False
 
-    def get_logs(self, limit: int = 100, **filters) -> List[LogEntry]:
+    def _remove_log_archive(self, month: str):
+        """ลบไฟล์ archive ของเดือน ถ้าลบไม่ได้ (ไฟล์ถูกเปิดอยู่) จะล้างตาราง logs ในไฟล์แทน"""
+        path = self._log_archive_path(month)
+        try:
+            path.unlink()
+        except OSError:
+            conn = sqlite3.connect(path, timeout=self.busy_timeout)
+            try:
+                with conn:
+                    conn.execute("DELETE FROM logs")
+            finally:
+                conn.close()
+            return
+        for suffix in ("-wal", "-shm", "-journal"):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+    def search_logs(self, text: Optional[str] = None, action: Optional[str] = None,
+                    user: Optional[str] = None, date_from: Optional[str] = None,
+                    date_to: Optional[str] = None, limit: int = 200,
+                    cursor: Optional[tuple] = None, include_archive: bool = True) -> tuple:
+        """
+        ค้นหา logs ทั้งหมดในฐานข้อมูล (ไม่จำกัดแค่ 100 รายการล่าสุด) เรียงจากใหม่ไปเก่า
+        - text: ค้นหาใน roll_id, action, user, document_no, customer และ details ผ่าน logs_fts
+        - action: ตรงตัว, user: substring, date_from (รวม) / date_to (ไม่รวม) รูปแบบ YYYY-MM-DD
+        - cursor: ค่าที่ได้จากหน้าก่อนหน้า (keyset บน timestamp, id)
+        - include_archive: ค้นต่อในไฟล์ archive รายเดือน (ดู archive_logs) เฉพาะเดือนที่อาจมีแถวในหน้านี้
+        คืน (logs, next_cursor) โดย next_cursor เป็น None เมื่อไม่มีหน้าถัดไป
+        """
+        self.flush_logs()
+        clauses, params = self._log_filter_clauses(text, action, user, date_from, date_to, cursor,
+                                                   fts=True)
+        query = f"SELECT {self._LOG_ENTRY_SELECT} FROM logs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+
+        with self._read() as conn:
+            rows = conn.execute(query, params + [int(limit) + 1]).fetchall()
+
+        if include_archive:
+            # เดือนใหม่ไปเก่า หยุดเมื่อแถวที่ limit + 1 ใหม่กว่าทุกแถวของเดือนที่เหลือ
+            clauses, params = self._log_filter_clauses(text, action, user, date_from, date_to, cursor)
+            for month in self._log_archive_candidates(date_from, date_to, cursor):
+                if len(rows) > limit and self._log_sort_key(rows[limit])[0] >= self._next_month(month):
+                    break
+                rows = sorted(rows + self._query_log_archive(month, clauses, params, int(limit) + 1),
+                              key=self._log_sort_key, reverse=True)[:int(limit) + 1]
+
+        logs = [self._log_entry(row) for row in rows[:limit]]
+        next_cursor = (logs[-1].timestamp, logs[-1].id) if len(rows) > limit and logs else None
+        return logs, next_cursor
+
+    def _log_filter_clauses(self, text: Optional[str] = None, action: Optional[str] = None,
+                            user: Optional[str] = None, date_from: Optional[str] = None,
+                            date_to: Optional[str] = None, cursor: Optional[tuple] = None,
+                            fts: bool = False) -> tuple:
+        """เงื่อนไข WHERE ของ search_logs (fts=False สำหรับไฟล์ archive ที่ไม่มี logs_fts)"""
+        clauses, params = [], []
+        text = (text or "").strip()
+        if text:
+            if fts and self._can_use_fts(text, "logs"):
+                clauses.append("rowid IN (SELECT rowid FROM logs_fts WHERE logs_fts MATCH ?)")
+                params.append(self._fts_phrase(text))
+            else:
+                clauses.append("(" + " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in self.LOG_SEARCH_COLUMNS) + ")")
+                params.extend([self._like_pattern(text)] * len(self.LOG_SEARCH_COLUMNS))
+        if action:
+            clauses.append("action = ?")
+            params.append(action)
+        if user:
+            clauses.append("user LIKE ?")
+            params.append(f"%{user}%")
+        if date_from:
+            clauses.append("timestamp >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("timestamp < ?")
+            params.append(date_to)
+        if cursor is not None:
+            clauses.append("(timestamp, id) < (?, ?)")
+            params.extend(cursor)
+        return clauses, params
+
+    _LOG_ENTRY_SELECT = "id, timestamp, action, roll_id, details, user"
+
+    @staticmethod
+    def _log_sort_key(row) -> tuple:
+        return (row["timestamp"] or "", row["id"] or "")
+
+    @staticmethod
+    def _log_entry(row) -> LogEntry:
+        data = dict(row)
+        try:
+            data["details"] = json.loads(data["details"]) if data["details"] else {}
+        except (TypeError, ValueError):
+            pass
+        return LogEntry(**data)
+
+    def get_logs(self, limit: int = 100, columns: Optional[Iterable[str]] = None, **filters) -> List[LogEntry]:
+        """
+        columns: ดึงเฉพาะคอลัมน์ที่ระบุ คืน projected_row_type แทน LogEntry (details ยังถูกแปลงจาก JSON)
+        ถ้ามี filter ที่ต้องกรองใน Python คอลัมน์นั้นและ details จะถูกเติมให้อัตโนมัติ
+        """
+        self.flush_logs()
         # Build query with SQL filters for better performance
-        query = "SELECT * FROM logs"
+        make_log = LogEntry
+        select = "id, timestamp, action, roll_id, details, user"
+        if columns:
+            columns = tuple(columns)
+            python_filters = [k for k in filters if k not in ("action", "roll_id")]
+            if python_filters:
+                needed = [k for k in python_filters if k in LOG_COLUMNS] + ["details"]
+                columns += tuple(c for c in dict.fromkeys(needed) if c not in columns)
+            select = self._projection("logs", columns)[0]
+            make_log = projected_row_type(columns)
+        query = f"SELECT {select} FROM logs"
         params = []
 
         if filters:
@@ -673,7 +2330,7 @@ class StorageManager:
         query += " ORDER BY timestamp DESC LIMIT ?"
         params.append(limit)
 
-        with self._connect() as conn:
+        with self._read() as conn:
             cur = conn.execute(query, params)
             rows = cur.fetchall()
             keys = [desc[0] for desc in cur.description]
@@ -681,52 +2338,329 @@ class StorageManager:
         logs = []
         for row in rows:
             data = dict(zip(keys, row))
-            data["details"] = json.loads(data["details"])
-            logs.append(LogEntry(**data))
+            if "details" in data:
+                data["details"] = json.loads(data["details"])
+            logs.append(make_log(**data))
 
         # Only filter in Python for non-indexed fields
         remaining_filters = {k: v for k, v in filters.items() if k not in ["action", "roll_id"]}
         if remaining_filters:
             def match(log: LogEntry):
+                details = getattr(log, "details", None) or {}
                 for k, v in remaining_filters.items():
-                    if getattr(log, k, None) != v and log.details.get(k) != v:
+                    if getattr(log, k, None) != v and details.get(k) != v:
                         return False
                 return True
             logs = [log for log in logs if match(log)]
         return logs
 
+    # ----------------------------------------------------------------
+    # Log Archive (แบ่ง logs เก่าเป็นไฟล์ SQLite รายเดือน)
+    # ----------------------------------------------------------------
+    # ตาราง logs ในฐานข้อมูลหลักเก็บเฉพาะช่วง log_hot_days ล่าสุด (หน้า Dashboard / Logs ใช้ช่วงนี้)
+    # แถวที่เก่ากว่าถูกย้ายไป data/log_archive/logs_YYYY_MM.db ตามเดือนของ timestamp
+    LOG_ARCHIVE_DIR = "log_archive"
+    # SQLite attach ได้ไม่เกิน 10 ฐานข้อมูลต่อ connection (SQLITE_MAX_ATTACHED) เว้นไว้ 1 ให้ archive_logs
+    LOG_ARCHIVE_MAX_ATTACHED = 9
+    _LOG_ARCHIVE_COLUMNS = "id, timestamp, action, roll_id, details, user, document_no, customer"
+    _LOG_ARCHIVE_SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS {db}.logs (
+            id TEXT PRIMARY KEY,
+            timestamp TEXT,
+            action TEXT,
+            roll_id TEXT,
+            details TEXT,
+            user TEXT,
+            document_no TEXT,
+            customer TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS {db}.idx_logs_timestamp ON logs(timestamp)",
+        "CREATE INDEX IF NOT EXISTS {db}.idx_logs_action ON logs(action)",
+    )
+
+    @property
+    def log_archive_dir(self) -> Path:
+        return self.data_dir / self.LOG_ARCHIVE_DIR
+
+    def _log_archive_path(self, month: str) -> Path:
+        return self.log_archive_dir / f"logs_{month.replace('-', '_')}.db"
+
+    @staticmethod
+    def _next_month(month: str) -> str:
+        """วันแรกของเดือนถัดไปในรูปแบบ YYYY-MM-DD (ขอบบนแบบไม่รวมของ timestamp ในเดือน YYYY-MM)"""
+        year, mon = int(month[:4]), int(month[5:7])
+        return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}-01"
+
+    def log_archive_months(self) -> List[str]:
+        """เดือน (YYYY-MM) ที่มีไฟล์ archive เรียงจากเก่าไปใหม่"""
+        months = []
+        for path in self.log_archive_dir.glob("logs_*_*.db"):
+            parts = path.stem.split("_")
+            if len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+                months.append(f"{parts[1]}-{parts[2]}")
+        return sorted(months)
+
+    def _log_archive_candidates(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                                cursor: Optional[tuple] = None) -> List[str]:
+        """เดือนใน archive ที่อาจมีแถวตามช่วงเวลา / cursor เรียงจากใหม่ไปเก่า"""
+        months = []
+        for month in reversed(self.log_archive_months()):
+            if date_to and f"{month}-01" >= date_to:
+                continue
+            if cursor is not None and cursor[0] is not None and f"{month}-01" > cursor[0]:
+                continue
+            if date_from and self._next_month(month) <= date_from:
+                break
+            months.append(month)
+        return months
+
+    def _open_log_archive(self, month: str) -> sqlite3.Connection:
+        """เปิดไฟล์ archive ของเดือนแบบอ่านอย่างเดียว (ไม่ใช้ connection ใน pool จึงอ่านได้แม้อยู่ใน transaction)"""
+        uri = self._log_archive_path(month).as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _query_log_archive(self, month: str, clauses: List[str], params: list, limit: int) -> list:
+        query = f"SELECT {self._LOG_ENTRY_SELECT} FROM logs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        try:
+            conn = self._open_log_archive(month)
+        except sqlite3.Error as e:
+            logger.error(f"Error opening log archive {month}: {e}")
+            return []
+        try:
+            return conn.execute(query, params + [limit]).fetchall()
+        finally:
+            conn.close()
+
+    def archive_logs(self, hot_days: Optional[int] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        ย้าย logs ที่เก่ากว่า hot_days วัน (ค่าเริ่มต้น database.log_hot_days) ไปไฟล์ archive รายเดือน
+        คืน {เดือน: จำนวนแถวที่ย้าย}
+
+        แต่ละเดือนทำสองขั้น: คัดลอกลง archive แล้ว commit จากนั้นจึงลบแถวที่อยู่ใน archive แล้วออกจาก logs
+        ถ้าโปรแกรมหยุดระหว่างขั้น แถวจะอยู่ทั้งสองที่ชั่วคราว (ไม่หาย) และการเรียกครั้งถัดไปจะทำต่อจนครบ
+        (ใน WAL mode commit ข้ามไฟล์ที่ attach ไว้ไม่ atomic จึงไม่ทำทั้งสองขั้นใน transaction เดียว)
+        """
+        from core.config import config
+        if getattr(self._local, "tx_depth", 0):
+            raise RuntimeError("archive_logs() cannot run inside a transaction")
+        hot_days = int(hot_days if hot_days is not None else config.get('database.log_hot_days', 0))
+        if hot_days <= 0:
+            return {}
+        cutoff = ((now or datetime.now()) - timedelta(days=hot_days)).date().isoformat()
+        self.flush_logs()
+
+        with self._read() as conn:
+            months = [r[0] for r in conn.execute(
+                "SELECT DISTINCT substr(timestamp, 1, 7) FROM logs WHERE timestamp < ?", (cutoff,))]
+        months = [m for m in months if len(m) == 7 and m[:4].isdigit() and m[4] == "-" and m[5:].isdigit()]
+        if not months:
+            return {}
+
+        self.log_archive_dir.mkdir(parents=True, exist_ok=True)
+        moved = {}
+        with self._archive_lock:
+            conn = self._connect()
+            for month in months:
+                bounds = (f"{month}-01", min(self._next_month(month), cutoff))
+                conn.execute("ATTACH DATABASE ? AS log_archive", (str(self._log_archive_path(month)),))
+                try:
+                    with self.transaction():
+                        for sql in self._LOG_ARCHIVE_SCHEMA:
+                            conn.execute(sql.format(db="log_archive"))
+                        conn.execute(f"""
+                            INSERT OR IGNORE INTO log_archive.logs ({self._LOG_ARCHIVE_COLUMNS})
+                            SELECT {self._LOG_ARCHIVE_COLUMNS} FROM main.logs
+                            WHERE timestamp >= ? AND timestamp < ?
+                        """, bounds)
+                    with self.transaction():
+                        moved[month] = conn.execute("""
+                            DELETE FROM main.logs
+                            WHERE timestamp >= ? AND timestamp < ?
+                              AND id IN (SELECT id FROM log_archive.logs)
+                        """, bounds).rowcount
+                finally:
+                    conn.execute("DETACH DATABASE log_archive")
+        logger.info(f"Archived {sum(moved.values())} log(s) older than {cutoff} into {len(moved)} month file(s)")
+        return moved
+
+    @contextmanager
+    def attach_log_archives(self, months: Optional[Iterable[str]] = None):
+        """
+        attach ไฟล์ archive ของเดือนที่ระบุ (None = ทุกเดือน) แล้วสร้าง TEMP VIEW logs_history
+        = logs ปัจจุบัน UNION ALL logs ใน archive สำหรับ query ประวัติด้วย SQL ตรงๆ (รายงาน, export)
+        attach ได้ครั้งละไม่เกิน LOG_ARCHIVE_MAX_ATTACHED เดือน ช่วงที่ยาวกว่านั้นให้ใช้ search_logs
+
+        Example:
+            with storage.attach_log_archives(["2025-01", "2025-02"]) as conn:
+                conn.execute("SELECT action, COUNT(*) FROM logs_history GROUP BY action")
+        """
+        available = self.log_archive_months()
+        months = available if months is None else [m for m in months if m in available]
+        if len(months) > self.LOG_ARCHIVE_MAX_ATTACHED:
+            raise ValueError(f"Cannot attach {len(months)} log archives "
+                             f"(max {self.LOG_ARCHIVE_MAX_ATTACHED}), narrow the month range")
+        if getattr(self._local, "tx_depth", 0):
+            raise RuntimeError("attach_log_archives() cannot run inside a transaction")
+        self.flush_logs()
+        conn = self._connect()
+        schemas = []
+        try:
+            for month in months:
+                schema = f"log_archive_{month.replace('-', '_')}"
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (str(self._log_archive_path(month)),))
+                schemas.append(schema)
+            selects = [f"SELECT {self._LOG_ARCHIVE_COLUMNS} FROM main.logs"]
+            selects += [f"SELECT {self._LOG_ARCHIVE_COLUMNS} FROM {schema}.logs" for schema in schemas]
+            conn.execute("DROP VIEW IF EXISTS temp.logs_history")
+            conn.execute("CREATE TEMP VIEW logs_history AS " + " UNION ALL ".join(selects))
+            yield conn
+        finally:
+            conn.execute("DROP VIEW IF EXISTS temp.logs_history")
+            for schema in schemas:
+                conn.execute(f"DETACH DATABASE {schema}")
+
     # ----------------------------------------------------------------
     # Search Operations
     # ----------------------------------------------------------------
     def get_all_rolls(self) -> List[Roll]:
         """ดึง rolls ทั้งหมดจาก database"""
-        with self._connect() as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute("SELECT * FROM rolls")
-            rows = cur.fetchall()
-        return [Roll.from_db_row(dict(row)) for row in rows]
+        return self._fetch_rolls(f"SELECT {ROLL_SELECT} FROM rolls")
 
-    def search_rolls(self, **filters) -> List[Roll]:
+    def search_rolls(self, columns: Optional[Iterable[str]] = None, **filters) -> List[Roll]:
+        """columns: ดึงเฉพาะคอลัมน์ที่ระบุ คืน projected_row_type แทน Roll (สำหรับตารางแสดงผลที่ใช้ไม่กี่คอลัมน์)"""
         # Whitelist of allowed columns for the simplified schema
         allowed_columns = {
             'roll_id', 'code', 'sub_part_code', 'sup_code', 'supplier_name',
             'description', 'lot_no', 'quantity', 'location', 'unit',
-            'color', 'width', 'length'
+            'color', 'width', 'length', 'status'
         }
-        query = "SELECT * FROM rolls"
-        clauses, params = [], []
-        for k, v in filters.items():
-            if k in allowed_columns:
+        select, row_factory = ROLL_SELECT, Roll.from_row
+        if columns:
+            select, row_factory = self._projection("rolls", columns)
+        query = f"SELECT {select} FROM rolls"
+        clauses, params = self._roll_filter_clauses(
+            {k: v for k, v in filters.items() if k in allowed_columns}
+        )
+        for k in ('quantity', 'width', 'length'):
+            if k in filters:
                 clauses.append(f"{k} LIKE ?")
-                params.append(f"%{v}%")
+                params.append(f"%{filters[k]}%")
         if clauses:
             query += " WHERE " + " AND ".join(clauses)
+        return self._fetch_rows(query, params, row_factory)
+
+    # คอลัมน์ที่ใช้เรียงลำดับแบบ keyset ได้ (มี index รองรับ) ใส่ "-" นำหน้าเพื่อเรียงจากมากไปน้อย
+    PAGE_ORDER_COLUMNS = ('roll_id', 'code', 'location', 'lot_no', 'date_received')
+    ROLL_TEXT_FILTERS = (
+        'roll_id', 'code', 'sub_part_code', 'sup_code', 'supplier_name',
+        'description', 'lot_no', 'location', 'unit', 'color'
+    )
+
+    def _roll_filter_clauses(self, filters: Optional[Dict[str, Any]], exact: bool = False):
+        """
+        แปลง filters เป็น WHERE clauses
+        - คอลัมน์ข้อความ: substring ผ่าน rolls_fts หรือ LIKE %v% ที่ escape \\ % _ แล้ว (หรือเท่ากันพอดีเมื่อ exact=True)
+        - status: เท่ากันพอดี
+        - min_length / max_length: ช่วงความยาวคงเหลือ
+        - date_from (รวม) / date_to (ไม่รวม): ช่วง date_received
+        """
+        clauses, params = [], []
+        for k, v in (filters or {}).items():
+            if v is None or v == "":
+                continue
+            if k in self.ROLL_TEXT_FILTERS:
+                if exact:
+                    clauses.append(f"{k} = ?")
+                    params.append(v)
+                elif k in self.ROLL_SEARCH_COLUMNS and self._can_use_fts(v):
+                    # ใช้ full-text index แทน LIKE '%v%' ที่ต้อง scan ทั้งตาราง
+                    clauses.append("rowid IN (SELECT rowid FROM rolls_fts WHERE rolls_fts MATCH ?)")
+                    params.append(self._fts_phrase(v, [k]))
+                else:
+                    clauses.append(f"{k} LIKE ? ESCAPE '\\'")
+                    params.append(self._like_pattern(v))
+            elif k == 'status':
+                clauses.append("status = ?")
+                params.append(v)
+            elif k == 'min_length':
+                clauses.append("length >= ?")
+                params.append(float(v))
+            elif k == 'max_length':
+                clauses.append("length <= ?")
+                params.append(float(v))
+            elif k == 'date_from':
+                clauses.append("date_received >= ?")
+                params.append(v)
+            elif k == 'date_to':
+                clauses.append("date_received < ?")
+                params.append(v)
+        return clauses, params
+
+    def search_rolls_page(self, filters: Optional[Dict[str, Any]] = None, order_by: str = "roll_id",
+                          after: Optional[tuple] = None, limit: int = 100,
+                          exact: bool = False, columns: Optional[Iterable[str]] = None) -> tuple:
+        """
+        ดึงม้วนผ้าทีละหน้าด้วย keyset pagination (ไม่ใช้ OFFSET)
+        - order_by: คอลัมน์ใน PAGE_ORDER_COLUMNS (เช่น "code", "-date_received") โดยใช้ roll_id ตัดสินเมื่อค่าเท่ากัน
+        - after: cursor ที่ได้จากหน้าก่อนหน้า (None = หน้าแรก)
+        - columns: ดึงเฉพาะคอลัมน์ที่ระบุ (คืน projected_row_type แทน Roll, เติม roll_id / order_by ให้เอง)
+        คืน (rolls, next_cursor) โดย next_cursor เป็น None เมื่อไม่มีหน้าถัดไป
+        """
+        descending = order_by.startswith("-")
+        column = order_by.lstrip("-")
+        if column not in self.PAGE_ORDER_COLUMNS:
+            raise ValueError(f"Cannot paginate rolls by '{order_by}'")
+        direction = "DESC" if descending else "ASC"
+        op = "<" if descending else ">"
+
+        clauses, params = self._roll_filter_clauses(filters, exact)
+        if after is not None:
+            if column == "roll_id":
+                clauses.append(f"roll_id {op} ?")
+                params.append(after[-1])
+            else:
+                clauses.append(f"({column}, roll_id) {op} (?, ?)")
+                params.extend(after)
 
-        with self._connect() as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute(query, params)
-            rows = cur.fetchall()
-        return [Roll.from_db_row(dict(row)) for row in rows]
+        select, row_factory = ROLL_SELECT, Roll.from_row
+        if columns:
+            columns = tuple(columns)
+            columns += tuple(c for c in dict.fromkeys(("roll_id", column)) if c not in columns)
+            select, row_factory = self._projection("rolls", columns)
+
+        query = f"SELECT {select} FROM rolls"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        if column == "roll_id":
+            query += f" ORDER BY roll_id {direction}"
+        else:
+            query += f" ORDER BY {column} {direction}, roll_id {direction}"
+        query += " LIMIT ?"
+        params.append(int(limit) + 1)
+
+        rolls = self._fetch_rows(query, params, row_factory)
+        has_more = len(rolls) > limit
+        del rolls[limit:]
+        next_cursor = None
+        if has_more and rolls:
+            last = rolls[-1]
+            next_cursor = ((last.roll_id,) if column == "roll_id"
+                           else (getattr(last, column), last.roll_id))
+        return rolls, next_cursor
+
+    def count_rolls(self, filters: Optional[Dict[str, Any]] = None, exact: bool = False) -> int:
+        """นับจำนวนม้วนที่ตรงกับ filters (ใช้เงื่อนไขเดียวกับ search_rolls_page)"""
+        clauses, params = self._roll_filter_clauses(filters, exact)
+        query = "SELECT COUNT(*) FROM rolls"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._read() as conn:
+            return conn.execute(query, params).fetchone()[0]
 
     def search_rolls_by_field(self, field: str, keyword: str) -> List[Roll]:
         """ค้นหา rolls ตาม field เฉพาะ (exact match)"""
@@ -746,30 +2680,16 @@ class StorageManager:
         if not db_field:
             return self.search_rolls(code=keyword)
 
-        query = f"SELECT * FROM rolls WHERE {db_field} = ?"
-        params = [keyword]
-
-        with self._connect() as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute(query, params)
-            rows = cur.fetchall()
-        return [Roll.from_db_row(dict(row)) for row in rows]
+        return self._fetch_rolls(f"SELECT {ROLL_SELECT} FROM rolls WHERE {db_field} = ?", (keyword,))
 
     # ----------------------------------------------------------------
     # Statistics Operations
     # ----------------------------------------------------------------
     def get_roll_types_count(self, start_date: str = None, end_date: str = None) -> Dict[str, int]:
-        query = "SELECT COALESCE(type_of_roll, 'Standard') AS type, COUNT(*) FROM rolls"
-        params = []
-        if start_date and end_date:
-            query += " WHERE date_received >= ? AND date_received < ?"
-            params = [start_date, end_date]
-        query += " GROUP BY type"
-
-        with self._connect() as conn:
-            cur = conn.execute(query, params)
-            data = dict(cur.fetchall())
-        return data or {"Standard": 0}
+        """จำนวนม้วนแยกตามประเภท Full / Scrap / Depleted (ตาราง rolls ไม่มีคอลัมน์ type_of_roll)"""
+        filters = {"date_from": start_date, "date_to": end_date} if start_date and end_date else None
+        totals = self.aggregate_stock((), ("full_count", "scrap_count", "depleted_count"), filters)[0]
+        return {"Full": totals.full_count, "Scrap": totals.scrap_count, "Depleted": totals.depleted_count}
 
     def get_roll_statuses_count(self, start_date: str = None, end_date: str = None) -> Dict[str, int]:
         query = "SELECT status, COUNT(*) FROM rolls"
@@ -779,38 +2699,360 @@ class StorageManager:
             params = [start_date, end_date]
         query += " GROUP BY status"
 
-        with self._connect() as conn:
+        with self._read() as conn:
             cur = conn.execute(query, params)
             data = {status.capitalize(): count for status, count in cur.fetchall()}
         return data
 
     def get_rolls_by_date_range(self, start_date: str, end_date: str) -> List[Roll]:
-        query = "SELECT * FROM rolls WHERE date_received >= ? AND date_received < ? ORDER BY date_received DESC"
-        with self._connect() as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute(query, (start_date, end_date))
-            rows = cur.fetchall()
-        return [Roll.from_db_row(dict(row)) for row in rows]
+        query = (f"SELECT {ROLL_SELECT} FROM rolls WHERE date_received >= ? AND date_received < ? "
+                 "ORDER BY date_received DESC")
+        return self._fetch_rolls(query, (start_date, end_date))
+
+    # ----------------------------------------------------------------
+    # Aggregation (GROUP BY ใน SQLite)
+    # ----------------------------------------------------------------
+    # ประเภทม้วน (เงื่อนไขเดียวกับ utils.stock_analytics.classify_codes, NULL นับเป็นค่าว่าง / 0)
+    _DEPLETED_SQL = "(COALESCE(status, '') = 'used' OR COALESCE(length, 0) <= 0)"
+    _FULL_SQL = f"(NOT {_DEPLETED_SQL} AND COALESCE(length, 0) >= COALESCE(length_original, 0))"
+    _SCRAP_SQL = f"(NOT {_DEPLETED_SQL} AND COALESCE(length, 0) < COALESCE(length_original, 0))"
+
+    STOCK_GROUPS = {
+        "code": "code",
+        "location": "location",
+        "supplier": "supplier_name",
+        "lot": "lot_no",
+        "status": "status",
+    }
+    STOCK_METRICS = {
+        "count": "COUNT(*)",
+        "sum_length": "COALESCE(SUM(length), 0)",
+        "sum_original": "COALESCE(SUM(length_original), 0)",
+        "full_count": f"COALESCE(SUM({_FULL_SQL}), 0)",
+        "scrap_count": f"COALESCE(SUM({_SCRAP_SQL}), 0)",
+        "scrap_length": f"COALESCE(SUM(CASE WHEN {_SCRAP_SQL} THEN length ELSE 0 END), 0)",
+        "depleted_count": f"COALESCE(SUM({_DEPLETED_SQL}), 0)",
+    }
+    DISPATCH_GROUPS = {
+        "day": "substr(timestamp, 1, 10)",
+        "month": "substr(timestamp, 1, 7)",
+        "code": "pdt_code",
+        "supplier": "supplier_name",
+        "customer": "customer_name",
+        "roll": "roll_id",
+        "user": "user",
+    }
+    DISPATCH_METRICS = {
+        "count": "COUNT(*)",
+        "sum_length": "COALESCE(SUM(length_dispatched), 0)",
+        "rolls": "COUNT(DISTINCT roll_id)",
+    }
+
+    def _aggregate(self, table: str, groups: Dict[str, str], metric_sql: Dict[str, str],
+                   group_by: Iterable[str], metrics: Iterable[str], clauses: list, params: list) -> list:
+        group_by, metrics = tuple(group_by), tuple(metrics)
+        unknown = [g for g in group_by if g not in groups] + [m for m in metrics if m not in metric_sql]
+        if unknown:
+            raise ValueError(f"Unknown group/metric for {table}: {', '.join(unknown)}")
+        select = [f"{groups[g]} AS {g}" for g in group_by] + [f"{metric_sql[m]} AS {m}" for m in metrics]
+        query = f"SELECT {', '.join(select)} FROM {table}"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        if group_by:
+            keys = ", ".join(groups[g] for g in group_by)
+            query += f" GROUP BY {keys} ORDER BY {keys}"
+        row_type = projected_row_type(group_by + metrics)
+        return self._fetch_rows(query, params, lambda cursor, row: row_type(*row))
+
+    def aggregate_stock(self, group_by: Iterable[str] = ("code",),
+                        metrics: Iterable[str] = ("count", "sum_length", "scrap_count"),
+                        filters: Optional[Dict[str, Any]] = None, exact: bool = False) -> list:
+        """
+        สรุปสต็อกด้วย GROUP BY ใน SQLite คืน list ของ projected_row_type (คอลัมน์กลุ่มตามด้วย metric)
+        - group_by: คีย์ใน STOCK_GROUPS (code, location, supplier, lot, status) ว่าง = สรุปรวมแถวเดียว
+        - metrics: คีย์ใน STOCK_METRICS (count, sum_length, sum_original, full_count, scrap_count,
+          scrap_length, depleted_count)
+        - filters: เงื่อนไขเดียวกับ search_rolls_page (รวม date_from / date_to)
+        """
+        clauses, params = self._roll_filter_clauses(filters, exact)
+        return self._aggregate("rolls", self.STOCK_GROUPS, self.STOCK_METRICS,
+                               group_by, metrics, clauses, params)
+
+    def aggregate_dispatch(self, group_by: Iterable[str] = ("day",),
+                           metrics: Iterable[str] = ("count", "sum_length"),
+                           date_from: Optional[str] = None, date_to: Optional[str] = None,
+                           filters: Optional[Dict[str, Any]] = None) -> list:
+        """
+        สรุปการเบิกจ่ายด้วย GROUP BY ใน SQLite คืน list ของ projected_row_type
+        - group_by: คีย์ใน DISPATCH_GROUPS (day, month, code, supplier, customer, roll, user)
+        - metrics: คีย์ใน DISPATCH_METRICS (count, sum_length, rolls)
+        - date_from (รวม) / date_to (ไม่รวม) กรองตาม timestamp, filters: คีย์ group ที่ต้องเท่ากันพอดี
+        """
+        clauses, params = [], []
+        if date_from:
+            clauses.append("timestamp >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("timestamp < ?")
+            params.append(date_to)
+        for k, v in (filters or {}).items():
+            if k not in self.DISPATCH_GROUPS:
+                raise ValueError(f"Cannot filter dispatch by '{k}'")
+            clauses.append(f"{self.DISPATCH_GROUPS[k]} = ?")
+            params.append(v)
+        return self._aggregate("dispatch", self.DISPATCH_GROUPS, self.DISPATCH_METRICS,
+                               group_by, metrics, clauses, params)
+
+    def count_logs(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                   action: Optional[str] = None, include_archive: bool = False) -> int:
+        """
+        นับ logs ในช่วงเวลา (date_from รวม / date_to ไม่รวม) โดยไม่โหลดแถวขึ้นมา
+        include_archive: รวมไฟล์ archive รายเดือนที่อยู่ในช่วงด้วย (ค่าเริ่มต้นนับเฉพาะตาราง logs ปัจจุบัน)
+        """
+        self.flush_logs()
+        clauses, params = self._log_filter_clauses(action=action, date_from=date_from, date_to=date_to)
+        query = "SELECT COUNT(*) FROM logs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._read() as conn:
+            total = conn.execute(query, params).fetchone()[0]
+        if include_archive:
+            for month in self._log_archive_candidates(date_from, date_to):
+                conn = self._open_log_archive(month)
+                try:
+                    total += conn.execute(query, params).fetchone()[0]
+                finally:
+                    conn.close()
+        return total
+
+    # ----------------------------------------------------------------
+    # Stock Summary (ตาราง stock_summary ที่ trigger ดูแล)
+    # ----------------------------------------------------------------
+    # ม้วนที่นับ: status = 'active' (ความหมายเดียวกับ get_roll_active_count), เศษ: length < length_original
+    _SUMMARY_KEY_COLUMNS = ("code", "location", "supplier_name")
+    _SUMMARY_TRIGGER_COLUMNS = ("code", "location", "supplier_name", "status", "length", "length_original")
+    SUMMARY_GROUPS = {"code": "code", "location": "location", "supplier": "supplier_name"}
+    SUMMARY_METRICS = {
+        "active_count": "COALESCE(SUM(active_count), 0)",
+        "total_length": "COALESCE(SUM(total_length), 0)",
+        "scrap_count": "COALESCE(SUM(scrap_count), 0)",
+        "scrap_length": "COALESCE(SUM(scrap_length), 0)",
+    }
+
+    @classmethod
+    def _summary_delta_sql(cls, row: str, sign: int, source: str = "", condition: str = "") -> str:
+        """
+        UPSERT ที่บวก (sign=1) หรือลบ (sign=-1) ยอดของม้วนหนึ่งม้วนเข้า stock_summary
+        row คือแถวใน trigger (new / old) หรือ alias ของตารางใน source (เช่น "FROM rolls AS r")
+        """
+        keys = ", ".join(f"COALESCE({row}.{c}, '')" for c in cls._SUMMARY_KEY_COLUMNS)
+        length = f"COALESCE({row}.length, 0)"
+        scrap = f"({length} < COALESCE({row}.length_original, 0))"
+        where = " AND ".join(filter(None, (condition, f"{row}.status = 'active'")))
+        # ต้องมี WHERE เสมอ ไม่เช่นนั้น SQLite จะอ่าน ON CONFLICT เป็นส่วนของ SELECT
+        return f"""
+            INSERT INTO stock_summary (code, location, supplier_name,
+                                       active_count, total_length, scrap_count, scrap_length)
+            SELECT {keys}, {sign}, {sign} * {length}, {sign} * {scrap},
+                   {sign} * (CASE WHEN {scrap} THEN {length} ELSE 0 END) {source}
+            WHERE {where}
+            ON CONFLICT (code, location, supplier_name) DO UPDATE SET
+                active_count = active_count + excluded.active_count,
+                total_length = total_length + excluded.total_length,
+                scrap_count = scrap_count + excluded.scrap_count,
+                scrap_length = scrap_length + excluded.scrap_length;
+        """
+
+    @classmethod
+    def _summary_cleanup_sql(cls, row: str, source: str = "", condition: str = "") -> str:
+        """ลบแถวของคีย์ที่ไม่เหลือม้วน active (ยอดความยาวที่ค้างจากทศนิยมจะหายไปด้วย)"""
+        keys = ", ".join(cls._SUMMARY_KEY_COLUMNS)
+        values = ", ".join(f"COALESCE({row}.{c}, '')" for c in cls._SUMMARY_KEY_COLUMNS)
+        if source:
+            match = f"({keys}) IN (SELECT {values} {source} WHERE {condition})"
+        else:
+            match = f"({keys}) = ({values})"
+        return f"DELETE FROM stock_summary WHERE {match} AND active_count <= 0;"
+
+    def _init_stock_summary(self, cur):
+        """
+        สร้าง stock_summary และ trigger บน rolls ที่ปรับยอดทีละม้วนใน transaction เดียวกับการเขียน
+        add_roll / add_rolls ใช้ INSERT OR REPLACE ซึ่งไม่เรียก trigger DELETE (recursive_triggers ปิดอยู่)
+        จึงหักยอดของแถวเดิมที่ roll_id ซ้ำใน trigger BEFORE INSERT แทน
+        (ถ้าวันหนึ่งเปิด recursive_triggers หรือใช้ INSERT OR IGNORE กับ rolls ต้องแก้ trigger นี้ด้วย)
+        """
+        cur.execute(STOCK_SUMMARY_TABLE_SQL)
+        replaced = ("FROM rolls AS r", "r.roll_id = new.roll_id")
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS stock_summary_bi BEFORE INSERT ON rolls BEGIN
+            {self._summary_delta_sql("r", -1, *replaced)}
+            {self._summary_cleanup_sql("r", *replaced)}
+        END
+        """)
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS stock_summary_ai AFTER INSERT ON rolls BEGIN
+            {self._summary_delta_sql("new", 1)}
+        END
+        """)
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS stock_summary_ad AFTER DELETE ON rolls BEGIN
+            {self._summary_delta_sql("old", -1)}
+            {self._summary_cleanup_sql("old")}
+        END
+        """)
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS stock_summary_au
+        AFTER UPDATE OF {", ".join(self._SUMMARY_TRIGGER_COLUMNS)} ON rolls BEGIN
+            {self._summary_delta_sql("old", -1)}
+            {self._summary_delta_sql("new", 1)}
+            {self._summary_cleanup_sql("old")}
+        END
+        """)
+
+    _SUMMARY_RECOUNT_SQL = """
+        SELECT COALESCE(code, ''), COALESCE(location, ''), COALESCE(supplier_name, ''),
+               COUNT(*), SUM(COALESCE(length, 0)),
+               SUM(COALESCE(length, 0) < COALESCE(length_original, 0)),
+               SUM(CASE WHEN COALESCE(length, 0) < COALESCE(length_original, 0)
+                        THEN COALESCE(length, 0) ELSE 0 END)
+        FROM rolls WHERE status = 'active'
+        GROUP BY 1, 2, 3
+    """
+
+    def _rebuild_stock_summary(self, cur) -> int:
+        cur.execute("DELETE FROM stock_summary")
+        cur.execute(f"INSERT INTO stock_summary {self._SUMMARY_RECOUNT_SQL}")
+        return cur.rowcount
+
+    def rebuild_stock_summary(self) -> int:
+        """นับ stock_summary ใหม่จาก rolls ทั้งตาราง (แก้ยอดที่เพี้ยนจากการเขียนนอก trigger) คืนจำนวนแถว"""
+        with self.transaction() as conn:
+            return self._rebuild_stock_summary(conn.cursor())
+
+    def verify_stock_summary(self, tolerance: float = 1e-6) -> List[Dict[str, Any]]:
+        """
+        เทียบ stock_summary กับการนับใหม่จาก rolls ใน snapshot เดียวกัน
+        คืนรายการคีย์ที่ไม่ตรง [{"key": (code, location, supplier_name), "expected": ..., "actual": ...}]
+        (list ว่าง = ตรงกันทั้งหมด) ความยาวเทียบแบบมี tolerance เพราะบวกลบทศนิยมสะสมใน trigger
+        """
+        with self.transaction() as conn:
+            expected = {row[:3]: row[3:] for row in conn.execute(self._SUMMARY_RECOUNT_SQL)}
+            actual = {row[:3]: row[3:] for row in conn.execute(
+                "SELECT code, location, supplier_name, active_count, total_length, scrap_count, scrap_length "
+                "FROM stock_summary"
+            )}
+        mismatches = []
+        for key in sorted(expected.keys() | actual.keys()):
+            want, got = expected.get(key), actual.get(key)
+            if want and got and all(abs(w - g) <= tolerance * max(1.0, abs(w)) for w, g in zip(want, got)):
+                continue
+            mismatches.append({"key": key, "expected": want, "actual": got})
+        return mismatches
+
+    def get_stock_summary(self, group_by: Iterable[str] = ("code",),
+                          metrics: Iterable[str] = ("active_count", "total_length", "scrap_count"),
+                          filters: Optional[Dict[str, Any]] = None) -> list:
+        """
+        อ่านยอดคงคลังจาก stock_summary (ไม่แตะตาราง rolls) คืน list ของ projected_row_type
+        - group_by: คีย์ใน SUMMARY_GROUPS (code, location, supplier) ว่าง = ยอดรวมแถวเดียว
+        - metrics: คีย์ใน SUMMARY_METRICS (active_count, total_length, scrap_count, scrap_length)
+        - filters: {คีย์ใน SUMMARY_GROUPS: ค่า} เทียบเท่ากันพอดี
+        """
+        clauses, params = [], []
+        for k, v in (filters or {}).items():
+            if k not in self.SUMMARY_GROUPS:
+                raise ValueError(f"Cannot filter stock summary by '{k}'")
+            clauses.append(f"{self.SUMMARY_GROUPS[k]} = ?")
+            params.append(v or "")
+        return self._aggregate("stock_summary", self.SUMMARY_GROUPS, self.SUMMARY_METRICS,
+                               group_by, metrics, clauses, params)
+
+    def get_stock_totals(self):
+        """ยอดรวมทั้งคลังจาก stock_summary: .active_count, .total_length, .scrap_count, .scrap_length"""
+        return self.get_stock_summary((), tuple(self.SUMMARY_METRICS))[0]
+
+    # ----------------------------------------------------------------
+    # Columnar Reads (Analytics / Export)
+    # ----------------------------------------------------------------
+    COLUMNAR_TABLES = ('rolls', 'dispatch', 'logs', 'master_products', 'supplier_stock')
+
+    def fetch_columns(self, table: str, columns: Iterable[str], filters: Optional[Dict[str, Any]] = None,
+                      as_frame: bool = False, exact: bool = False, order_by: Optional[str] = None):
+        """
+        อ่านเฉพาะคอลัมน์ที่ระบุเป็น {คอลัมน์: numpy array} (หรือ pandas DataFrame เมื่อ as_frame=True)
+        สร้างจาก tuple ของ cursor โดยตรง ไม่สร้าง Roll / dict ต่อแถว สำหรับสถิติและ export ข้อมูลจำนวนมาก
+        - filters ของ rolls ใช้เงื่อนไขเดียวกับ search_rolls_page ตารางอื่นเป็นการเท่ากันพอดีต่อคอลัมน์
+        - order_by: คอลัมน์ของตาราง ใส่ "-" นำหน้าเพื่อเรียงจากมากไปน้อย
+        - REAL เป็น float64 (NULL เป็น NaN), INTEGER เป็น int64 (float64 ถ้ามี NULL), นอกนั้นเป็น object
+        """
+        import numpy as np
+
+        if table not in self.COLUMNAR_TABLES:
+            raise ValueError(f"Cannot fetch columns from '{table}'")
+        if table == "logs":
+            self.flush_logs()
+        columns = tuple(columns)
+        with self._read() as conn:
+            types = self._table_columns(conn, table)
+        unknown = [c for c in columns + ((order_by.lstrip("-"),) if order_by else ()) if c not in types]
+        if unknown:
+            raise ValueError(f"Unknown column(s) in {table}: {', '.join(unknown)}")
+
+        if table == "rolls":
+            clauses, params = self._roll_filter_clauses(filters, exact)
+        else:
+            clauses, params = [], []
+            for k, v in (filters or {}).items():
+                if k not in types:
+                    raise ValueError(f"Unknown column '{k}' in {table}")
+                clauses.append(f'"{k}" = ?')
+                params.append(v)
+        select = ", ".join(f'"{c}"' for c in columns)
+        query = f"SELECT {select} FROM {table}"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        if order_by:
+            query += f' ORDER BY "{order_by.lstrip("-")}" {"DESC" if order_by.startswith("-") else "ASC"}'
+
+        rows = self._fetch_rows(query, params)
+        # array 2 มิติของ tuple ทั้งหมดครั้งเดียว แล้วตัดเป็นคอลัมน์ (เร็วกว่า zip(*rows) ต่อคอลัมน์)
+        table_values = np.empty((len(rows), len(columns)), dtype=object)
+        if rows:
+            table_values[:] = rows
+        data = {}
+        for i, name in enumerate(columns):
+            values = table_values[:, i]
+            if types[name] == "REAL":
+                data[name] = values.astype(np.float64)
+            elif types[name] == "INTEGER":
+                has_null = any(v is None for v in values)
+                data[name] = values.astype(np.float64 if has_null else np.int64)
+            else:
+                data[name] = values.copy()
+
+        if as_frame:
+            import pandas as pd
+            return pd.DataFrame(data, columns=list(columns))
+        return data
 
     # ----------------------------------------------------------------
     # User Operations
     # ----------------------------------------------------------------
     def add_user(self, user_data: Dict[str, Any]) -> bool:
         """Add a new user to the database"""
-        with self._connect() as conn:
+        with self._write() as conn:
             try:
                 conn.execute("""
                 INSERT INTO users (username, password_hash, role, full_name, created_at, last_login)
                 VALUES (:username, :password_hash, :role, :full_name, :created_at, :last_login)
                 """, user_data)
-                conn.commit()
                 return True
             except sqlite3.IntegrityError:
                 return False
 
     def get_user(self, username: str) -> Optional[Dict[str, Any]]:
         """Get user by username"""
-        with self._connect() as conn:
+        with self._read() as conn:
             cur = conn.execute("SELECT * FROM users WHERE username = ?", (username,))
             row = cur.fetchone()
             if row:
@@ -820,7 +3062,7 @@ class StorageManager:
 
     def get_all_users(self) -> List[Dict[str, Any]]:
         """Get all users"""
-        with self._connect() as conn:
+        with self._read() as conn:
             cur = conn.execute("SELECT * FROM users")
             rows = cur.fetchall()
             keys = [desc[0] for desc in cur.description]
@@ -837,22 +3079,20 @@ class StorageManager:
         
         fields = ", ".join([f"{k}=?" for k in filtered_updates.keys()])
         values = list(filtered_updates.values()) + [username]
-        with self._connect() as conn:
+        with self._write() as conn:
             conn.execute(f"UPDATE users SET {fields} WHERE username = ?", values)
-            conn.commit()
         return True
 
     def delete_user(self, username: str) -> bool:
         """Delete user from database"""
-        with self._connect() as conn:
+        with self._write() as conn:
             cur = conn.execute("DELETE FROM users WHERE username = ?", (username,))
-            conn.commit()
             return cur.rowcount > 0
 
     def get_total_rolls_count(self) -> int:
         """ดึงจำนวนม้วนผ้าทั้งหมดในระบบ"""
         try:
-            with self._connect() as conn:
+            with self._read() as conn:
                 result = conn.execute("SELECT COUNT(*) FROM rolls").fetchone()
                 return result[0] if result else 0
         except Exception:
@@ -861,7 +3101,7 @@ class StorageManager:
     def get_total_master_count(self) -> int:
         """ดึงจำนวนสินค้าหลักทั้งหมดในระบบ"""
         try:
-            with self._connect() as conn:
+            with self._read() as conn:
                 result = conn.execute("SELECT COUNT(*) FROM master_products").fetchone()
                 return result[0] if result else 0
         except Exception:
@@ -1,7 +1,8 @@
 from PySide6.QtWidgets import (
     QMainWindow, QTabWidget, QVBoxLayout, QHBoxLayout, QWidget, QStatusBar,
     QLabel, QPushButton, QMessageBox, QInputDialog, QTableWidgetItem,
-    QDialog, QFormLayout, QLineEdit, QDialogButtonBox, QTableWidget, QHeaderView, QComboBox
+    QDialog, QFormLayout, QLineEdit, QDialogButtonBox, QTableWidget, QHeaderView, QComboBox,
+    QApplication, QFileDialog, QProgressDialog
 )
 from PySide6.QtCore import Qt, QSize
 from PySide6.QtGui import QIcon, QAction, QPixmap
@@ -9,6 +10,8 @@ import os
 import qrcode
 from io import BytesIO
 from utils.mobile_connection_server import MobileConnectionServer
+from core.backup import BackupManager
+from .storage_events import StorageEvents
 
 from .tabs.dashboard_tab import DashboardTab
 from .tabs.master_tab import MasterTab
@@ -22,9 +25,14 @@ class MainWindow(QMainWindow):
     def __init__(self, storage, auth_manager=None, current_user=None, app=None):
         super().__init__()
         self.storage = storage
+        # การเปลี่ยนแปลงข้อมูลจากทุก thread / process ส่งมาเป็น Qt signal บน GUI thread
+        self.storage_events = StorageEvents(storage, parent=self)
+        self._tab_revisions = {}
         self.auth_manager = auth_manager
         self.current_user = current_user
         self.app = app
+        # ใช้ BackupManager ตัวเดียวกับตารางเวลาสำรองของแอป (กันการสำรองซ้อนกัน)
+        self.backup_manager = getattr(app, "backup_manager", None) or BackupManager(storage)
         
         # Set window title with user info
         title = "Fabric Roll Management System"
@@ -106,7 +114,7 @@ class MainWindow(QMainWindow):
         self.tab_widget = QTabWidget()
         
         # Add tabs
-        self.dashboard_tab = DashboardTab(self.storage)
+        self.dashboard_tab = DashboardTab(self.storage, self.storage_events)
         self.receive_tab = ReceiveTab(self.storage, self.current_user)
         self.dispatch_tab = DispatchTab(self.storage, self.current_user)
         self.rolls_tab = RollsTab(self.storage, self.current_user)
@@ -147,9 +155,26 @@ class MainWindow(QMainWindow):
         
         layout.addWidget(self.tab_widget)
     
+    # ตารางที่แต่ละแท็บแสดง ใช้ข้ามการโหลดซ้ำเมื่อข้อมูลไม่เปลี่ยนตั้งแต่ครั้งก่อน
+    TAB_TABLES = (
+        (DashboardTab, DashboardTab.WATCHED_TABLES),
+        (MasterTab, ("master_products",)),
+        (ReceiveTab, ("master_products",)),
+        (RollsTab, ("rolls",)),
+        (DispatchTab, ("rolls", "dispatch")),
+        (LogsTab, ("logs",)),
+        (StatisticsTab, ("rolls",)),
+    )
+
     def on_tab_changed(self, index):
-        """เรียกใช้ฟังก์ชัน Refresh ของแท็บที่ถูกเลือก"""
+        """เรียกใช้ฟังก์ชัน Refresh ของแท็บที่ถูกเลือก (เฉพาะเมื่อตารางที่แท็บใช้มี revision ใหม่)"""
         tab = self.tab_widget.widget(index)
+        tables = next((t for cls, t in self.TAB_TABLES if isinstance(tab, cls)), None)
+        if tables:
+            revision = self.storage_events.revision(*tables)
+            if self._tab_revisions.get(id(tab)) == revision:
+                return
+            self._tab_revisions[id(tab)] = revision
         
         # ค้นหาว่าเป็นแท็บไหนแล้วสั่ง Refresh
         if isinstance(tab, DashboardTab):
@@ -215,6 +240,18 @@ class MainWindow(QMainWindow):
         settings_action.setStatusTip("Application settings")
         settings_action.triggered.connect(self.show_settings)
         tools_menu.addAction(settings_action)
+
+        tools_menu.addSeparator()
+
+        backup_action = QAction("&Backup Database Now", self)
+        backup_action.setStatusTip("Save a compressed snapshot of the database")
+        backup_action.triggered.connect(self.backup_database)
+        tools_menu.addAction(backup_action)
+
+        restore_action = QAction("&Restore Database...", self)
+        restore_action.setStatusTip("Replace the database with a verified backup")
+        restore_action.triggered.connect(self.restore_database)
+        tools_menu.addAction(restore_action)
         
         # User menu
         user_menu = menubar.addMenu("&User")
@@ -299,6 +336,59 @@ class MainWindow(QMainWindow):
         # TODO: Implement settings dialog
         QMessageBox.information(self, "Settings", "Settings dialog will be implemented here")
     
+    def backup_database(self):
+        """สำรองฐานข้อมูลทันที (คัดลอกทีละช่วงหน้า หน้าต่างยังตอบสนองระหว่างคัดลอก)"""
+        progress = QProgressDialog("กำลังสำรองฐานข้อมูล...", None, 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+
+        def on_progress(copied, total):
+            progress.setValue(int(copied * 100 / total) if total else 100)
+            QApplication.processEvents()
+
+        try:
+            result = self.backup_manager.backup(progress=on_progress)
+        except Exception as e:
+            QMessageBox.critical(self, "Backup", f"สำรองฐานข้อมูลไม่สำเร็จ:\n{e}")
+            return
+        finally:
+            progress.close()
+        QMessageBox.information(
+            self, "Backup",
+            f"สำรองฐานข้อมูลเรียบร้อย\n\n{result.path}\n"
+            f"{result.db_bytes / 1e6:.1f} MB -> {result.compressed_bytes / 1e6:.1f} MB, "
+            f"{result.total_seconds:.1f} วินาที ({result.throughput:.1f} MB/s)"
+        )
+
+    def restore_database(self):
+        """กู้คืนฐานข้อมูลจากไฟล์สำรองที่ตรวจผ่านแล้ว (สำรองข้อมูลปัจจุบันไว้ก่อนเสมอ)"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Restore Database", str(self.backup_manager.backup_dir),
+            "Database Backups (*.db.gz *.db)"
+        )
+        if not path:
+            return
+        reply = QMessageBox.question(
+            self, "Restore Database",
+            f"ข้อมูลปัจจุบันทั้งหมดจะถูกแทนที่ด้วย\n{os.path.basename(path)}\n\n"
+            "ระบบจะสำรองข้อมูลปัจจุบันไว้ก่อน ต้องการดำเนินการต่อหรือไม่?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            safety = self.backup_manager.restore(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Restore Database", f"กู้คืนไม่สำเร็จ ข้อมูลเดิมไม่ถูกเปลี่ยนแปลง:\n{e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        QMessageBox.information(
+            self, "Restore Database",
+            f"กู้คืนฐานข้อมูลเรียบร้อย\nข้อมูลก่อนกู้คืนถูกเก็บไว้ที่ {safety.path.name}"
+        )
+
     def show_about(self):
         """Show about dialog"""
         about_text = """
@@ -324,6 +414,7 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.StandardButton.Yes:
             # Save any unsaved data
             self.save_settings()
+            self.storage_events.close()
             event.accept()
         else:
             event.ignore()
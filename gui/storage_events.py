@@ -0,0 +1,33 @@
+from PySide6.QtCore import QObject, Signal
+
+from core.change_feed import ChangeEvent
+
+
+class StorageEvents(QObject):
+    """
+    สะพานจาก StorageManager.changes มาเป็น Qt signal
+    callback ของ ChangeFeed อาจถูกเรียกจาก thread ใดก็ได้ (API server, mobile server, thread เฝ้า data_version)
+    การ emit ข้าม thread ทำให้ Qt ส่งต่อแบบ queued ไปยัง slot บน GUI thread เสมอ
+    """
+    data_changed = Signal(object)  # ChangeEvent
+
+    def __init__(self, storage, watch_interval: float = 1.0, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        storage.changes.subscribe(self._on_change)
+        # จับการเขียนจากเครื่อง/โปรแกรมอื่นที่ใช้ฐานข้อมูลเดียวกัน
+        storage.watch_changes(watch_interval)
+
+    def _on_change(self, event: ChangeEvent):
+        try:
+            self.data_changed.emit(event)
+        except RuntimeError:
+            # QObject ถูกลบไปแล้ว (หน้าต่างถูกปิด) เลิกติดตาม
+            self.close()
+
+    def revision(self, *tables: str) -> int:
+        """revision ล่าสุดของตารางที่ระบุ ใช้ตัดสินว่าหน้าจอต้องโหลดใหม่หรือไม่"""
+        return self.storage.changes.revision(*tables)
+
+    def close(self):
+        self.storage.changes.unsubscribe(self._on_change)
@@ -11,7 +11,10 @@ from datetime import datetime, timedelta
 logger = logging.getLogger(__name__)
 
 class DashboardTab(QWidget):
-    def __init__(self, storage):
+    # ตารางที่ข้อมูลบน Dashboard อ้างอิง
+    WATCHED_TABLES = ("rolls", "logs", "master_products")
+
+    def __init__(self, storage, events=None):
         super().__init__()
         self.storage = storage
         self.setup_ui()
@@ -22,11 +25,19 @@ class DashboardTab(QWidget):
         # Set up auto-refresh timer (every 5 seconds)
         self.refresh_timer = QTimer(self)
         self.refresh_timer.timeout.connect(self.refresh_data)
-        self.refresh_timer.start(5000)  # 5 seconds
         
-        # Connect to storage signals if available
-        if hasattr(storage, 'data_changed'):
-            storage.data_changed.connect(self.refresh_data)
+        # มี StorageEvents: refresh เฉพาะเมื่อข้อมูลเปลี่ยน (รวมเหตุการณ์ที่มาติดกันเป็นครั้งเดียว)
+        # ไม่มี: poll ทุก 5 วินาทีแบบเดิม
+        if events is not None:
+            self.refresh_timer.setSingleShot(True)
+            events.data_changed.connect(self.on_data_changed)
+        else:
+            self.refresh_timer.start(5000)  # 5 seconds
+
+    def on_data_changed(self, event):
+        if event.op == "reset" or event.table in self.WATCHED_TABLES:
+            if not self.refresh_timer.isActive():
+                self.refresh_timer.start(300)
     
     def setup_ui(self):
         """Set up the dashboard UI components"""
@@ -170,19 +181,18 @@ class DashboardTab(QWidget):
             self.total_master_data_card.findChild(QLabel).setText(str(master_count))
             
             # Update total rolls count
-            total_rolls = self.storage.get_roll_count()
+            total_rolls = self.storage.get_roll_count(include_archive=True)
             self.total_rolls_card.findChild(QLabel).setText(str(total_rolls))
             
-            # Update active rolls count
-            active_rolls = self.storage.get_roll_active_count()
+            # Update active rolls count (อ่านจาก stock_summary ไม่ต้องนับทั้งตาราง rolls)
+            active_rolls = self.storage.get_stock_totals().active_count
             self.active_rolls_card.findChild(QLabel).setText(str(active_rolls))
             
-            # Update today's activities
+            # Update today's activities (นับใน SQL ผ่าน index ของ timestamp)
             today = datetime.now().date()
-            today_activities = len([
-                log for log in self.storage.get_logs() 
-                if datetime.fromisoformat(log.timestamp).date() == today
-            ])
+            today_activities = self.storage.count_logs(
+                date_from=today.isoformat(), date_to=(today + timedelta(days=1)).isoformat()
+            )
             self.recent_activities_card.findChild(QLabel).setText(str(today_activities))
             
         except Exception as e:
@@ -190,13 +200,11 @@ class DashboardTab(QWidget):
     
     def update_recent_rolls(self):
         """Update the recent rolls table"""
-        # Get recent rolls (last 10) - sort by roll_id as fallback
-        all_rolls = self.storage.search_rolls()
-        recent_rolls = sorted(
-            all_rolls,
-            key=lambda x: x.roll_id,
-            reverse=True
-        )[:10]
+        # Get recent rolls (last 10 by roll_id) - only the columns shown in the table
+        recent_rolls, _ = self.storage.search_rolls_page(
+            order_by="-roll_id", limit=10,
+            columns=("roll_id", "code", "lot_no", "width", "location", "status")
+        )
         
         # Clear table
         self.recent_rolls_table.setRowCount(0)
@@ -210,7 +218,7 @@ class DashboardTab(QWidget):
             self.recent_rolls_table.setItem(row, 0, QTableWidgetItem(roll.roll_id))
             self.recent_rolls_table.setItem(row, 1, QTableWidgetItem(roll.code))
             self.recent_rolls_table.setItem(row, 2, QTableWidgetItem(roll.lot_no))
-            self.recent_rolls_table.setItem(row, 3, QTableWidgetItem(roll.width or ""))
+            self.recent_rolls_table.setItem(row, 3, QTableWidgetItem(str(roll.width or "")))
             self.recent_rolls_table.setItem(row, 4, QTableWidgetItem(roll.location))
             
             # Color code based on status
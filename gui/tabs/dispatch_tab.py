@@ -100,7 +100,10 @@ class DispatchTab(QWidget):
     def load_history(self):
         self.history_table.setSortingEnabled(False) # ปิดชั่วคราว
         # ดึงข้อมูลจากตาราง dispatch โดยตรง
-        history = self.storage.get_dispatch_history(limit=15)
+        history = self.storage.get_dispatch_history(limit=15, columns=(
+            "timestamp", "roll_id", "pdt_code", "length_dispatched",
+            "document_no", "customer_code", "customer_name"
+        ))
         self.history_table.setRowCount(0)
         for item in history:
             row = self.history_table.rowCount()
@@ -14,6 +14,9 @@ class LogsTab(QWidget):
         super().__init__()
         self.storage = storage
         self.current_user = current_user
+        self.all_logs = []
+        self.page_size = 500
+        self.log_cursor = None
         self.setup_ui()
         self.load_logs()
     
@@ -83,11 +86,16 @@ class LogsTab(QWidget):
         self.export_btn = QPushButton("Export to CSV")
         self.export_btn.clicked.connect(self.export_logs)
         
+        self.load_more_btn = QPushButton("Load More")
+        self.load_more_btn.clicked.connect(self.load_more_logs)
+        self.load_more_btn.hide()
+        
         self.clear_btn = QPushButton("Clear Logs")
         self.clear_btn.clicked.connect(self.clear_logs)
         self.clear_btn.setStyleSheet("background-color: #ffcccc;")
         
         btn_layout.addWidget(self.refresh_btn)
+        btn_layout.addWidget(self.load_more_btn)
         btn_layout.addStretch()
         btn_layout.addWidget(self.export_btn)
         btn_layout.addWidget(self.clear_btn)
@@ -124,53 +132,39 @@ class LogsTab(QWidget):
     
     def load_logs(self):
         """Load logs from storage"""
-        # Get all logs
-        self.all_logs = self.storage.get_logs()
-        
-        # Apply filters
+        # Apply filters (ค้นหาในฐานข้อมูลโดยตรง)
         self.apply_filters()
     
+    def _current_filters(self):
+        """ค่าตัวกรองปัจจุบันในรูปแบบ argument ของ storage.search_logs"""
+        return {
+            "text": self.search_input.text().strip(),
+            "action": self.action_filter.currentData(),
+            "user": self.user_filter.text().strip(),
+            "date_from": self.start_date.date().toString("yyyy-MM-dd"),
+            "date_to": self.end_date.date().addDays(1).toString("yyyy-MM-dd"),
+        }
+    
     def apply_filters(self):
         """Apply filters to the logs and update UI"""
-        # ปิดการเรียงลำดับชั่วคราวเพื่อประสิทธิภาพ
-        self.logs_table.setSortingEnabled(False)
         self.logs_table.setRowCount(0)
+        self.all_logs = []
+        self.log_cursor = None
+        self.load_more_logs()
+    
+    def load_more_logs(self):
+        """ดึงหน้าถัดไปของ logs ที่ตรงตัวกรองจาก storage.search_logs แล้วต่อท้ายตาราง"""
+        logs, self.log_cursor = self.storage.search_logs(
+            **self._current_filters(), limit=self.page_size, cursor=self.log_cursor
+        )
+        self.all_logs.extend(logs)
+        self.load_more_btn.setVisible(self.log_cursor is not None)
         
-        # Get filter values
-        start_date = self.start_date.date().toString("yyyy-MM-dd")
-        end_date = self.end_date.date().addDays(1).toString("yyyy-MM-dd")
-        action_filter = self.action_filter.currentData()
-        user_filter = self.user_filter.text().lower()
-        search_text = self.search_input.text().lower()
+        # ปิดการเรียงลำดับชั่วคราวเพื่อประสิทธิภาพ
+        self.logs_table.setSortingEnabled(False)
         
-        # Filter and display logs
-        for log in self.all_logs:
-            # Skip if invalid
-            if not hasattr(log, 'timestamp') or not hasattr(log, 'action'):
-                continue
-            
-            # Apply date filter
-            log_date = log.timestamp.split('T')[0] if 'T' in log.timestamp else log.timestamp.split(' ')[0]
-            if log_date < start_date or log_date >= end_date:
-                continue
-            
-            # Apply action filter
-            if action_filter and log.action != action_filter:
-                continue
-            
-            # Apply user filter
+        for log in logs:
             l_user = getattr(log, 'user', '') or 'system'
-            if user_filter and user_filter not in l_user.lower():
-                continue
-            
-            # Apply search text filter
-            if search_text:
-                l_details = str(getattr(log, 'details', ''))
-                l_roll = str(getattr(log, 'roll_id', '') or '')
-                if search_text not in l_details.lower() and \
-                   search_text not in l_roll.lower() and \
-                   search_text not in str(log.action).lower():
-                    continue
             
             # --- Add to table ---
             row = self.logs_table.rowCount()
@@ -356,6 +350,17 @@ class LogsTab(QWidget):
         )
         dialog.exec()
     
+    def _iter_filtered_logs(self):
+        """วนดึง logs ทุกหน้าที่ตรงตัวกรองปัจจุบัน"""
+        cursor = None
+        while True:
+            logs, cursor = self.storage.search_logs(
+                **self._current_filters(), limit=1000, cursor=cursor
+            )
+            yield from logs
+            if cursor is None:
+                break
+    
     def export_logs(self):
         """Export logs to CSV file"""
         if not self.all_logs:
@@ -373,9 +378,9 @@ class LogsTab(QWidget):
             return  # User cancelled
         
         try:
-            # Prepare data for export
+            # Prepare data for export (ทุกหน้าที่ตรงตัวกรอง)
             data = []
-            for log in self.all_logs:
+            for log in self._iter_filtered_logs():
                 # Format timestamp
                 try:
                     dt = datetime.fromisoformat(log.timestamp.replace('Z', '+00:00'))
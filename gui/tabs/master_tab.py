@@ -118,7 +118,8 @@ class MasterTab(QWidget):
     def load_data(self):
         """Load master data from database and populate the table"""
         try:
-            self.master_products = self.storage.get_all_master_products()
+            # ดึงเฉพาะคอลัมน์ที่แสดงในตาราง (master_products อาจมีคอลัมน์จำนวนมากตามไฟล์ที่นำเข้า)
+            self.master_products = self.storage.get_all_master_products(columns=self.column_keys)
             self._refresh_table()
         except Exception as e:
             QMessageBox.critical(self, "Load Error", f"ไม่สามารถโหลดข้อมูลจากฐานข้อมูลได้:\n{e}")
@@ -170,16 +171,18 @@ class MasterTab(QWidget):
     
     def filter_table(self):
         """Filter the table based on search text"""
-        search_text = self.search_input.text().lower()
+        search_text = self.search_input.text().strip()
+        
+        # ค้นหาผ่าน full-text index ของ master_products ครั้งเดียว แล้วเทียบกับ pdt_code ในตาราง
+        matched_codes = None
+        if search_text:
+            matched_codes = {
+                product.pdt_code for product in self.storage.search_master(search_text, limit=None)
+            }
         
         for row in range(self.table.rowCount()):
-            match = False
-            for col in range(self.table.columnCount()):
-                item = self.table.item(row, col)
-                if item and search_text in item.text().lower():
-                    match = True
-                    break
-            
+            item = self.table.item(row, 0)
+            match = matched_codes is None or (item is not None and item.text() in matched_codes)
             self.table.setRowHidden(row, not match)
         
         # Update count label for filtered results
@@ -282,12 +285,14 @@ class MasterTab(QWidget):
             
             # Normalize and convert to list of dicts
             df.columns = df.columns.str.strip().str.lower()
-            import_count = 0
-            for _, row in df.iterrows():
-                product_data = {key: str(row.get(key, "")) if not pd.isna(row.get(key)) else "" for key in self.column_keys}
-                if product_data['pdt_code']:
-                    self.storage.add_master_product(product_data)
-                    import_count += 1
+            keys = [key for key in self.column_keys if key in df.columns]
+            if 'pdt_code' not in keys:
+                raise ValueError("ไม่พบคอลัมน์ pdt_code ในไฟล์")
+            df = df[keys].astype(object).where(df[keys].notna(), "").astype(str)
+            products = df.to_dict('records')
+            
+            # บันทึกทั้งไฟล์ด้วย upsert แบบ chunk แทนการ insert ทีละแถว
+            import_count = self.storage.upsert_master_products(products, columns=keys)
             
             self.load_data()
             QMessageBox.information(self, "Import Results", f"นำเข้าข้อมูลสำเร็จ {import_count} รายการ")
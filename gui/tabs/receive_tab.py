@@ -19,8 +19,7 @@ class ReceiveTab(QWidget):
         self.storage = storage
         self.current_user = current_user
         
-        data_dir = os.path.join(os.getcwd(), "data")
-        self.controller = ReceiveController(self, storage, RollIDGenerator(data_dir))
+        self.controller = ReceiveController(self, storage, RollIDGenerator(storage))
         
         self.setup_ui()
         self.setup_autocomplete()
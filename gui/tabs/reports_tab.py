@@ -31,6 +31,7 @@ from datetime import datetime
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from utils.suppliers_manager import SuppliersManager
+from utils.stock_analytics import supplier_totals
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +45,10 @@ class ReportsTab(QWidget):
         self.all_rolls = []
         self.filtered_rolls = []
         self.display_limit = 100
+        # keyset pagination: โหลดจากฐานข้อมูลทีละหน้าแทนการโหลดทั้งหมดแล้วตัดใน Python
+        self.roll_filters = {}
+        self.roll_cursor = None
+        self.roll_total = 0
 
         # Initialize suppliers manager
         suppliers_path = os.path.join(
@@ -75,16 +80,8 @@ class ReportsTab(QWidget):
         layout.addWidget(tabs)
 
     def load_rolls_data(self):
-        """โหลดข้อมูลม้วนทั้งหมดจาก storage"""
+        """โหลดข้อมูลม้วนหน้าแรกจาก storage"""
         try:
-            if hasattr(self.storage, "search_rolls"):
-                # Fetch ALL rolls (empty query)
-                self.all_rolls = self.storage.search_rolls("")
-            elif hasattr(self.storage, "get_all_rolls"):
-                self.all_rolls = self.storage.get_all_rolls()
-            else:
-                self.all_rolls = []
-
             # Reset filter and limit
             self.display_limit = 100
             self.apply_roll_filters()
@@ -251,28 +248,36 @@ class ReportsTab(QWidget):
 
     # ========== Rolls Search Methods ==========
 
+    # ชื่อในตัวเลือกค้นหา -> คอลัมน์ในตาราง rolls
+    ROLL_FILTER_COLUMNS = {
+        "Code": "code",
+        "Location": "location",
+        "Roll ID": "roll_id",
+        "Lot": "lot_no",
+    }
+
     def apply_roll_filters(self):
-        """ใช้ตัวกรองการค้นหาแบบ dropdown + text (ใช้ database query เพื่อความเร็ว)"""
+        """ใช้ตัวกรองการค้นหาแบบ dropdown + text (query ฐานข้อมูลทีละหน้า)"""
         keyword = self.filter_input.text().strip()
         field = self.filter_field_combo.currentText()
 
-        if not keyword:
-            # ไม่มี keyword แสดงทั้งหมด (ใช้ cache ถ้ามี)
-            if not self.all_rolls:
-                self.load_rolls_data()
-            self.filtered_rolls = self.all_rolls
-        else:
-            # ใช้ database query แทน Python loop
-            try:
-                self.filtered_rolls = self.storage.search_rolls_by_field(field, keyword)
-            except Exception as e:
-                # Fallback ถ้า database error
-                logger.warning(f"Database search error: {e}, falling back to Python filter")
-                self.filtered_rolls = [
-                    roll for roll in self.all_rolls
-                    if keyword.lower() in str(getattr(roll, field.replace(" ", "_").lower(), "") or "").lower()
-                ]
+        self.roll_filters = {}
+        if keyword:
+            # ค้นหาแบบ substring (ใช้ full-text index ของ rolls เมื่อคำค้นยาวตั้งแต่ 3 ตัวอักษร)
+            self.roll_filters[self.ROLL_FILTER_COLUMNS.get(field, "code")] = keyword
 
+        try:
+            self.roll_total = self.storage.count_rolls(self.roll_filters)
+            rolls, self.roll_cursor = self.storage.search_rolls_page(
+                self.roll_filters, after=None, limit=self.display_limit
+            )
+        except Exception as e:
+            logger.warning(f"Database search error: {e}")
+            rolls, self.roll_cursor, self.roll_total = [], None, 0
+
+        self.filtered_rolls = rolls
+        if not keyword:
+            self.all_rolls = rolls
         self.refresh_rolls_table(self.filtered_rolls)
 
     def clear_roll_filters(self):
@@ -285,15 +290,15 @@ class ReportsTab(QWidget):
     def refresh_rolls_table(self, rolls: List[Roll]):
         """อัปเดตตารางม้วนตามรายการที่ให้มา (พร้อม Pagination)"""
 
-        # Apply pagination
-        display_rolls = rolls[: self.display_limit]
+        # rolls คือหน้าที่โหลดมาแล้วทั้งหมด
+        display_rolls = rolls
         self.rolls_table.setRowCount(len(display_rolls))
 
         # Update Load More button
-        if len(rolls) > self.display_limit:
+        if self.roll_cursor is not None:
             self.load_more_btn.setVisible(True)
             self.load_more_btn.setText(
-                f"Show More (+100) - Showing {len(display_rolls)} of {len(rolls)}"
+                f"Show More (+100) - Showing {len(display_rolls)} of {self.roll_total}"
             )
         else:
             self.load_more_btn.setVisible(False)
@@ -324,8 +329,14 @@ class ReportsTab(QWidget):
         self.rolls_table.resizeColumnsToContents()
 
     def load_more_rolls(self):
-        """โหลดข้อมูลเพิ่มอีก 100 รายการ"""
-        self.display_limit += 100
+        """โหลดข้อมูลเพิ่มอีก 100 รายการ (หน้าถัดไปจาก cursor)"""
+        if self.roll_cursor is None:
+            return
+        rolls, self.roll_cursor = self.storage.search_rolls_page(
+            self.roll_filters, after=self.roll_cursor, limit=100
+        )
+        self.filtered_rolls = self.filtered_rolls + rolls
+        self.display_limit = len(self.filtered_rolls)
         self.refresh_rolls_table(self.filtered_rolls)
 
     def export_to_excel(self):
@@ -348,36 +359,43 @@ class ReportsTab(QWidget):
             if not filename.lower().endswith(".xlsx"):
                 filename += ".xlsx"
 
-            # Prepare data for DataFrame
-            data = []
-            for roll in self.filtered_rolls:
-                data.append(
-                    {
-                        "Roll ID": roll.roll_id,
-                        "Code": roll.code,
-                        "Sub Part Code": roll.sub_part_code,
-                        "Sup Code": roll.sup_code,
-                        "Supplier Name": roll.supplier_name,
-                        "Description": roll.description,
-                        "Lot No.": roll.lot_no,
-                        "Quantity": roll.quantity,
-                        "Location": roll.location,
-                        "Unit": roll.unit,
-                        "Color": roll.color,
-                        "Width": roll.width,
-                        "Length": roll.length,
-                        "Status": roll.status,
-                    }
-                )
-
-            df = pd.DataFrame(data)
-            df.to_excel(filename, index=False)
+            # ทุกแถวที่ตรงตัวกรอง (ไม่ใช่เฉพาะที่แสดงอยู่) ดึงแบบ columnar เป็น DataFrame โดยตรง
+            df = self.storage.fetch_columns(
+                "rolls", tuple(self.EXPORT_COLUMNS.values()) + ("length_original",),
+                self.roll_filters, as_frame=True, order_by="roll_id"
+            )
+            # ยอดรวมต่อ supplier คำนวณจากคอลัมน์ที่ดึงมาแล้วทั้งก้อน
+            summary = supplier_totals(df)
+            df = df[list(self.EXPORT_COLUMNS.values())]
+            df.columns = list(self.EXPORT_COLUMNS)
+
+            with pd.ExcelWriter(filename) as writer:
+                df.to_excel(writer, sheet_name="Rolls", index=False)
+                summary.to_excel(writer, sheet_name="Supplier Summary", index=False)
 
             QMessageBox.information(self, "Success", f"Exported to {filename}")
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to export: {str(e)}")
 
+    # หัวคอลัมน์ใน Excel -> คอลัมน์ในตาราง rolls
+    EXPORT_COLUMNS = {
+        "Roll ID": "roll_id",
+        "Code": "code",
+        "Sub Part Code": "sub_part_code",
+        "Sup Code": "sup_code",
+        "Supplier Name": "supplier_name",
+        "Description": "description",
+        "Lot No.": "lot_no",
+        "Quantity": "quantity",
+        "Location": "location",
+        "Unit": "unit",
+        "Color": "color",
+        "Width": "width",
+        "Length": "length",
+        "Status": "status",
+    }
+
     def refresh_data(self):
         """Refresh data from storage (called by signal)"""
         self.load_rolls_data()
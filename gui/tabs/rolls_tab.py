@@ -122,6 +122,10 @@ class RollsTab(QWidget):
         """Proxy สำหรับเพิ่มม้วนผ้าใหม่จากแท็บอื่น"""
         return self.controller.add_new_roll(roll_data)
 
+    def add_new_rolls(self, roll_data_list):
+        """Proxy สำหรับเพิ่มม้วนผ้าหลายม้วนในครั้งเดียว"""
+        return self.controller.add_new_rolls(roll_data_list)
+
     def print_roll_label(self, roll):
         """สร้างฉลากและแสดง Preview ก่อนสั่งพิมพ์"""
         try:
@@ -263,17 +267,25 @@ class RollsTab(QWidget):
         location_text = self.location_filter.currentText()
         status_text = self.status_filter.currentText()
         
+        # ค้นหาข้อความผ่าน full-text index ครั้งเดียว แล้วเทียบกับ roll_id ในตาราง
+        matched_ids = None
+        if search_text:
+            matched_ids = {
+                roll.roll_id.lower() for roll in self.storage.search_rolls_text(
+                    search_text, limit=None, fields=['roll_id', 'code', 'lot_no']
+                )
+            }
+        
         for row in range(self.table.rowCount()):
             roll_id = self.table.item(row, 0).text().lower()
             code = self.table.item(row, 2).text()
-            lot = self.table.item(row, 7).text().lower()
             location = self.table.item(row, 8).text()
             status = self.table.item(row, 9).text()
             
             show = (code_text == "ทั้งหมด" or not code_text or code_text.lower() in code.lower()) and \
                    (location_text == "ทั้งหมด" or not location_text or location_text.lower() in location.lower()) and \
                    (status_text == "ทั้งหมด" or not status_text or status_text.lower() in status.lower()) and \
-                   (not search_text or search_text in roll_id or search_text in lot)
+                   (matched_ids is None or roll_id in matched_ids)
                    
             self.table.setRowHidden(row, not show)
             
@@ -304,7 +316,7 @@ class RollsTab(QWidget):
                 username = self.current_user.full_name
                 
             if self.storage.update_roll(roll_id, **new_data):
-                self.storage.add_log("edit", roll_id, {"old": roll.__dict__, "new": new_data}, user=username)
+                self.storage.add_log("edit", roll_id, {"old": roll.to_dict(), "new": new_data}, user=username)
                 QMessageBox.information(self, "สำเร็จ", f"แก้ไขม้วน {roll_id} เรียบร้อย")
                 self.controller.refresh_data()
             else:
@@ -16,16 +16,18 @@ from controllers.scan_controller import ScanController
 
 class ScanTab(QWidget):
     refresh_reports = pyqtSignal()
+    # ผลการบันทึกสแกนจากมือถือ (roll_id, สำเร็จหรือไม่) emit จาก thread ที่เขียนฐานข้อมูล มาทำงานต่อบน GUI thread
+    mobile_scan_saved = pyqtSignal(str, bool)
 
     def __init__(self, storage, current_user=None):
         super().__init__()
         self.storage = storage
         self.current_user = current_user
         
-        data_dir = os.path.join(os.getcwd(), "data")
-        self.roll_id_generator = RollIDGenerator(data_dir)
-        self.suppliers_manager = SuppliersManager()
+        self.roll_id_generator = RollIDGenerator(storage)
+        self.suppliers_manager = SuppliersManager(storage=storage)
         self.controller = ScanController(self, storage, self.roll_id_generator, self.suppliers_manager)
+        self.mobile_scan_saved.connect(self.controller.on_mobile_scan_saved)
         
         self.setup_ui()
 
@@ -15,7 +15,7 @@ class StatisticsTab(QWidget):
         super().__init__()
         self.storage = storage
         self.current_user = current_user
-        self.suppliers_manager = SuppliersManager()
+        self.suppliers_manager = SuppliersManager(storage=storage)
         self.controller = StatisticsController(self, storage, self.suppliers_manager)
         self.setup_ui()
         self.controller.refresh_data()
@@ -111,6 +111,11 @@ class StatisticsTab(QWidget):
         self.stock_count_label = QLabel("แสดงผล: 0 จากทั้งหมด 0 ม้วน")
         self.stock_count_label.setStyleSheet("font-weight: bold; color: #555; margin-top: 2px;")
         stock_layout.addWidget(self.stock_count_label)
+
+        # Summary Label (ยอดรวมของทุกแถวที่ตรงตัวกรอง)
+        self.stock_summary_label = QLabel("")
+        self.stock_summary_label.setStyleSheet("color: #555;")
+        stock_layout.addWidget(self.stock_summary_label)
         
         # Load More
         self.load_more_btn = QPushButton("Load More Stock...")
@@ -225,6 +230,12 @@ class StatisticsTab(QWidget):
         self.dispatch_table.resizeColumnsToContents()
         self.dispatch_count_label.setText(f"ทั้งหมด: {self.dispatch_table.rowCount()} รายการ")
 
+    def update_stock_summary(self, summary):
+        self.stock_summary_label.setText(
+            f"ความยาวรวม: {summary.sum_length:,.2f} ม. | เต็มม้วน: {summary.full_count} ม้วน | "
+            f"เศษ: {summary.scrap_count} ม้วน ({summary.scrap_length:,.2f} ม.)"
+        )
+
     def update_load_more_btn(self, current, total):
         if current < total:
             self.load_more_btn.setText(f"Load More ({current}/{total})")
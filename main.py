@@ -3,6 +3,7 @@ import os
 import json
 import logging
 import socket
+import threading
 from pathlib import Path
 from PySide6.QtWidgets import QApplication, QMessageBox
 from PySide6.QtCore import Qt, QThread, Signal, QLocale
@@ -10,6 +11,8 @@ from PySide6.QtGui import QIcon
 from gui.main_window import MainWindow
 from gui.dialogs.login_dialog import LoginDialog
 from core.storage import StorageManager
+from core.backup import BackupManager
+from core.config import config
 from core.api_server import APIServer
 from core.auth import AuthManager
 
@@ -70,6 +73,16 @@ class FabricRollApp(QApplication):
             roll_count = self.storage.get_total_rolls_count()
             master_count = self.storage.get_total_master_count()
             self.status_summary.append(("Database", "OK", f"{roll_count} Rolls, {master_count} Products loaded"))
+            # สำรองฐานข้อมูลตามตารางเวลา (database.backup_interval_hours) และจากเมนู Tools
+            self.backup_manager = BackupManager(self.storage)
+            self.backup_manager.start_schedule(config.get('database.backup_interval_hours', 24))
+            # ย้าย logs / ม้วนที่ใช้หมดแล้วที่เก่าไป archive ใน background ตอนเปิดโปรแกรมและทุกวัน
+            # (เปิดเองด้วย database.log_hot_days / database.roll_archive_days ค่าเริ่มต้น 0 = ปิด)
+            if config.get('database.log_hot_days', 0) > 0 or config.get('database.roll_archive_days', 0) > 0:
+                self._archive_stop = threading.Event()
+                self._archiver = threading.Thread(target=self.run_archive_jobs, name="storage-archiver",
+                                                  daemon=True)
+                self._archiver.start()
 
             # 3. Authentication
             self.auth_manager = AuthManager(self.storage)
@@ -130,6 +143,27 @@ class FabricRollApp(QApplication):
             QMessageBox.critical(None, "Error", f"Failed to initialize application:\n{str(e)}")
             self.quit()
 
+    ARCHIVE_INTERVAL = 24 * 60 * 60  # seconds
+
+    def run_archive_jobs(self):
+        """
+        ย้าย logs ที่เก่ากว่า database.log_hot_days ไป data/log_archive (StorageManager.archive_logs)
+        และม้วนที่ใช้หมดแล้วเกิน database.roll_archive_days ไป rolls_archive (StorageManager.archive_rolls)
+        """
+        while True:
+            try:
+                # ม้วนก่อน logs: ความเคลื่อนไหวล่าสุดของม้วนดูจาก logs ในฐานข้อมูลหลัก
+                rolls = self.storage.archive_rolls()
+                if rolls:
+                    logger.info(f"Archived {rolls} used roll(s)")
+                moved = self.storage.archive_logs()
+                if moved:
+                    logger.info(f"Archived logs by month: {moved}")
+            except Exception as e:
+                logger.error(f"Error archiving old data: {e}")
+            if self._archive_stop.wait(self.ARCHIVE_INTERVAL):
+                break
+
     def print_system_summary(self):
         """แสดงตารางสรุปสถานะการเริ่มต้นระบบแบบสะอาดตา"""
         print("\n" + "="*60)
@@ -271,6 +305,24 @@ class FabricRollApp(QApplication):
             except Exception as e:
                 logger.error(f"Error stopping API server: {e}")
         
+        # หยุดและรอ thread เบื้องหลังที่ใช้ storage ก่อนปิด connection (งานที่กำลังทำอยู่จะทำจนจบ transaction)
+        if hasattr(self, '_archive_stop'):
+            self._archive_stop.set()
+            self._archiver.join(timeout=60)
+        if hasattr(self, 'backup_manager'):
+            self.backup_manager.stop_schedule(timeout=60)
+
+        # Close pooled database connections
+        if hasattr(self, 'storage') and self.storage:
+            try:
+                logger.info(f"Database pool stats: {self.storage.get_pool_stats()}")
+                logger.info(f"Master product cache stats: {self.storage.get_master_cache_stats()}")
+                logger.info(f"Writer stats: {self.storage.get_writer_stats()}")
+                logger.info(f"Log sink stats: {self.storage.get_log_stats()}")
+                self.storage.close()
+            except Exception as e:
+                logger.error(f"Error closing database connections: {e}")
+        
         logger.info("Application cleanup complete")
 
 def handle_exception(exc_type, exc_value, exc_traceback):
@@ -0,0 +1,129 @@
+"""
+Log archive
+ย้าย logs เก่าไปไฟล์ archive รายเดือน (data/log_archive/logs_YYYY_MM.db) และทดสอบการค้นข้าม archive
+
+    python script/archive_logs.py list                 แสดงเดือนที่มี archive และจำนวน logs
+    python script/archive_logs.py run [จำนวนวัน]       ย้าย logs ที่เก่ากว่าจำนวนวัน (ค่าเริ่มต้น database.log_hot_days)
+    python script/archive_logs.py bench [จำนวนเดือน] [logs ต่อเดือน]
+                                                      สร้าง logs ย้อนหลังบนฐานข้อมูลชั่วคราว แล้วเทียบเวลาค้นหา
+                                                      ก่อน / หลังแบ่ง archive และตรวจว่าผลลัพธ์ตรงกันทุกหน้า
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager
+
+
+def list_archives(storage) -> int:
+    print(f"hot logs: {storage.count_logs()}")
+    for month in storage.log_archive_months():
+        conn = storage._open_log_archive(month)
+        try:
+            print(f"  {month}: {conn.execute('SELECT COUNT(*) FROM logs').fetchone()[0]} log(s)")
+        finally:
+            conn.close()
+    return 0
+
+
+def all_pages(storage, page_size=200, **filters) -> list:
+    ids, cursor = [], None
+    while True:
+        logs, cursor = storage.search_logs(**filters, limit=page_size, cursor=cursor)
+        ids.extend(log.id for log in logs)
+        if cursor is None:
+            return ids
+
+
+def timed(fn, repeat=5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(n_months: int, per_month: int) -> int:
+    rng = random.Random(42)
+    now = datetime.now()
+    data_dir = tempfile.mkdtemp(prefix="log_archive_")
+    try:
+        storage = StorageManager(data_dir)
+        rows = []
+        for i in range(n_months * per_month):
+            ts = now - timedelta(days=rng.uniform(0, n_months * 30), seconds=rng.randrange(86400))
+            action = rng.choice(["dispatch", "roll_cut", "receive", "print"])
+            rows.append(storage._make_log_row(action, f"R{i:07d}", {"document_no": f"DOC{i % 500}"},
+                                              rng.choice(["admin", "staff"]), timestamp=ts.isoformat()))
+        with storage.transaction() as conn:
+            conn.executemany(storage._LOG_INSERT_SQL, rows)
+
+        recent = {"date_from": (now - timedelta(days=30)).date().isoformat()}
+        queries = {
+            "recent 30 days, first page": lambda: storage.search_logs(**recent, limit=200),
+            "dashboard count today": lambda: storage.count_logs(date_from=now.date().isoformat()),
+            "all time, text search": lambda: storage.search_logs(text="DOC42", limit=200),
+        }
+        before = {name: timed(fn) for name, fn in queries.items()}
+        expected = [all_pages(storage), all_pages(storage, action="dispatch", user="adm"),
+                    all_pages(storage, text="DOC42", date_from=(now - timedelta(days=400)).date().isoformat())]
+
+        start = time.perf_counter()
+        moved = storage.archive_logs(hot_days=90)
+        archive_seconds = time.perf_counter() - start
+        after = {name: timed(fn) for name, fn in queries.items()}
+        actual = [all_pages(storage), all_pages(storage, action="dispatch", user="adm"),
+                  all_pages(storage, text="DOC42", date_from=(now - timedelta(days=400)).date().isoformat())]
+
+        print(f"{len(rows)} logs over {n_months} months; archived {sum(moved.values())} into "
+              f"{len(moved)} file(s) in {archive_seconds:.2f}s, {storage.count_logs()} left hot")
+        print(f"{'query':<28} {'single table':>13} {'hot + archive':>14}")
+        print("-" * 57)
+        for name in queries:
+            print(f"{name:<28} {before[name] * 1000:>11.2f}ms {after[name] * 1000:>12.2f}ms")
+
+        with storage.attach_log_archives(storage.log_archive_months()[-3:]) as conn:
+            history = conn.execute("SELECT COUNT(*) FROM logs_history").fetchone()[0]
+        print(f"logs_history view over hot + last 3 archives: {history} rows")
+
+        total = storage.count_logs(include_archive=True)
+        ok = expected == actual and total == len(rows)
+        print("paged results identical before / after archiving" if ok else
+              f"MISMATCH: {[len(e) for e in expected]} vs {[len(a) for a in actual]}, total {total}")
+        storage.close()
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "bench":
+        return bench(int(sys.argv[2]) if len(sys.argv) > 2 else 24,
+                     int(sys.argv[3]) if len(sys.argv) > 3 else 2000)
+
+    data_dir = os.path.join(os.getcwd(), "data")
+    if not os.path.exists(os.path.join(data_dir, "storage.db")):
+        print(f"Database not found in {data_dir}.")
+        return 1
+    storage = StorageManager(data_dir)
+    if command == "run":
+        moved = storage.archive_logs(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+        for month, n in sorted(moved.items()):
+            print(f"  {month}: moved {n} log(s)")
+    status = list_archives(storage)
+    storage.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Roll archive
+ย้ายม้วนที่ใช้หมดแล้ว (status = 'used') ที่ไม่มีความเคลื่อนไหวนานไป rolls_archive
+
+    python script/archive_rolls.py run [จำนวนวัน]     ย้ายม้วนใน data/storage.db (ค่าเริ่มต้น database.roll_archive_days)
+    python script/archive_rolls.py bench [จำนวนม้วน]  สร้างคลังจำลองที่ม้วนส่วนใหญ่ใช้หมดแล้ว เทียบเวลา query
+                                                    ก่อน / หลังย้าย และตรวจว่า get_roll, ยอดคงคลัง ไม่เปลี่ยน และ Roll ID ใหม่ไม่ซ้ำม้วนที่ย้ายไป
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager
+
+
+def timed(fn, repeat=3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(n_rolls: int) -> int:
+    rng = random.Random(7)
+    now = datetime.now()
+    prefix = f"R{now:%y}"
+    data_dir = tempfile.mkdtemp(prefix="roll_archive_")
+    try:
+        storage = StorageManager(data_dir)
+        rolls = []
+        for i in range(1, n_rolls + 1):
+            received = now - timedelta(days=rng.uniform(0, 720))
+            used = rng.random() < 0.8 and received < now - timedelta(days=30)
+            rolls.append({
+                "roll_id": f"{prefix}{i:06d}", "code": f"C{rng.randrange(200):04d}",
+                "lot_no": f"LOT{rng.randrange(50):04d}", "location": f"WH-{rng.choice('ABC')}",
+                "length": 0.0 if used else 100.0, "length_original": 100.0,
+                "status": "used" if used else "active",
+                "date_received": received.strftime("%Y-%m-%d %H:%M:%S"),
+            })
+        storage.add_rolls(rolls)
+        # log roll_created ของคลังจำลองลงเวลาเดียวกับวันที่รับเข้า (เหมือนรับเข้าจริงในอดีต)
+        with storage.transaction() as conn:
+            conn.execute("UPDATE logs SET timestamp = (SELECT date_received FROM rolls WHERE roll_id = logs.roll_id)")
+        # ม้วนที่เพิ่งเบิกหมดเมื่อวาน ต้องไม่ถูกย้ายแม้จะรับเข้ามานานแล้ว
+        recent = next(r for r in rolls if r["status"] == "used")
+        storage.add_dispatch_record(storage.get_roll(recent["roll_id"]), 0.0, document_no="RECENT")
+
+        queries = {
+            "get_all_rolls": storage.get_all_rolls,
+            "search_rolls_text LOT0001": lambda: storage.search_rolls_text("LOT0001", limit=None),
+            "search_rolls_page": lambda: storage.search_rolls_page({"location": "WH-A"}, order_by="code"),
+        }
+        before = {name: timed(fn) for name, fn in queries.items()}
+        totals = storage.get_stock_totals()
+        sample = rng.sample([r["roll_id"] for r in rolls], 200)
+        expected = {roll_id: storage.get_roll(roll_id) for roll_id in sample}
+
+        start = time.perf_counter()
+        moved = storage.archive_rolls(older_than_days=30)
+        archive_seconds = time.perf_counter() - start
+        after = {name: timed(fn) for name, fn in queries.items()}
+
+        print(f"{n_rolls} rolls; archived {moved} used roll(s) in {archive_seconds:.2f}s, "
+              f"{storage.get_roll_count()} left in rolls")
+        print(f"{'query':<28} {'before':>10} {'after':>10}")
+        print("-" * 50)
+        for name in queries:
+            print(f"{name:<28} {before[name] * 1000:>8.1f}ms {after[name] * 1000:>8.1f}ms")
+
+        problems = []
+        if storage.get_roll(recent["roll_id"], include_archive=False) is None:
+            problems.append("recently dispatched roll was archived")
+        if any(storage.get_roll(roll_id) != roll for roll_id, roll in expected.items()):
+            problems.append("get_roll differs after archiving")
+        if storage.get_stock_totals() != totals:
+            problems.append("stock totals changed")
+        next_id = storage.allocate_roll_ids(1, prefix)[0]
+        if next_id != f"{prefix}{n_rolls + 1:06d}":
+            problems.append(f"next roll id {next_id} reuses or skips archived numbers")
+        if storage.get_roll_count(include_archive=True) != n_rolls:
+            problems.append("roll count including archive changed")
+        hot = storage.get_roll_count()
+        archived_id = next(roll_id for roll_id, roll in expected.items() if roll and roll.status == "used"
+                           and storage.get_roll(roll_id, include_archive=False) is None)
+        if not storage.restore_roll(archived_id) or storage.get_roll_count() != hot + 1:
+            problems.append("restore_roll did not move the roll back")
+        for problem in problems:
+            print(f"  PROBLEM: {problem}")
+        print("get_roll, stock totals and roll count unchanged; next roll id follows archived rolls" if not problems else
+              f"{len(problems)} problem(s)")
+        storage.close()
+        return 1 if problems else 0
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "run"
+    if command == "bench":
+        return bench(int(sys.argv[2]) if len(sys.argv) > 2 else 50000)
+
+    data_dir = os.path.join(os.getcwd(), "data")
+    if not os.path.exists(os.path.join(data_dir, "storage.db")):
+        print(f"Database not found in {data_dir}.")
+        return 1
+    storage = StorageManager(data_dir)
+    moved = storage.archive_rolls(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    print(f"archived {moved} roll(s); {storage.get_roll_count()} in rolls, "
+          f"{storage.get_archived_roll_count()} in rolls_archive")
+    storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Query plan audit
+สร้างฐานข้อมูลจำลองขนาดใหญ่ เรียกเมธอดของ StorageManager ทีละตัวพร้อมดักจับ SQL ที่ถูกส่งไปจริง
+(sqlite3 trace callback) แล้วรัน EXPLAIN QUERY PLAN กับทุกคำสั่ง
+จบด้วย exit code 1 ถ้ามี query ใด scan ทั้งตาราง (การ sort ผลลัพธ์ที่กรองแล้วแสดงเป็นหมายเหตุ)
+
+    python script/audit_query_plans.py [จำนวนม้วน] [-v]
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager, RollIDBlock
+
+# (เมธอด, args, kwargs, อ่านทั้งตารางโดยตั้งใจ)
+# เมธอดที่ตั้งใจอ่านทุกแถว (get_all_* / autocomplete / สรุปทั้งคลังไม่มีตัวกรอง) จะแสดงแผนแต่ไม่นับเป็นข้อผิดพลาด
+CASES = [
+    ("get_roll", ("R000123",), {}, False),
+    ("get_roll", ("R999999",), {}, False),
+    ("get_roll_by_code", ("C0012",), {}, False),
+    ("get_roll_count", ("R000123",), {}, False),
+    ("get_roll_count", (), {}, False),
+    ("get_roll_active_count", (), {}, False),
+    ("get_roll_active_count", ("R000123",), {}, False),
+    ("search_rolls", (), {"status": "active"}, False),
+    ("search_rolls", (), {"status": "active", "code": "C0012"}, False),
+    ("search_rolls", (), {"lot_no": "LOT0003"}, False),
+    ("search_rolls_page", ({"status": "active"},), {"order_by": "code"}, False),
+    ("search_rolls_page", ({"location": "WH-A03"},), {"order_by": "-date_received", "exact": True}, False),
+    ("search_rolls_page", (), {"order_by": "lot_no", "after": ("LOT0005", "R000100")}, False),
+    ("search_rolls_page", ({"code": "C0012"},), {"order_by": "roll_id"}, False),
+    ("count_rolls", ({"status": "active", "location": "WH-A03"},), {"exact": True}, False),
+    ("search_rolls_by_field", ("lot", "LOT0003"), {}, False),
+    ("search_rolls_by_field", ("location", "WH-A03"), {}, False),
+    ("search_rolls_text", ("C0012",), {}, False),
+    ("get_rolls_by_date_range", ("2024-03-01", "2024-03-08"), {}, False),
+    ("get_roll_statuses_count", (), {}, False),
+    ("get_roll_statuses_count", ("2024-03-01", "2024-03-08"), {}, False),
+    ("get_roll_types_count", ("2024-03-01", "2024-03-08"), {}, False),
+    ("aggregate_stock", (("code",),), {"filters": {"status": "active", "code": "C0012"}, "exact": True}, False),
+    ("aggregate_stock", (("supplier",),), {"filters": {"date_from": "2024-03-01", "date_to": "2024-04-01"}}, False),
+    ("aggregate_dispatch", (("day",),), {"date_from": "2024-03-01", "date_to": "2024-04-01"}, False),
+    ("aggregate_dispatch", (("month",),), {"filters": {"roll": "R000123"}}, False),
+    ("count_logs", (), {"date_from": "2024-03-01", "date_to": "2024-03-02"}, False),
+    ("update_roll", ("R000123",), {"location": "WH-B01"}, False),
+    ("archive_rolls", (), {"older_than_days": 30, "batch": 50}, False),
+    ("allocate_roll_ids", (5,), {}, False),
+    ("allocate_roll_ids", (5,), {}, False),
+    ("release_roll_ids", (RollIDBlock("R26", 1, 5),), {}, False),
+    ("get_roll_id_gaps", ("R26",), {}, False),
+    ("get_logs", (), {"limit": 100}, False),
+    ("get_logs", (), {"action": "roll_created"}, False),
+    ("get_logs", (), {"roll_id": "R000123"}, False),
+    ("search_logs", (), {"action": "roll_created", "date_from": "2024-03-01"}, False),
+    ("search_logs", (), {"text": "R000123"}, False),
+    ("search_logs", (), {"cursor": ("2024-03-01 00:00:00", "x")}, False),
+    ("get_dispatch_history", (), {}, False),
+    ("get_master_product", ("C0012",), {}, False),
+    ("search_master", ("C0012",), {}, False),
+    ("get_user", ("admin",), {}, False),
+    ("get_setting", ("theme",), {}, False),
+    ("get_all_rolls", (), {}, True),
+    ("get_all_master_products", (), {}, True),
+    ("get_master_autocomplete_data", (), {}, True),
+    ("get_supplier_stock_names", (), {}, True),
+    ("get_all_users", (), {}, True),
+    # stock_summary เล็กกว่า rolls มาก (หนึ่งแถวต่อ code, location, supplier)
+    ("get_stock_totals", (), {}, True),
+    ("get_stock_summary", (), {"filters": {"code": "C0012"}}, False),
+    ("aggregate_stock", (("supplier", "lot"),), {}, True),
+    ("aggregate_dispatch", (("customer",),), {}, True),
+]
+
+# "SCAN <table>" แบบไม่มี USING ถือว่าอ่านทั้งตาราง (ยกเว้น FTS virtual table และตารางระบบ sqlite_*)
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+TEMP_SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+
+def build_database(storage, n_rolls):
+    """เติมข้อมูลจำลอง: rolls + log ต่อม้วน, dispatch, master_products, supplier_stock, users"""
+    rolls = []
+    for i in range(n_rolls):
+        rolls.append({
+            "roll_id": f"R{i:06d}", "code": f"C{i % 2000:04d}", "lot_no": f"LOT{i % 500:04d}",
+            "location": f"WH-{'ABC'[i % 3]}{i % 40:02d}", "supplier_name": f"SUP{i % 80}",
+            "length": 100.0, "length_original": 100.0,
+            "status": "active" if i % 4 else "used",
+            "date_received": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:00:00",
+        })
+    storage.add_rolls(rolls, user="audit")
+
+    with storage.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO dispatch (timestamp, roll_id, pdt_code, length_dispatched, user) VALUES (?, ?, ?, ?, ?)",
+            [(r["date_received"], r["roll_id"], r["code"], 10.0, "audit") for r in rolls[::3]]
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO supplier_stock (pdt_code, supplier_name, location, qty) VALUES (?, ?, ?, ?)",
+            [(f"C{i:04d}", f"SUP{i % 80}", f"WH-{'ABC'[i % 3]}", 1.0) for i in range(2000)]
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO users (username, password_hash, role) VALUES ('admin', '', 'admin')"
+        )
+    storage.upsert_master_products(
+        {"pdt_code": f"C{i:04d}", "pdt_name": f"Fabric {i}", "spl_name": f"SUP{i % 80}"}
+        for i in range(2000)
+    )
+
+
+def audit_case(storage, method, args, kwargs):
+    """เรียกเมธอดพร้อมดักจับ SQL แล้วคืน [(sql, [บรรทัดของแผน])]"""
+    statements = []
+    conn = storage._connect()
+    conn.set_trace_callback(statements.append)
+    try:
+        getattr(storage, method)(*args, **kwargs)
+    finally:
+        conn.set_trace_callback(None)
+
+    plans = []
+    for sql in dict.fromkeys(statements):
+        head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if head not in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            continue
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+        plans.append((" ".join(sql.split()), plan))
+    return plans
+
+
+def full_scans(plan):
+    tables = [m.group(1) for m in map(FULL_SCAN.match, plan) if m]
+    return [t for t in tables if not t.endswith("_fts") and not t.startswith("sqlite_")]
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("-")]
+    verbose = "-v" in sys.argv
+    n_rolls = int(args[0]) if args else 50000
+
+    data_dir = tempfile.mkdtemp(prefix="audit_plans_")
+    try:
+        storage = StorageManager(data_dir)
+        start = time.perf_counter()
+        build_database(storage, n_rolls)
+        print(f"synthetic database: {n_rolls} rolls ({time.perf_counter() - start:.1f}s)")
+        print("-" * 72)
+
+        failures = 0
+        for method, call_args, kwargs, full_read in CASES:
+            for sql, plan in audit_case(storage, method, call_args, kwargs):
+                scans = full_scans(plan)
+                if scans and not full_read:
+                    status = "FAIL"
+                    failures += 1
+                elif scans:
+                    status = "full"
+                else:
+                    status = "sort" if TEMP_SORT in plan else "ok"
+                print(f"[{status:>4}] {method}: {sql[:100]}")
+                if verbose or status == "FAIL":
+                    for line in plan:
+                        print(f"         {line}")
+
+        print("-" * 72)
+        print(f"{failures} query(s) fall back to a full table scan")
+        storage.close()
+        return 1 if failures else 0
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
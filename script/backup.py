@@ -0,0 +1,125 @@
+"""
+Database backup
+สำรอง / ตรวจ / กู้คืน data/storage.db ผ่าน core.backup.BackupManager (ไฟล์อยู่ใน database.backup_dir)
+
+    python script/backup.py backup              สำรองทันทีและแสดงเวลา / throughput
+    python script/backup.py list                แสดงไฟล์สำรองจากใหม่ไปเก่า
+    python script/backup.py verify [ไฟล์]        ตรวจไฟล์สำรอง (ค่าเริ่มต้นคือไฟล์ล่าสุด)
+    python script/backup.py restore <ไฟล์>       ตรวจแล้วกู้คืน (สำรองข้อมูลปัจจุบันไว้ก่อน) ควรปิดโปรแกรมหลักก่อน
+    python script/backup.py bench [จำนวนม้วน]    สำรองฐานข้อมูลจำลองระหว่างที่มี thread เขียนต่อเนื่อง
+                                               แล้ววัดเวลาที่การเขียนต้องรอ เทียบกับตอนไม่มีการสำรอง
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager
+from core.backup import BackupManager
+
+
+def write_latencies(storage, n_rolls, stop) -> list:
+    """อัปเดตม้วนวนไปเรื่อยๆ จน stop ถูก set คืนเวลาที่แต่ละการเขียนใช้"""
+    waits, i = [], 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        storage.update_roll(f"R{i % n_rolls:07d}", location=f"WH-{i}")
+        waits.append(time.perf_counter() - start)
+        i += 1
+        time.sleep(0.002)
+    return waits
+
+
+def run_writer(storage, n_rolls, seconds=None, during=None) -> list:
+    stop, result = threading.Event(), []
+    thread = threading.Thread(target=lambda: result.extend(write_latencies(storage, n_rolls, stop)))
+    thread.start()
+    if during:
+        during()
+    else:
+        time.sleep(seconds)
+    stop.set()
+    thread.join()
+    return sorted(result)
+
+
+def bench(n_rolls: int) -> int:
+    print(f"{n_rolls} rolls, one writer thread updating a roll every 2 ms")
+    print(f"{'profile':<8} {'db':>8} {'gz':>7} {'copy':>7} {'total':>7} {'MB/s':>7} {'restarts':>8} "
+          f"{'write p99 idle':>15} {'during backup':>14}")
+    print("-" * 92)
+    for profile in ("legacy", "wal"):
+        data_dir = tempfile.mkdtemp(prefix=f"bench_backup_{profile}_")
+        try:
+            storage = StorageManager(data_dir, profile=profile)
+            storage.add_rolls([{"roll_id": f"R{i:07d}", "code": f"C{i % 300:04d}", "lot_no": f"LOT{i % 40}",
+                                "description": "fabric roll " * 10, "length": 100.0, "length_original": 100.0}
+                               for i in range(n_rolls)])
+            manager = BackupManager(storage)
+            idle = run_writer(storage, n_rolls, seconds=1.0)
+            results = []
+            during = run_writer(storage, n_rolls, during=lambda: results.append(manager.backup()))
+            result = results[0]
+            problems = manager.verify(result.path)
+            p99 = lambda waits: waits[int(len(waits) * 0.99)] * 1000
+            print(f"{profile:<8} {result.db_bytes / 1e6:>6.1f}MB {result.compressed_bytes / 1e6:>5.1f}MB "
+                  f"{result.copy_seconds:>6.2f}s {result.total_seconds:>6.2f}s {result.throughput:>7.1f} "
+                  f"{result.restarts:>8} {p99(idle):>13.2f}ms {p99(during):>12.2f}ms"
+                  + (f"  VERIFY FAILED: {problems}" if problems else ""))
+            storage.close()
+            if problems:
+                return 1
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return 0
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "backup"
+    if command == "bench":
+        return bench(int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
+
+    data_dir = os.path.join(os.getcwd(), "data")
+    if not os.path.exists(os.path.join(data_dir, "storage.db")):
+        print(f"Database not found in {data_dir}.")
+        return 1
+    storage = StorageManager(data_dir)
+    manager = BackupManager(storage)
+    try:
+        if command == "backup":
+            print(manager.backup().summary())
+        elif command == "list":
+            for path in manager.list_backups():
+                print(f"  {path.name}  {path.stat().st_size / 1e6:.1f} MB")
+        elif command in ("verify", "restore"):
+            backups = manager.list_backups()
+            path = sys.argv[2] if len(sys.argv) > 2 else (backups[0] if backups and command == "verify" else None)
+            if path is None:
+                print("No backup file given.")
+                return 1
+            if command == "restore":
+                print(f"restored {os.path.basename(str(path))}, "
+                      f"previous data saved as {manager.restore(path).path.name}")
+            else:
+                problems = manager.verify(path)
+                print(f"{os.path.basename(str(path))}: " + ("ok" if not problems else "; ".join(problems)))
+                return 1 if problems else 0
+        else:
+            print(__doc__)
+            return 1
+    except ValueError as e:
+        print(e)
+        return 1
+    finally:
+        storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark group commit
+เทียบการเขียนจากหลาย thread พร้อมกันแบบเดิม (แต่ละ thread commit เอง) กับ write-behind
+(submit_write ผ่าน thread เขียนเดียวที่ commit เป็นกลุ่ม) ในแต่ละ storage profile
+และวัดเวลาที่ thread GUI จำลองต้องรอเมื่อเขียนหนึ่งรายการระหว่างที่มีการสแกนเข้ามาต่อเนื่อง
+
+    python script/benchmark_group_commit.py [จำนวน thread] [จำนวนงานต่อ thread]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager
+
+
+def scan_roll(storage, roll_id):
+    """งานเขียนของการสแกนรับหนึ่งครั้ง: ม้วน + log (เหมือน ScanController.handle_mobile_scan)"""
+    data = {"roll_id": roll_id, "code": "C001", "lot_no": "LOT1", "length": 0.0, "status": "active"}
+    storage.add_roll(data, user="bench")
+    storage.add_log("receive_mobile", roll_id, data, user="bench")
+    return True
+
+
+def run(profile, write_behind, n_threads, n_ops):
+    data_dir = tempfile.mkdtemp(prefix=f"bench_group_{profile}_")
+    try:
+        storage = StorageManager(data_dir, profile=profile)
+        if write_behind:
+            storage.start_writer(group_commit_ms=20, group_commit_max=64)
+        gui_waits = []
+
+        def scanner(t):
+            futures = [storage.submit_write(scan_roll, storage, f"R{t:02d}{i:06d}") for i in range(n_ops)]
+            for future in futures:
+                future.result()
+
+        def gui():
+            # thread GUI เขียนหนึ่งรายการทุก 10 ms และรอจน commit ตลอดเวลาที่ยังมีการสแกน
+            i = 0
+            while not scanned.is_set():
+                start = time.perf_counter()
+                storage.submit_write(storage.update_roll, "R00000000", location=f"WH-{i}", urgent=True).result()
+                gui_waits.append(time.perf_counter() - start)
+                i += 1
+                time.sleep(0.01)
+
+        scan_roll(storage, "R00000000")
+        scanned = threading.Event()
+        scanners = [threading.Thread(target=scanner, args=(t + 1,)) for t in range(n_threads)]
+        gui_thread = threading.Thread(target=gui)
+        start = time.perf_counter()
+        gui_thread.start()
+        for t in scanners:
+            t.start()
+        for t in scanners:
+            t.join()
+        elapsed = time.perf_counter() - start
+        scanned.set()
+        gui_thread.join()
+
+        assert storage.get_roll_count() == n_threads * n_ops + 1
+        stats = storage.get_writer_stats()
+        storage.close()
+        gui_waits.sort()
+        return elapsed, gui_waits[len(gui_waits) // 2], gui_waits[-1], stats
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    n_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_ops = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    print(f"{n_threads} scanner threads x {n_ops} scans + GUI writer")
+    print(f"{'profile':<8} {'mode':<13} {'total':>9} {'scans/s':>9} {'gui p50':>9} {'gui max':>9} {'avg group':>10}")
+    print("-" * 74)
+    for profile in ("legacy", "wal"):
+        for write_behind in (False, True):
+            elapsed, p50, worst, stats = run(profile, write_behind, n_threads, n_ops)
+            mode = "group commit" if write_behind else "per-write"
+            rate = n_threads * n_ops / elapsed
+            print(f"{profile:<8} {mode:<13} {elapsed:>8.2f}s {rate:>9.0f} {p50 * 1000:>7.1f}ms "
+                  f"{worst * 1000:>7.1f}ms {stats['avg_group']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark audit log sink
+เทียบ log แบบ transactional (เขียน log ใน transaction เดียวกับงาน) กับ buffered
+(เก็บใน buffer แล้ว flush ด้วย executemany) บนงานเบิกจ่ายจำลอง: update_roll + add_dispatch_record + add_log 2 แถว
+
+    python script/benchmark_log_sink.py [จำนวนงาน]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager
+
+
+def dispatch_event(storage, roll, i):
+    """งานเบิกหนึ่งครั้งแบบ DispatchController.execute_dispatch (แต่ละขั้น commit เอง)"""
+    storage.update_roll(roll.roll_id, length=100.0 - (i % 50), status="active")
+    storage.add_dispatch_record(roll, 1.0, document_no=f"DOC{i}", customer_name="Bench", user="bench")
+    storage.add_log("dispatch", roll.roll_id, {"document_no": f"DOC{i}", "length": 1.0}, user="bench")
+    storage.add_log("roll_cut", roll.roll_id, {"cut_length": 1.0}, user="bench")
+
+
+def run(profile, durability, n_events):
+    data_dir = tempfile.mkdtemp(prefix=f"bench_logs_{profile}_")
+    try:
+        storage = StorageManager(data_dir, profile=profile)
+        storage.log_durability = durability
+        if durability == "buffered":
+            storage._start_log_flusher()
+        storage.add_roll({"roll_id": "R0000001", "code": "C001", "length": 100.0,
+                          "length_original": 100.0, "status": "active"})
+        roll = storage.get_roll("R0000001")
+
+        start = time.perf_counter()
+        for i in range(n_events):
+            dispatch_event(storage, roll, i)
+        elapsed = time.perf_counter() - start
+
+        stats = storage.get_log_stats()
+        storage.close()
+        storage = StorageManager(data_dir, profile=profile)
+        logs = storage.count_logs(action="dispatch") + storage.count_logs(action="roll_cut")
+        assert logs == 2 * n_events, logs
+        storage.close()
+        return elapsed, stats
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f"{n_events} dispatch events (2 business writes + 2 logs each)")
+    print(f"{'profile':<8} {'logs':<14} {'total':>9} {'per event':>10} {'log flushes':>12}")
+    print("-" * 58)
+    for profile in ("legacy", "wal"):
+        for durability in StorageManager.LOG_DURABILITY:
+            elapsed, stats = run(profile, durability, n_events)
+            flushes = stats["flushes"] if durability == "buffered" else 2 * n_events
+            print(f"{profile:<8} {durability:<14} {elapsed:>8.2f}s {elapsed / n_events * 1000:>8.2f}ms "
+                  f"{flushes:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark Roll model
+เทียบการโหลดม้วนแบบเดิม (dataclass ปกติ + dict(row) + asdict) กับ Roll แบบ slots ที่สร้างจาก tuple
+ผ่าน row_factory โดยวัดเวลาและหน่วยความจำที่ใช้
+
+    python script/benchmark_roll_model.py [จำนวนม้วน]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import tracemalloc
+from dataclasses import make_dataclass, field, fields, asdict
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager, Roll, ROLL_COLUMNS, ROLL_SELECT
+
+# โมเดลเดิม: dataclass ที่มี __dict__ ต่อ instance
+LegacyRoll = make_dataclass(
+    "LegacyRoll",
+    [(f.name, f.type, field(default=f.default)) for f in fields(Roll)],
+    namespace={"__post_init__": Roll.__post_init__},
+)
+
+
+def load_legacy(storage):
+    with storage._read() as conn:
+        rows = conn.execute("SELECT * FROM rolls").fetchall()
+    return [LegacyRoll(**dict(row)) for row in rows]
+
+
+def load_slots(storage):
+    return storage.get_all_rolls()
+
+
+def measure(fn, *args):
+    """คืน (ผลลัพธ์, เวลา, หน่วยความจำที่ยังถืออยู่, peak) หน่วย MB
+    จับเวลาแยกจากรอบที่วัดหน่วยความจำ เพราะ tracemalloc ทำให้การ allocate ช้าลงมาก"""
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = fn(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current / 1e6, peak / 1e6
+
+
+def main():
+    n_rolls = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    data_dir = tempfile.mkdtemp(prefix="bench_roll_")
+    try:
+        storage = StorageManager(data_dir)
+        rows = [
+            (f"R{i:07d}", f"C{i % 2000:04d}", "", "", f"SUP{i % 80}", "Fabric", f"LOT{i % 500:04d}",
+             1, f"WH-{i % 40:02d}", "MTS", "BLACK", 1.5, 100.0, 100.0, "active", "2024-01-01 08:00:00")
+            for i in range(n_rolls)
+        ]
+        with storage.transaction() as conn:
+            conn.executemany(
+                f"INSERT INTO rolls ({ROLL_SELECT}) VALUES ({', '.join('?' * len(ROLL_COLUMNS))})", rows
+            )
+        del rows
+
+        print(f"{n_rolls} rolls")
+        print(f"{'model':<8} {'load':>9} {'held':>10} {'peak':>10} {'to_dict':>9}")
+        print("-" * 50)
+        for name, loader, to_dict in (("legacy", load_legacy, asdict),
+                                      ("slots", load_slots, Roll.to_dict)):
+            rolls, elapsed, held, peak = measure(loader, storage)
+            start = time.perf_counter()
+            for roll in rolls:
+                to_dict(roll)
+            dict_time = time.perf_counter() - start
+            print(f"{name:<8} {elapsed:>8.3f}s {held:>8.1f}MB {peak:>8.1f}MB {dict_time:>8.3f}s")
+            del rolls
+
+        storage.close()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark stock analytics
+เทียบการสรุปสต็อกแบบเดิม (วน Roll ทีละหน้าแล้วแปลงเป็น dict ของข้อความใน Python)
+กับ fetch_columns() + utils.stock_analytics (NumPy / pandas) บนฐานข้อมูลชั่วคราว
+
+    python script/benchmark_stock_analytics.py [จำนวนม้วน]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+import numpy as np
+
+from core.storage import StorageManager, ROLL_COLUMNS, ROLL_SELECT
+from utils.stock_analytics import (
+    classify_stock, stock_totals, supplier_totals,
+    CLASSIFY_COLUMNS, STATUS_DEPLETED, STATUS_FULL, STATUS_SCRAP
+)
+
+
+def legacy_totals(storage):
+    """แบบเดิม: ดึง Roll ทีละ 1000 ม้วน จัดประเภทและรวมยอดด้วย loop"""
+    per_supplier, total_length, cursor = {}, 0.0, None
+    while True:
+        rolls, cursor = storage.search_rolls_page({}, after=cursor, limit=1000)
+        for roll in rolls:
+            total_length += roll.length
+            if roll.status == "used" or roll.length <= 0:
+                continue
+            s = per_supplier.setdefault(roll.supplier_name, [0, 0.0, 0, 0.0])
+            s[0] += 1
+            s[1] += roll.length
+            if roll.length < roll.length_original:
+                s[2] += 1
+                s[3] += roll.length
+        if cursor is None:
+            break
+    return total_length, per_supplier
+
+
+def columnar_totals(storage):
+    """แบบใหม่: ดึงเฉพาะ 4 คอลัมน์ที่ใช้เป็น array แล้วคำนวณทั้งก้อน"""
+    cols = storage.fetch_columns("rolls", ("supplier_name",) + CLASSIFY_COLUMNS)
+    return stock_totals(cols), supplier_totals(cols)
+
+
+def legacy_export(storage):
+    """แบบเดิม: แปลง Roll ทุกม้วนเป็น dict ของข้อความ"""
+    rows, cursor = [], None
+    while True:
+        rolls, cursor = storage.search_rolls_page({}, after=cursor, limit=1000)
+        for roll in rolls:
+            if roll.status == "used" or roll.length <= 0:
+                status_text = STATUS_DEPLETED
+            elif roll.length >= roll.length_original:
+                status_text = STATUS_FULL
+            else:
+                status_text = STATUS_SCRAP
+            rows.append({
+                "Code": roll.code, "Roll ID": roll.roll_id, "Supplier Name": roll.supplier_name,
+                "Lot No.": roll.lot_no, "Location": roll.location,
+                "Length": f"{roll.length:.2f}", "Original": f"{roll.length_original:.2f}",
+                "Status": status_text,
+            })
+        if cursor is None:
+            break
+    return rows
+
+
+def columnar_export(storage):
+    """แบบใหม่: DataFrame จาก cursor แล้วจัดรูปแบบทั้งคอลัมน์"""
+    frame = storage.fetch_columns(
+        "rolls", ("code", "roll_id", "supplier_name", "lot_no", "location") + CLASSIFY_COLUMNS,
+        as_frame=True, order_by="roll_id"
+    )
+    frame["Status"] = classify_stock(frame["status"], frame["length"], frame["length_original"])
+    frame["Length"] = frame["length"].map("{:.2f}".format)
+    frame["Original"] = frame["length_original"].map("{:.2f}".format)
+    return frame
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    n_rolls = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    data_dir = tempfile.mkdtemp(prefix="bench_analytics_")
+    try:
+        storage = StorageManager(data_dir)
+        rng = np.random.default_rng(42)
+        lengths = np.round(rng.uniform(0, 120, n_rolls), 2)
+        rows = [
+            (f"R{i:07d}", f"C{i % 2000:04d}", "", "", f"SUP{i % 80:02d}", "Fabric", f"LOT{i % 500:04d}",
+             1, f"WH-{i % 40:02d}", "MTS", "BLACK", 1.5, float(lengths[i]), 100.0,
+             "used" if i % 10 == 0 else "active", "2024-01-01 08:00:00")
+            for i in range(n_rolls)
+        ]
+        with storage.transaction() as conn:
+            conn.executemany(
+                f"INSERT INTO rolls ({ROLL_SELECT}) VALUES ({', '.join('?' * len(ROLL_COLUMNS))})", rows
+            )
+        del rows
+        print(f"{n_rolls} rolls")
+
+        (loop_total, loop_suppliers), t_loop = timed(legacy_totals, storage)
+        (totals, summary), t_vec = timed(columnar_totals, storage)
+        _, e_loop = timed(legacy_export, storage)
+        _, e_vec = timed(columnar_export, storage)
+
+        # ผลลัพธ์ต้องตรงกัน
+        assert abs(loop_total - totals["length"]) < 1e-6 * max(1.0, loop_total)
+        vec_suppliers = {r.supplier_name: r for r in summary.itertuples()}
+        assert vec_suppliers.keys() == loop_suppliers.keys()
+        for name, (count, length, scrap_count, scrap_length) in loop_suppliers.items():
+            r = vec_suppliers[name]
+            assert (r.rolls, r.scrap_rolls) == (count, scrap_count)
+            assert abs(r.length - length) < 1e-6 * max(1.0, length)
+            assert abs(r.scrap_length - scrap_length) < 1e-6 * max(1.0, scrap_length)
+
+        print(f"{'task':<20} {'loop':>9} {'columnar':>9} {'speedup':>8}")
+        print("-" * 50)
+        print(f"{'totals + suppliers':<20} {t_loop:>8.3f}s {t_vec:>8.3f}s {t_loop / t_vec:>7.1f}x")
+        print(f"{'export rows':<20} {e_loop:>8.3f}s {e_vec:>8.3f}s {e_loop / e_vec:>7.1f}x")
+        print(f"total length {totals['length']:.2f} m, full {totals['full_rolls']}, "
+              f"scrap {totals['scrap_rolls']}, depleted {totals['depleted_rolls']}")
+        storage.close()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
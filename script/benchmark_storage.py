@@ -0,0 +1,78 @@
+"""
+Benchmark storage profiles (legacy / wal / fast)
+วัดความเร็วของ StorageManager ในแต่ละ storage profile บนฐานข้อมูลชั่วคราว
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager, STORAGE_PROFILES
+
+
+def bench_profile(profile, n_writes=500, n_reads=2000):
+    """รันชุดทดสอบเดียวกันกับ profile ที่ระบุ และคืนเวลาที่ใช้ (วินาที)"""
+    data_dir = tempfile.mkdtemp(prefix=f"bench_{profile}_")
+    try:
+        storage = StorageManager(data_dir, profile=profile)
+        results = {}
+
+        # 1. เขียนม้วนทีละรายการ (add_roll + roll_created log)
+        start = time.perf_counter()
+        for i in range(n_writes):
+            storage.add_roll({
+                "roll_id": f"RBENCH{i:06d}", "code": f"C{i % 50}", "lot_no": f"LOT{i % 20}",
+                "length": 100.0, "length_original": 100.0, "status": "active"
+            })
+        results["writes"] = time.perf_counter() - start
+
+        # 2. อ่านแบบสุ่มตาม roll_id
+        start = time.perf_counter()
+        for i in range(n_reads):
+            storage.get_roll(f"RBENCH{(i * 7) % n_writes:06d}")
+        results["reads"] = time.perf_counter() - start
+
+        # 3. อ่านจาก thread อื่นระหว่างที่ thread หลักกำลังเขียน log
+        read_times = []
+
+        def reader():
+            t0 = time.perf_counter()
+            for i in range(n_reads // 4):
+                storage.get_roll(f"RBENCH{i % n_writes:06d}")
+            read_times.append(time.perf_counter() - t0)
+
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        start = time.perf_counter()
+        for t in readers:
+            t.start()
+        for i in range(n_writes // 2):
+            storage.add_log("bench", f"RBENCH{i:06d}", {"i": i})
+        for t in readers:
+            t.join()
+        results["mixed"] = time.perf_counter() - start
+        results["mixed_reader_max"] = max(read_times)
+
+        storage.close()
+        return results
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    n_writes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(f"{'profile':<8} {'writes':>10} {'reads':>10} {'mixed':>10} {'reader max':>12}")
+    print("-" * 54)
+    for profile in STORAGE_PROFILES:
+        r = bench_profile(profile, n_writes=n_writes)
+        print(f"{profile:<8} {r['writes']:>9.3f}s {r['reads']:>9.3f}s "
+              f"{r['mixed']:>9.3f}s {r['mixed_reader_max']:>11.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,7 @@ import os
 # Add root directory to path
 sys.path.append(os.getcwd())
 
-from core.storage import StorageManager, MasterProduct
+from core.storage import StorageManager
 from datetime import datetime
 
 def import_master_products(csv_file):
@@ -33,76 +33,34 @@ def import_master_products(csv_file):
     print(f"Total rows: {len(df)}")
     print(f"Columns: {list(df.columns)}")
     
-    success_count = 0
-    error_count = 0
+    # upsert_master_products จะเลือกเฉพาะคอลัมน์ที่มีในตาราง master_products ให้เอง
+    if 'pdt_code' not in df.columns:
+        print("Error: pdt_code column not found!")
+        return
     
-    # Process each row
-    for idx, row in df.iterrows():
-        try:
-            # Get SKU from pdt_code or spl_part_code
-            sku = str(row.get('spl_part_code', '')).strip()
-            if not sku or sku == 'nan':
-                sku = str(row.get('pdt_code', '')).strip()
-            
-            if not sku or sku == 'nan':
-                error_count += 1
-                continue
-            
-            # Get description
-            description = str(row.get('pdt_name', '')).strip()
-            if not description or description == 'nan':
-                description = str(row.get('pdt_name_en', '')).strip()
-            
-            if not description or description == 'nan':
-                description = sku
-            
-            # Get default length from RollQTY or availableqty
-            default_length = 100.0
-            try:
-                if 'rollqty' in df.columns:
-                    val = row.get('rollqty', '')
-                    if val and str(val).strip() and str(val).strip() not in ['', 'nan', 'NaN', 'THB']:
-                        default_length = float(val)
-                elif 'availableqty' in df.columns:
-                    val = row.get('availableqty', '')
-                    if val and str(val).strip() and str(val).strip() not in ['', 'nan', 'NaN', 'THB']:
-                        default_length = float(val)
-            except (ValueError, TypeError):
-                default_length = 100.0
-            
-            # Get default grade
-            default_grade = str(row.get('pdt_status', 'A')).strip()
-            if not default_grade or default_grade == 'nan' or default_grade == '':
-                default_grade = 'A'
-            
-            # Create MasterProduct object
-            product = MasterProduct(
-                sku=sku,
-                description=description,
-                default_length=default_length,
-                default_grade=default_grade
-            )
-            
-            # Add to storage
-            if storage.add_master_product(product):
-                success_count += 1
-                if (idx + 1) % 50 == 0:
-                    print(f"✓ {idx+1}: {sku} - {description[:50]}")
-            else:
-                # Already exists, update it
-                storage._master_products[sku] = product
-                storage.save_master_products()
-                success_count += 1
-                
-        except Exception as e:
-            error_count += 1
-            print(f"✗ {idx+1}: Error - {str(e)}")
+    columns = list(df.columns)
+    df = df.astype(object).where(df.notna(), None)
+    df['pdt_code'] = df['pdt_code'].astype(str).str.strip()
+    valid = df[(df['pdt_code'] != '') & (df['pdt_code'] != 'None') & (df['pdt_code'] != 'nan')]
+    error_count = len(df) - len(valid)
+    
+    def report(done, total):
+        print(f"✓ {done}/{total}")
+    
+    # Upsert ทั้งไฟล์ด้วย executemany และ commit ทีละ chunk
+    start = datetime.now()
+    success_count = storage.upsert_master_products(
+        valid.to_dict('records'), columns=columns, chunk_size=1000, progress_callback=report
+    )
+    elapsed = (datetime.now() - start).total_seconds()
+    error_count += len(valid) - success_count
     
     print("\n" + "="*80)
     print("Import Complete!")
     print(f"Success: {success_count}")
     print(f"Failed: {error_count}")
     print(f"Total: {len(df)}")
+    print(f"Time: {elapsed:.2f}s")
     print("="*80)
 
 if __name__ == "__main__":
@@ -1,14 +1,21 @@
 import pandas as pd
 import sqlite3
 import os
+import sys
+from datetime import datetime
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager
 
 def migrate_all_data():
     root_dir = os.getcwd()
     data_dir = os.path.join(root_dir, "data")
     db_path = os.path.join(data_dir, "storage.db")
     
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+    # สร้าง/อัปเกรด schema ผ่าน migration registry ของ StorageManager ก่อน
+    storage = StorageManager(data_dir)
 
     # --- 1. Migrate MasterDATA.csv ---
     csv_master = os.path.join(root_dir, "MasterDATA.csv")
@@ -28,11 +35,15 @@ def migrate_all_data():
         
         df_save = df[target_cols].copy()
         df_save['scrapqty'] = pd.to_numeric(df_save['scrapqty'], errors='coerce').fillna(0.0)
+        df_save = df_save.astype(object).where(df_save.notna(), None)
         
-        cur.execute("DROP TABLE IF EXISTS master_products")
-        cur.execute("""CREATE TABLE master_products (pdt_code TEXT PRIMARY KEY, pdt_name TEXT, unit_type TEXT, spl_part_code TEXT, scrapqty REAL, create_name TEXT, create_date TEXT, update_name TEXT, update_date TEXT, last_buy_date TEXT, lastdate TEXT, pg_name TEXT, cate_name TEXT, spl_name TEXT, spl_code TEXT)""")
-        df_save.to_sql('master_products', conn, if_exists='append', index=False)
-        print(f"Done MasterDATA: {len(df_save)} rows")
+        # upsert แทน DROP/CREATE เพื่อคง schema และ full-text index ของ master_products ไว้
+        count = storage.upsert_master_products(df_save.to_dict('records'), columns=target_cols)
+        print(f"Done MasterDATA: {count} rows")
+    storage.close()
+    
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
 
     # --- 2. Migrate Suppliers.csv ---
     csv_suppliers = os.path.join(data_dir, "Suppliers.csv")
@@ -99,10 +110,34 @@ def migrate_all_data():
             
         df_save = df[target_cols].copy()
         
-        cur.execute("DROP TABLE IF EXISTS dispatch_legacy")
-        cur.execute("""CREATE TABLE dispatch_legacy (pdt_code TEXT, location TEXT, roll_id TEXT, lot TEXT, spl_name TEXT)""")
-        df_save.to_sql('dispatch_legacy', conn, if_exists='append', index=False)
-        print(f"Done Dispatch: {len(df_save)} rows")
+        # เขียนลงตาราง dispatch โดยตรง (ชื่อคอลัมน์ตาม schema ปัจจุบัน)
+        df_save = df_save.rename(columns={'lot': 'lot_no', 'spl_name': 'supplier_name'})
+        df_save = df_save.astype(object).where(df_save.notna(), "")
+
+        # เวลาเบิกจริงจากไฟล์ถ้ามีคอลัมน์วันที่ ไม่เช่นนั้นใช้เวลาแก้ไขไฟล์ล่าสุด
+        # (ไม่ปล่อยให้เป็น CURRENT_TIMESTAMP ซึ่งทำให้ประวัติเก่าไปนับเป็นการเบิก "วันนี้" ในสถิติ)
+        date_col = next((c for c in ('timestamp', 'date', 'dispatch_date') if c in df.columns), None)
+        fallback = datetime.fromtimestamp(os.path.getmtime(csv_dispatch)).strftime("%Y-%m-%d %H:%M:%S")
+        if date_col:
+            dates = pd.to_datetime(df[date_col], errors='coerce')
+            df_save['timestamp'] = dates.dt.strftime("%Y-%m-%d %H:%M:%S").where(dates.notna(), fallback)
+        else:
+            df_save['timestamp'] = fallback
+
+        # รันซ้ำได้: ข้ามแถวที่มีอยู่แล้วใน dispatch (ตาม roll_id หรือทุกคอลัมน์ถ้าไม่มี roll_id)
+        key_cols = ['roll_id', 'pdt_code', 'lot_no', 'location', 'supplier_name']
+        existing_ids, existing_rows = set(), set()
+        for row in cur.execute(f"SELECT {', '.join(key_cols)} FROM dispatch"):
+            row = tuple("" if v is None else str(v) for v in row)
+            if row[0]:
+                existing_ids.add(row[0])
+            else:
+                existing_rows.add(row)
+        keys = df_save[key_cols].astype(str).apply(tuple, axis=1)
+        is_new = [(key[0] not in existing_ids) if key[0] else (key not in existing_rows) for key in keys]
+        df_new = df_save[is_new]
+        df_new.to_sql('dispatch', conn, if_exists='append', index=False)
+        print(f"Done Dispatch: {len(df_new)} rows ({len(df_save) - len(df_new)} already imported)")
 
     conn.commit()
     conn.close()
@@ -1,49 +1,35 @@
-import sqlite3
+"""
+Apply pending schema migrations to data/storage.db
+อัปเกรดโครงสร้างฐานข้อมูลตาม StorageManager.MIGRATIONS (PRAGMA user_version)
+ปกติโปรแกรมจะรัน migration เองตอนเปิด สคริปต์นี้ใช้ตรวจสอบ/อัปเกรดล่วงหน้าโดยไม่ต้องเปิดหน้าจอ
+"""
+
 import os
+import sys
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager
+
 
-def migrate_to_simplified_rolls():
-    db_path = os.path.join(os.getcwd(), "data", "storage.db")
-    if not os.path.exists(db_path):
-        print(f"Database not found at {db_path}.")
+def migrate_db_schema():
+    data_dir = os.path.join(os.getcwd(), "data")
+    if not os.path.exists(os.path.join(data_dir, "storage.db")):
+        print(f"Database not found in {data_dir}.")
         return
 
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-
-    print("Recreating 'rolls' table with simplified schema...")
-    
-    # Drop existing table
-    cur.execute("DROP TABLE IF EXISTS rolls")
-    
-    # Create new table with exact requested columns
-    cur.execute("""
-    CREATE TABLE rolls (
-        roll_id TEXT PRIMARY KEY,
-        code TEXT,
-        sub_part_code TEXT,
-        sup_code TEXT,
-        supplier_name TEXT,
-        description TEXT,
-        lot_no TEXT,
-        quantity INTEGER,
-        location TEXT,
-        unit TEXT,
-        color TEXT,
-        width TEXT,
-        length REAL,
-        status TEXT,
-        date_received TEXT
-    )
-    """)
-    
-    # Re-create indexes
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_rolls_code ON rolls(code)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_rolls_lot ON rolls(lot_no)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_rolls_location ON rolls(location)")
-
-    conn.commit()
-    conn.close()
-    print("Database 'rolls' table has been simplified successfully!")
+    # StorageManager รัน migration ที่ค้างอยู่ให้ตั้งแต่ตอนสร้าง
+    storage = StorageManager(data_dir)
+    version = storage.get_schema_version()
+
+    print(f"Schema version: {version} (latest {StorageManager.SCHEMA_VERSION})")
+    for v, description, _ in StorageManager.MIGRATIONS:
+        mark = "✓" if v <= version else " "
+        print(f"  [{mark}] {v}: {description}")
+
+    storage.close()
+
 
 if __name__ == "__main__":
-    migrate_to_simplified_rolls()
+    migrate_db_schema()
@@ -1,6 +1,11 @@
 import pandas as pd
-import sqlite3
 import os
+import sys
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager
 
 def migrate_master_data():
     root_dir = os.getcwd()
@@ -38,41 +43,15 @@ def migrate_master_data():
     # Clean numeric columns
     df_to_save['scrapqty'] = pd.to_numeric(df_to_save['scrapqty'], errors='coerce').fillna(0.0)
 
+    # upsert ผ่าน StorageManager แทนการ DROP/CREATE ตาราง (schema อยู่ใน migration registry)
     print(f"Connecting to database {db_path}...")
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-
-    # ลบตารางเก่าทิ้งเพื่อให้สร้างใหม่ด้วยโครงสร้างที่ถูกต้อง
-    print("Dropping old 'master_products' table if exists...")
-    cur.execute("DROP TABLE IF EXISTS master_products")
-    
-    # สร้างตารางใหม่ด้วยโครงสร้างที่ถูกต้อง
-    print("Creating new 'master_products' table...")
-    cur.execute("""
-    CREATE TABLE master_products (
-        pdt_code TEXT PRIMARY KEY,
-        pdt_name TEXT,
-        unit_type TEXT,
-        spl_part_code TEXT,
-        scrapqty REAL,
-        create_name TEXT,
-        create_date TEXT,
-        update_name TEXT,
-        update_date TEXT,
-        last_buy_date TEXT,
-        lastdate TEXT,
-        pg_name TEXT,
-        cate_name TEXT,
-        spl_name TEXT,
-        spl_code TEXT
-    )
-    """)
-    conn.commit()
+    storage = StorageManager(os.path.dirname(db_path))
     
     print(f"Migrating {len(df_to_save)} records to 'master_products' table...")
-    df_to_save.to_sql('master_products', conn, if_exists='append', index=False, method='multi', chunksize=500)
+    df_to_save = df_to_save.astype(object).where(df_to_save.notna(), None)
+    storage.upsert_master_products(df_to_save.to_dict('records'), columns=target_columns, chunk_size=500)
     
-    conn.close()
+    storage.close()
     print("Migration completed successfully!")
 
 if __name__ == "__main__":
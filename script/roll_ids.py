@@ -0,0 +1,220 @@
+"""
+Roll ID sequence
+ตรวจ / ทดสอบตัวนับ Roll ID ต่อ prefix ปี (ตาราง roll_id_sequences)
+
+    python script/roll_ids.py show                 แสดงค่าล่าสุดของตัวนับแต่ละ prefix และช่วงเลขที่จองแล้วไม่ได้บันทึก
+    python script/roll_ids.py bench [จำนวนม้วน]    เทียบเวลาออกเลขแบบเดิม (อ่าน roll_id ทั้งปีแล้วหาค่าสูงสุด) กับตัวนับ
+                                                 แล้วจองเลขพร้อมกันจากหลาย thread และหลาย process ตรวจว่าไม่มีเลขซ้ำ
+                                                 และตรวจการคืนเลข / บันทึกช่องว่างของ reserve_roll_ids เมื่อ batch ล้มเหลว
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+import multiprocessing
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager
+
+
+def scan_next_roll_id(db_path, prefix) -> str:
+    """วิธีเดิมของ RollIDGenerator: ดึง roll_id ทั้งปีมาหาเลขสูงสุดใน Python"""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(f"SELECT roll_id FROM rolls WHERE roll_id LIKE '{prefix}%' "
+                            f"UNION ALL SELECT roll_id FROM rolls_archive WHERE roll_id LIKE '{prefix}%'").fetchall()
+    finally:
+        conn.close()
+    max_seq = 0
+    for (roll_id,) in rows:
+        try:
+            max_seq = max(max_seq, int(roll_id[3:]))
+        except ValueError:
+            pass
+    return f"{prefix}{max_seq + 1:06d}"
+
+
+def timed(fn, repeat=20) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def allocate_worker(data_dir, rounds, block, queue):
+    storage = StorageManager(data_dir)
+    ids = []
+    for _ in range(rounds):
+        ids.extend(storage.allocate_roll_ids(block))
+    storage.close()
+    queue.put(ids)
+
+
+def save(storage, ids) -> int:
+    return sum(storage.add_rolls([{"roll_id": roll_id, "code": "C0001", "length": 10.0, "length_original": 10.0}
+                                  for roll_id in ids]))
+
+
+def check_blocks(storage) -> list:
+    """จำลอง batch ที่บันทึกไม่ครบแบบต่างๆ แล้วตรวจว่าเลขที่ไม่ได้ใช้ถูกคืนหรือบันทึกเป็นช่องว่างถูกต้อง"""
+    problems = []
+
+    def gap_count():
+        return sum(g["last_value"] - g["first_value"] + 1 for g in storage.get_roll_id_gaps())
+
+    def reserve_and_fail(count, saved=lambda ids: [], before_exit=None):
+        try:
+            with storage.reserve_roll_ids(count, user="bench") as block:
+                save(storage, saved(block.ids))
+                if before_exit:
+                    before_exit()
+                raise RuntimeError("batch failed")
+        except RuntimeError:
+            pass
+        return block
+
+    # 1. batch ล้มเหลวทั้งหมด ไม่มีใครจองต่อ: คืนทั้ง block ไม่เกิดช่องว่าง
+    gaps = gap_count()
+    block = reserve_and_fail(1000)
+    if storage.allocate_roll_ids(1)[0] != block.format(block.first) or gap_count() != gaps:
+        problems.append("failed block was not returned to the counter")
+    # 2. บันทึกได้ 600 จาก 1000: คืน 400 เลขท้าย
+    block = reserve_and_fail(1000, saved=lambda ids: ids[:600])
+    if storage.allocate_roll_ids(1)[0] != block.format(block.first + 600) or gap_count() != gaps:
+        problems.append("unsaved tail of a partial block was not returned")
+    # 3. มีการจองต่อจาก block ก่อน batch ล้มเหลว: คืนไม่ได้ บันทึกทั้ง block เป็นช่องว่าง
+    block = reserve_and_fail(50, before_exit=lambda: storage.allocate_roll_ids(1))
+    if gap_count() != gaps + 50:
+        problems.append("failed block followed by another reservation was not recorded as a gap")
+    # 4. เลขกลาง block ไม่ได้บันทึก: ช่องว่างตรงกลาง เลขท้ายคืนให้ตัวนับ
+    block = reserve_and_fail(20, saved=lambda ids: ids[:5] + ids[10:15])
+    if gap_count() != gaps + 55 or storage.allocate_roll_ids(1)[0] != block.format(block.first + 15):
+        problems.append("gap in the middle of a block was not recorded")
+    # 5. บันทึกครบ: ไม่มีอะไรเปลี่ยน
+    with storage.reserve_roll_ids(10, user="bench") as block:
+        save(storage, block.ids)
+    if gap_count() != gaps + 55 or storage.allocate_roll_ids(1)[0] != block.format(block.last + 1):
+        problems.append("fully saved block changed the counter or gaps")
+    print(f"  failed / partial batches: {gap_count() - gaps} id(s) recorded as gaps "
+          f"({len(storage.get_roll_id_gaps())} range(s)), the rest returned to the counter")
+    return problems
+
+
+def bench(n_rolls: int) -> int:
+    prefix = StorageManager.roll_id_prefix()
+    data_dir = tempfile.mkdtemp(prefix="roll_ids_")
+    problems = []
+    try:
+        storage = StorageManager(data_dir)
+        storage.add_rolls([{"roll_id": f"{prefix}{i:06d}", "code": f"C{i % 300:04d}", "lot_no": f"LOT{i % 40}",
+                            "length": 100.0, "length_original": 100.0} for i in range(1, n_rolls + 1)])
+        db_path = os.path.join(data_dir, "storage.db")
+
+        scan = timed(lambda: scan_next_roll_id(db_path, prefix), repeat=5)
+        start = time.perf_counter()
+        first = storage.allocate_roll_ids(1)[0]
+        seed = time.perf_counter() - start
+        counter = timed(lambda: storage.allocate_roll_ids(1))
+        print(f"{n_rolls} rolls with prefix {prefix}")
+        print(f"  full scan (old)       {scan * 1000:>8.2f}ms per id")
+        print(f"  counter, first call   {seed * 1000:>8.2f}ms (seeds from the max existing id)")
+        print(f"  counter               {counter * 1000:>8.2f}ms per id")
+        if first != f"{prefix}{n_rolls + 1:06d}":
+            problems.append(f"first allocated id {first}, expected {prefix}{n_rolls + 1:06d}")
+        # นำเข้า 1,000 ม้วน: เดิมหาเลขทีละม้วน เทียบกับจองทั้ง block ครั้งเดียว
+        import_rows = 1000
+        per_row = scan * import_rows
+        start = time.perf_counter()
+        with storage.reserve_roll_ids(import_rows) as block:
+            save(storage, block.ids)
+        print(f"  {import_rows}-roll import: one scan per row ~{per_row:.1f}s, "
+              f"one block reservation + insert {time.perf_counter() - start:.2f}s")
+
+        # ม้วนที่บันทึกด้วยเลขที่กำหนดเอง ต้องดันตัวนับให้ข้ามเลขนั้น
+        manual = f"{prefix}{n_rolls + 5000:06d}"
+        storage.add_roll({"roll_id": manual, "code": "C0001", "length": 10.0, "length_original": 10.0})
+        after_manual = storage.allocate_roll_ids(1)[0]
+        if after_manual <= manual:
+            problems.append(f"counter did not move past manual id {manual}: got {after_manual}")
+
+        problems.extend(check_blocks(storage))
+
+        threads, rounds, block = 8, 50, 3
+        results = []
+        lock = threading.Lock()
+
+        def thread_worker():
+            ids = []
+            for _ in range(rounds):
+                ids.extend(storage.allocate_roll_ids(block))
+            with lock:
+                results.extend(ids)
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=thread_worker) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        print(f"  {threads} threads x {rounds} blocks of {block}: {len(results)} ids in "
+              f"{time.perf_counter() - start:.2f}s, {len(results) - len(set(results))} duplicate(s)")
+        if len(set(results)) != threads * rounds * block:
+            problems.append("duplicate ids across threads")
+        storage.close()
+
+        processes = 4
+        queue = multiprocessing.Queue()
+        start = time.perf_counter()
+        workers = [multiprocessing.Process(target=allocate_worker, args=(data_dir, rounds, block, queue))
+                   for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        process_ids = [roll_id for _ in workers for roll_id in queue.get()]
+        for worker in workers:
+            worker.join()
+        print(f"  {processes} processes x {rounds} blocks of {block}: {len(process_ids)} ids in "
+              f"{time.perf_counter() - start:.2f}s, {len(process_ids) - len(set(process_ids))} duplicate(s)")
+        if len(set(process_ids)) != processes * rounds * block or set(process_ids) & set(results):
+            problems.append("duplicate ids across processes")
+
+        for problem in problems:
+            print(f"  PROBLEM: {problem}")
+        print("no duplicate ids" if not problems else f"{len(problems)} problem(s)")
+        return 1 if problems else 0
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "show"
+    if command == "bench":
+        return bench(int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
+
+    data_dir = os.path.join(os.getcwd(), "data")
+    if not os.path.exists(os.path.join(data_dir, "storage.db")):
+        print(f"Database not found in {data_dir}.")
+        return 1
+    storage = StorageManager(data_dir)
+    with storage._read() as conn:
+        rows = conn.execute("SELECT prefix, last_value FROM roll_id_sequences ORDER BY prefix").fetchall()
+    for prefix, last_value in rows:
+        print(f"  {prefix}: last {prefix}{last_value:06d}")
+    if not any(prefix == StorageManager.roll_id_prefix() for prefix, _ in rows):
+        print(f"  {StorageManager.roll_id_prefix()}: not started (seeds from existing rolls on first use)")
+    for gap in storage.get_roll_id_gaps():
+        print(f"  gap {gap['prefix']}{gap['first_value']:06d}-{gap['prefix']}{gap['last_value']:06d} "
+              f"{gap['created_at'][:19]} {gap['user']}: {gap['reason']}")
+    storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
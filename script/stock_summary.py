@@ -0,0 +1,101 @@
+"""
+Stock summary maintenance
+ตรวจ / สร้างใหม่ตาราง stock_summary (ยอดคงคลังต่อ code, location, supplier ที่ trigger บน rolls ดูแล)
+
+    python script/stock_summary.py verify          เทียบกับการนับใหม่จาก rolls ใน data/storage.db
+    python script/stock_summary.py rebuild         นับใหม่ทั้งตารางแล้วตรวจซ้ำ
+    python script/stock_summary.py fuzz [จำนวนรอบ]  สุ่ม insert / update / cut / replace / delete
+                                                   บนฐานข้อมูลชั่วคราวแล้วตรวจว่ายอดตรงกับการนับใหม่
+"""
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager
+
+
+def report(storage) -> int:
+    mismatches = storage.verify_stock_summary()
+    totals = storage.get_stock_totals()
+    print(f"active rolls {totals.active_count}, length {totals.total_length:.2f} m, "
+          f"scrap {totals.scrap_count} ({totals.scrap_length:.2f} m)")
+    for m in mismatches[:20]:
+        print(f"  MISMATCH {m['key']}: expected {m['expected']}, actual {m['actual']}")
+    print(f"{len(mismatches)} mismatched key(s)")
+    return 1 if mismatches else 0
+
+
+def random_roll(rng, roll_id):
+    original = rng.choice([50.0, 100.0, 120.5])
+    return {
+        "roll_id": roll_id,
+        "code": rng.choice(["C001", "C002", "C003", None]),
+        "location": rng.choice(["WH-A", "WH-B", ""]),
+        "supplier_name": rng.choice(["SUP1", "SUP2", None]),
+        "length": rng.choice([original, round(rng.uniform(0, original), 2)]),
+        "length_original": original,
+        "status": rng.choice(["active", "active", "used"]),
+    }
+
+
+def fuzz(n_ops: int) -> int:
+    rng = random.Random(1234)
+    data_dir = tempfile.mkdtemp(prefix="stock_summary_")
+    try:
+        storage = StorageManager(data_dir)
+        ids = []
+        for i in range(n_ops):
+            op = rng.random()
+            if op < 0.3 or not ids:
+                ids.append(f"R{i:06d}")
+                storage.add_roll(random_roll(rng, ids[-1]))
+            elif op < 0.4:
+                # INSERT OR REPLACE ทับม้วนเดิม
+                storage.add_rolls([random_roll(rng, rng.choice(ids)) for _ in range(3)])
+            elif op < 0.6:
+                roll = storage.get_roll(rng.choice(ids))
+                storage.cut_roll(roll.roll_id, round(rng.uniform(0.1, max(roll.length, 0.1)), 2))
+            elif op < 0.8:
+                storage.update_roll(rng.choice(ids), **rng.choice([
+                    {"location": rng.choice(["WH-A", "WH-C", None])},
+                    {"code": rng.choice(["C001", "C004"])},
+                    {"supplier_name": rng.choice(["SUP1", "SUP3"]), "length": 10.0},
+                    {"status": rng.choice(["active", "used"])},
+                    {"length_original": rng.choice([10.0, 200.0])},
+                ]))
+            else:
+                with storage.transaction() as conn:
+                    conn.execute("DELETE FROM rolls WHERE roll_id = ?", (ids.pop(rng.randrange(len(ids))),))
+        print(f"{n_ops} random operations, {storage.get_roll_count()} rolls")
+        status = report(storage)
+        storage.close()
+        return status
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    if command == "fuzz":
+        return fuzz(int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
+
+    data_dir = os.path.join(os.getcwd(), "data")
+    if not os.path.exists(os.path.join(data_dir, "storage.db")):
+        print(f"Database not found in {data_dir}.")
+        return 1
+    storage = StorageManager(data_dir)
+    if command == "rebuild":
+        print(f"rebuilt {storage.rebuild_stock_summary()} summary row(s)")
+    status = report(storage)
+    storage.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
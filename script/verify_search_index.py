@@ -0,0 +1,100 @@
+"""
+Search index check
+ตรวจว่า full-text index (<table>_fts) มีแถวตรงกับตารางหลักทุกแถว ไม่มีแถวค้าง
+
+    python script/verify_search_index.py          ตรวจ data/storage.db
+    python script/verify_search_index.py replace  บันทึกม้วนซ้ำด้วย add_roll / add_rolls (INSERT OR REPLACE) และสินค้าหลักซ้ำ
+                                                  ด้วย add_master_product / upsert_master_products บนฐานข้อมูลชั่วคราว
+                                                  แล้วตรวจว่า index ไม่มีแถวค้างและค้นเจอค่าใหม่เท่านั้น
+                                                  และคำค้นสั้นที่มี % _ (ใช้ LIKE) ค้นแบบ substring เหมือน FTS
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+# Add root directory to path
+sys.path.append(os.getcwd())
+
+from core.storage import StorageManager
+
+TABLES = ("rolls", "master_products", "logs")
+
+
+def index_problems(storage) -> list:
+    problems = []
+    with storage._read() as conn:
+        for table in TABLES:
+            if not storage._has_fts(table):
+                continue
+            orphans = conn.execute(f"SELECT COUNT(*) FROM {table}_fts "
+                                   f"WHERE rowid NOT IN (SELECT rowid FROM {table})").fetchone()[0]
+            missing = conn.execute(f"SELECT COUNT(*) FROM {table} "
+                                   f"WHERE rowid NOT IN (SELECT rowid FROM {table}_fts)").fetchone()[0]
+            total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            print(f"  {table:<16} {total:>8} row(s), {orphans} orphaned, {missing} missing in {table}_fts")
+            if orphans or missing:
+                problems.append(f"{table}_fts out of sync")
+    return problems
+
+
+def check_replace() -> int:
+    data_dir = tempfile.mkdtemp(prefix="search_index_")
+    try:
+        storage = StorageManager(data_dir)
+        roll = {"roll_id": "A1", "code": "C0001", "lot_no": "LOTAAA", "length": 10.0, "length_original": 10.0}
+        storage.add_roll(roll)
+        storage.add_roll({**roll, "lot_no": "LOTBBB"})
+        storage.add_rolls([{**roll, "lot_no": "LOTCCC"}, {**roll, "roll_id": "A2"}])
+        product = {"pdt_code": "P0001", "pdt_name": "COTTON TWILL", "spl_name": "SUPPLIER A"}
+        storage.add_master_product(product)
+        storage.add_master_product({**product, "pdt_name": "LINEN PLAIN"})
+        storage.upsert_master_products([{**product, "pdt_name": "SILK SATIN"}])
+        storage.upsert_master_products([{"pdt_code": "P0001"}])
+        problems = index_problems(storage)
+        if storage._has_fts("rolls"):
+            with storage._read() as conn:
+                stale = conn.execute("SELECT COUNT(*) FROM rolls_fts WHERE rolls_fts MATCH ?",
+                                     (storage._fts_phrase("LOTBBB"),)).fetchone()[0]
+            if stale:
+                problems.append("old lot_no still matches in rolls_fts after re-save")
+        if [r.roll_id for r in storage.search_rolls_text("LOTCCC")] != ["A1"]:
+            problems.append("search_rolls_text does not find the re-saved roll")
+        storage.add_rolls([{**roll, "roll_id": "B1", "lot_no": "L_1"}, {**roll, "roll_id": "B2", "lot_no": "LX1"},
+                           {**roll, "roll_id": "B3", "lot_no": "5%"}])
+        storage.add_master_product({"pdt_code": "P_2", "pdt_name": "WOOL"})
+        if ([r.roll_id for r in storage.search_rolls_text("_1", fields=["lot_no"])] != ["B1"]
+                or [r.roll_id for r in storage.search_rolls_text("%", fields=["lot_no"])] != ["B3"]
+                or [r.roll_id for r in storage.search_rolls(lot_no="_1")] != ["B1"]
+                or [p.pdt_code for p in storage.search_master("_2")] != ["P_2"]):
+            problems.append("short queries treat % or _ as LIKE wildcards")
+        if storage.search_master("LINEN") or [p.pdt_code for p in storage.search_master("SATIN")] != ["P0001"]:
+            problems.append("search_master returns stale or missing products after re-save")
+        storage.close()
+        for problem in problems:
+            print(f"  PROBLEM: {problem}")
+        print("search index in sync after INSERT OR REPLACE" if not problems else f"{len(problems)} problem(s)")
+        return 1 if problems else 0
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "replace":
+        return check_replace()
+
+    data_dir = os.path.join(os.getcwd(), "data")
+    if not os.path.exists(os.path.join(data_dir, "storage.db")):
+        print(f"Database not found in {data_dir}.")
+        return 1
+    storage = StorageManager(data_dir)
+    problems = index_problems(storage)
+    storage.close()
+    print("search indexes in sync" if not problems else
+          f"{len(problems)} problem(s); run StorageManager.rebuild_search_indexes()")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
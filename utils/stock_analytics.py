@@ -0,0 +1,79 @@
+"""
+Stock Analytics - สรุปสต็อกม้วนผ้าแบบ vectorized
+รับ column arrays จาก StorageManager.fetch_columns() แล้วคำนวณด้วย NumPy / pandas ทั้งก้อน
+แทนการวน Roll ทีละม้วนใน Python
+"""
+from typing import Dict, Any
+
+import numpy as np
+import pandas as pd
+
+# สถานะที่แสดงในรายงาน (เงื่อนไขเดียวกับหน้าสถิติ)
+STATUS_DEPLETED = "หมด (Depleted)"
+STATUS_FULL = "เต็มม้วน (Full)"
+STATUS_SCRAP = "เศษ (Scrap)"
+
+# รหัสประเภทม้วนที่ใช้ภายใน (index ของ STATUS_LABELS)
+FULL, SCRAP, DEPLETED = 0, 1, 2
+STATUS_LABELS = np.array([STATUS_FULL, STATUS_SCRAP, STATUS_DEPLETED], dtype=object)
+
+# คอลัมน์ที่ต้องดึงมาเพื่อจัดประเภทม้วน
+CLASSIFY_COLUMNS = ("status", "length", "length_original")
+
+
+def _lengths(values) -> np.ndarray:
+    return np.nan_to_num(np.asarray(values, dtype=np.float64))
+
+
+def classify_codes(status, length, length_original) -> np.ndarray:
+    """
+    จัดประเภทม้วนทั้งชุดเป็นรหัส FULL / SCRAP / DEPLETED
+    หมด: status เป็น used หรือ length <= 0, เต็มม้วน: length >= length_original, นอกนั้นเป็นเศษ
+    """
+    length = _lengths(length)
+    depleted = (np.asarray(status, dtype=object) == "used") | (length <= 0)
+    codes = np.where(length >= _lengths(length_original), FULL, SCRAP).astype(np.int8)
+    codes[depleted] = DEPLETED
+    return codes
+
+
+def classify_stock(status, length, length_original) -> np.ndarray:
+    """เหมือน classify_codes แต่คืนข้อความสถานะที่ใช้แสดงในรายงาน"""
+    return STATUS_LABELS[classify_codes(status, length, length_original)]
+
+
+def stock_totals(columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """
+    สรุปจำนวนม้วนและความยาวรวมแยกตามประเภท
+    columns ต้องมี status, length, length_original
+    """
+    length = _lengths(columns["length"])
+    codes = classify_codes(columns["status"], length, columns["length_original"])
+    counts = np.bincount(codes, minlength=3)
+    lengths = np.bincount(codes, weights=length, minlength=3)
+    totals = {"rolls": int(length.size), "length": float(length.sum())}
+    for key, code in (("full", FULL), ("scrap", SCRAP), ("depleted", DEPLETED)):
+        totals[f"{key}_rolls"] = int(counts[code])
+        totals[f"{key}_length"] = float(lengths[code])
+    return totals
+
+
+def supplier_totals(columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    ยอดรวมต่อ supplier: จำนวนม้วน, ความยาวคงเหลือ, จำนวนและความยาวของเศษ (ไม่นับม้วนที่หมดแล้ว)
+    columns ต้องมี supplier_name, status, length, length_original
+    """
+    length = _lengths(columns["length"])
+    codes = classify_codes(columns["status"], length, columns["length_original"])
+    keep = codes != DEPLETED
+    names = pd.Series(np.asarray(columns["supplier_name"], dtype=object)[keep], dtype=object).fillna("")
+    index, suppliers = pd.factorize(names, sort=True)
+    length, scrap = length[keep], codes[keep] == SCRAP
+    n = len(suppliers)
+    return pd.DataFrame({
+        "supplier_name": np.asarray(suppliers, dtype=object),
+        "rolls": np.bincount(index, minlength=n).astype(np.int64),
+        "length": np.bincount(index, weights=length, minlength=n),
+        "scrap_rolls": np.bincount(index, weights=scrap, minlength=n).astype(np.int64),
+        "scrap_length": np.bincount(index, weights=length * scrap, minlength=n),
+    })
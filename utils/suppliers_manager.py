@@ -13,11 +13,13 @@ logger = logging.getLogger(__name__)
 class SuppliersManager:
     """จัดการข้อมูลสินค้าหลักและ Supplier จากฐานข้อมูล SQLite"""
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, storage=None):
         if db_path is None:
             self.db_path = os.path.join(os.getcwd(), "data", "storage.db")
         else:
             self.db_path = db_path
+        # StorageManager (ถ้ามี) ใช้ค้นหาผ่าน full-text index แทนการวนทุกค่าใน DataFrame
+        self.storage = storage
             
         self.master_data = None
         self.suppliers_data = None
@@ -127,6 +129,13 @@ class SuppliersManager:
             return self.suppliers_data.to_dict('records') if self.suppliers_data is not None else []
             
         results = self.search_by_supplier_name(supplier_name)
+        if search_query.strip() and self.storage is not None:
+            # กรองด้วย search_master แล้วเรียงตามลำดับความเกี่ยวข้อง
+            ranks = {}
+            for rank, product in enumerate(self.storage.search_master(search_query.strip(), limit=None)):
+                ranks.setdefault(product.pdt_code, rank)
+            filtered = [r for r in results if r.get('pdt_code') in ranks]
+            return sorted(filtered, key=lambda r: ranks[r.get('pdt_code')])
         if search_query.strip():
             # กรองเพิ่มด้วย search_query
             filtered = []